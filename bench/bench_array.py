@@ -0,0 +1,83 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     (1) Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#
+#     (2) Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#
+#     (3)The name of the author may not be used to
+#     endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Compares memory and etcd payload of array fields with a DictField.
+
+Run with: PYTHONPATH=src python bench/bench_array.py
+"""
+
+import timeit
+import tracemalloc
+
+from etcdobj import EtcdObj, fields
+
+COUNT = 100000
+NUMBER = 10
+
+
+class Series(EtcdObj):
+    """
+    The same numbers kept in a DictField and in array fields.
+    """
+    __name__ = 'series'
+    adict = fields.DictField('adict', {})
+    packed = fields.IntArrayField('packed')
+    chunked = fields.IntArrayField('chunked', chunk_size=8192)
+    small = fields.IntArrayField('small', typecode='i')
+
+
+def allocated(func):
+    """
+    Returns the bytes still allocated after calling func.
+    """
+    tracemalloc.start()
+    result = func()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+if __name__ == '__main__':
+    numbers = list(range(10 ** 6, 10 ** 6 + COUNT))
+    builders = (
+        ('adict', lambda: dict((str(x), n) for x, n in enumerate(numbers))),
+        ('packed', lambda: Series.packed._cast(numbers)),
+        ('chunked', lambda: Series.chunked._cast(numbers)),
+        ('small', lambda: Series.small._cast(numbers)),
+    )
+    print('{0:<8} {1:>12} {2:>8} {3:>12} {4:>14}'.format(
+        'field', 'memory', 'keys', 'payload', 'renders/sec'))
+    for name, build in builders:
+        memory = allocated(build)
+        obj = Series(_id='s1', **{name: build()})
+        items = [item for item in obj._render_items() if item[0] == name]
+        payload = sum(len(key) + len(str(value)) for _, key, value, _ in items)
+        elapsed = timeit.timeit(obj._render_items, number=NUMBER)
+        print('{0:<8} {1:>12,} {2:>8,} {3:>12,} {4:>14,.1f}'.format(
+            name, memory, len(items), payload, NUMBER / elapsed))
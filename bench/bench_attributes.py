@@ -0,0 +1,79 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     (1) Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#
+#     (2) Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#
+#     (3)The name of the author may not be used to
+#     endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Measures field read and write throughput on EtcdObj instances.
+
+A plain object with the same attributes is timed as a reference.
+
+Run with: PYTHONPATH=src python bench/bench_attributes.py
+"""
+
+import timeit
+
+from etcdobj import EtcdObj, fields
+
+NUMBER = 1000000
+
+
+class Example(EtcdObj):
+    """
+    An EtcdObj with a few fields.
+    """
+    __name__ = 'example'
+    anint = fields.IntField('anint')
+    astr = fields.StrField('astr')
+    plain = fields.Field('plain')
+
+
+class Plain(object):
+    """
+    A plain object with the same attributes.
+    """
+
+    def __init__(self):
+        self.anint = 1
+        self.astr = 'a'
+        self.plain = None
+
+
+def report(label, stmt, setup):
+    """
+    Prints the number of operations per second for stmt.
+    """
+    elapsed = min(timeit.repeat(
+        stmt, setup, number=NUMBER, repeat=3, globals=globals()))
+    print('{0:<24} {1:>12,.0f} ops/sec'.format(label, NUMBER / elapsed))
+
+
+if __name__ == '__main__':
+    report('EtcdObj field read', 'obj.anint', 'obj = Example(anint=1)')
+    report('EtcdObj field write', 'obj.plain = 1', 'obj = Example()')
+    report('EtcdObj cast write', 'obj.anint = 1', 'obj = Example()')
+    report('EtcdObj method lookup', 'obj.render', 'obj = Example()')
+    report('plain object read', 'obj.anint', 'obj = Plain()')
+    report('plain object write', 'obj.anint = 1', 'obj = Plain()')
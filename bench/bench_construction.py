@@ -0,0 +1,57 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     (1) Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#
+#     (2) Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#
+#     (3)The name of the author may not be used to
+#     endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Shows that EtcdObj construction cost stays flat as instances are created.
+
+Run with: PYTHONPATH=src python bench/bench_construction.py
+"""
+
+import timeit
+
+from etcdobj import EtcdObj, fields
+
+TOTAL = 1000000
+BATCH = 100000
+
+
+class Example(EtcdObj):
+    """
+    An EtcdObj with a few fields.
+    """
+    __name__ = 'example'
+    anint = fields.IntField('anint')
+    astr = fields.StrField('astr')
+    adict = fields.DictField('adict')
+
+
+if __name__ == '__main__':
+    timer = timeit.Timer('Example(anint=1, astr="a")', globals=globals())
+    for done in range(BATCH, TOTAL + 1, BATCH):
+        elapsed = timer.timeit(BATCH)
+        print('{0:>8} instances: {1:.3f} usec/instance'.format(
+            done, elapsed * 1e6 / BATCH))
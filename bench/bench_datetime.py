@@ -0,0 +1,63 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     (1) Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#
+#     (2) Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#
+#     (3)The name of the author may not be used to
+#     endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Compares DateTimeField parsing with datetime.datetime.strptime.
+
+Run with: PYTHONPATH=src python bench/bench_datetime.py
+"""
+
+import datetime
+import timeit
+
+from etcdobj import fields
+
+NUMBER = 100000
+
+#: (label, datefmt) for the ISO, compiled regex and strptime only paths.
+FORMATS = (
+    ('iso', '%Y-%m-%dT%H:%M:%S'),
+    ('iso/fraction', '%Y-%m-%d %H:%M:%S.%f'),
+    ('regex', '%d/%m/%Y %H:%M:%S'),
+    ('strptime only', '%d %b %Y %H:%M:%S'),
+)
+
+
+if __name__ == '__main__':
+    when = datetime.datetime(2016, 5, 4, 3, 2, 1, 123456)
+    for label, datefmt in FORMATS:
+        value = when.strftime(datefmt)
+        field = fields.DateTimeField('when', datefmt)
+        assert field._cast(value) == datetime.datetime.strptime(
+            value, datefmt)
+        for name, func in (
+                ('strptime', lambda: datetime.datetime.strptime(
+                    value, datefmt)),
+                ('DateTimeField', lambda: field._cast(value))):
+            elapsed = min(timeit.repeat(func, number=NUMBER, repeat=3))
+            print('{0:<14} {1:<14} {2:>12,.0f} parses/sec'.format(
+                label, name, NUMBER / elapsed))
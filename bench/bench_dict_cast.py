@@ -0,0 +1,71 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     (1) Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#
+#     (2) Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#
+#     (3)The name of the author may not be used to
+#     endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Compares DictField casting with the previous per entry loop.
+
+Run with: PYTHONPATH=src python bench/bench_dict_cast.py
+"""
+
+import timeit
+
+from etcdobj import fields
+
+ENTRIES = 50000
+NUMBER = 20
+
+
+def previous_cast(field, value):
+    """
+    The previous DictField._cast loop, without the type check. It casts
+    in place, so it is given a copy of the values.
+    """
+    for x in value.keys():
+        caster = field._caster.get(x, None)
+        if callable(caster):
+            value[x] = caster(value[x])
+    return value
+
+
+if __name__ == '__main__':
+    keys = ['key{0}'.format(x) for x in range(ENTRIES)]
+    values = dict((key, str(x)) for x, key in enumerate(keys))
+    cases = (
+        ('few casters', {'key1': int, 'key2': float, 'missing': int}),
+        ('all int', dict((key, int) for key in keys)),
+        ('half int/float', dict(
+            (key, (int, float)[x % 2]) for x, key in enumerate(keys))),
+    )
+    for label, caster in cases:
+        field = fields.DictField('values', caster)
+        assert previous_cast(field, dict(values)) == field._cast(values)
+        for name, func in (
+                ('previous', lambda: previous_cast(field, dict(values))),
+                ('DictField', lambda: field._cast(values))):
+            elapsed = min(timeit.repeat(func, number=NUMBER, repeat=7))
+            print('{0:<16} {1:<10} {2:>10,.1f} dicts/sec'.format(
+                label, name, NUMBER / elapsed))
@@ -0,0 +1,88 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     (1) Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#
+#     (2) Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#
+#     (3)The name of the author may not be used to
+#     endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Shows save_many throughput scaling with the thread pool size.
+
+The client sleeps a fixed time per request to stand in for network
+latency.
+
+Run with: PYTHONPATH=src python bench/bench_fanout.py
+"""
+
+import time
+
+import etcdobj
+
+from etcdobj import EtcdObj, fields
+
+DELAY = 0.002
+OBJECTS = 100
+
+
+class DelayClient(object):
+    """
+    A client which takes DELAY seconds per request.
+    """
+
+    def write(self, key, value, **kwargs):
+        time.sleep(DELAY)
+
+    def read(self, key, **kwargs):
+        time.sleep(DELAY)
+
+    def delete(self, key, **kwargs):
+        time.sleep(DELAY)
+
+
+class Node(EtcdObj):
+    """
+    An EtcdObj with a few fields.
+    """
+    __name__ = 'node'
+    anint = fields.IntField('anint')
+    astr = fields.StrField('astr')
+    adict = fields.DictField('adict')
+
+
+if __name__ == '__main__':
+    server = etcdobj._Server(DelayClient())
+    objs = [
+        Node(anint=x, astr='a', adict={'b': 1, 'c': 2})
+        for x in range(OBJECTS)]
+    start = time.time()
+    # full=True so every save writes all keys of the already saved objects
+    for obj in objs:
+        server.save(obj, full=True)
+    serial = time.time() - start
+    print('serial save:     {0:>8.0f} objects/sec'.format(OBJECTS / serial))
+    for workers in (1, 2, 4, 8, 16):
+        start = time.time()
+        server.save_many(objs, workers=workers, full=True)
+        elapsed = time.time() - start
+        print('save_many({0:>2}):   {1:>8.0f} objects/sec ({2:.1f}x)'.format(
+            workers, OBJECTS / elapsed, serial / elapsed))
@@ -0,0 +1,98 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     (1) Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#
+#     (2) Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#
+#     (3)The name of the author may not be used to
+#     endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Measures the cost of instrumentation when it is off and when it is on.
+
+With instrumentation off the classes hold the plain methods, so "off"
+is the cost of an uninstrumented call. Rounds alternate between off and
+on so machine noise affects both alike.
+
+Run with: PYTHONPATH=src python bench/bench_instrument.py
+"""
+
+import os
+import sys
+import timeit
+
+import etcdobj
+
+from etcdobj import instrument
+
+sys.path.insert(0, os.path.dirname(__file__))
+from bench_render import make_instance, make_model  # noqa: E402
+
+NUMBER = 2000
+
+
+class NullClient(object):
+    """
+    A client which does nothing.
+    """
+
+    def write(self, key, value, **kwargs):
+        pass
+
+    def read(self, key, **kwargs):
+        pass
+
+    def delete(self, key, **kwargs):
+        pass
+
+
+def costs(funcs):
+    """
+    Returns nanoseconds per call of each func with instrumentation off
+    and on, best of seven rounds.
+    """
+    best = {}
+    for _ in range(7):
+        for mode in ('off', 'on'):
+            if mode == 'on':
+                instrument.enable()
+            for index, func in enumerate(funcs):
+                elapsed = timeit.timeit(func, number=NUMBER)
+                key = (mode, index)
+                best[key] = min(best.get(key, elapsed), elapsed)
+            instrument.disable()
+    return [(best[('off', index)] / NUMBER * 1e9,
+             best[('on', index)] / NUMBER * 1e9)
+            for index in range(len(funcs))]
+
+
+if __name__ == '__main__':
+    server = etcdobj._Server(NullClient())
+    obj = make_instance(make_model())
+    cases = (
+        ('render', lambda: obj._render_items()),
+        ('json', lambda: obj.json),
+        ('save', lambda: server.save(obj, True)),
+    )
+    results = costs([func for _, func in cases])
+    for (name, _), (off_cost, on_cost) in zip(cases, results):
+        print('{0:<7} off {1:>7,.0f}ns  on {2:>7,.0f}ns ({3:+.1f}%)'.format(
+            name, off_cost, on_cost, (on_cost / off_cost - 1) * 100))
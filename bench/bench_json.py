@@ -0,0 +1,76 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     (1) Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#
+#     (2) Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#
+#     (3)The name of the author may not be used to
+#     endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Compares EtcdObj.json with the previous encode, parse and re-encode path.
+
+Run with: PYTHONPATH=src python bench/bench_json.py
+"""
+
+import json
+import timeit
+
+from etcdobj import EtcdObj, fields, serialize
+
+ENTRIES = 10000
+NUMBER = 50
+
+
+class Example(EtcdObj):
+    """
+    An EtcdObj with a large DictField.
+    """
+    __name__ = 'example'
+    anint = fields.IntField('anint')
+    astr = fields.StrField('astr')
+    adict = fields.DictField('adict')
+
+
+def previous_json(obj):
+    """
+    The previous EtcdObj.json: every field dumped, loaded and dumped again.
+    """
+    data = {}
+    for field in obj._fields.values():
+        data[field.name] = json.loads(field._json(obj._values[field._index]))
+        if field.name in data[field.name].keys():
+            data[field.name] = data[field.name][field.name]
+    return json.dumps(data)
+
+
+if __name__ == '__main__':
+    obj = Example(
+        anint=1, astr='a',
+        adict=dict(('key{0}'.format(x), x) for x in range(ENTRIES)))
+    elapsed = timeit.timeit(lambda: previous_json(obj), number=NUMBER)
+    print('{0:<16} {1:>8.1f} objects/sec'.format(
+        'previous', NUMBER / elapsed))
+    for encoder in sorted(serialize.ENCODERS):
+        serialize.set_encoder(encoder)
+        elapsed = timeit.timeit(lambda: obj.json, number=NUMBER)
+        print('{0:<16} {1:>8.1f} objects/sec'.format(
+            'json/' + encoder, NUMBER / elapsed))
@@ -0,0 +1,79 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     (1) Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#
+#     (2) Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#
+#     (3)The name of the author may not be used to
+#     endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Compares the memory used per EtcdObj instance with a dict per instance.
+
+Run with: PYTHONPATH=src python bench/bench_memory.py
+"""
+
+import tracemalloc
+
+from etcdobj import EtcdObj, fields
+
+COUNT = 100000
+
+
+class Slotted(EtcdObj):
+    """
+    An EtcdObj with a few fields and no instance __dict__.
+    """
+    __slots__ = ()
+    __name__ = 'slotted'
+    anint = fields.IntField('anint')
+    astr = fields.StrField('astr')
+    another = fields.IntField('another')
+
+
+class DictBacked(object):
+    """
+    The same data kept in a dict per instance.
+    """
+
+    def __init__(self, **kwargs):
+        self.values = {'anint': None, 'astr': None, 'another': None}
+        self.values.update(kwargs)
+
+
+def measure(factory):
+    """
+    Returns the bytes allocated per instance created by factory.
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objs = [factory(anint=x) for x in range(COUNT)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objs
+    return (after - before) / float(COUNT)
+
+
+if __name__ == '__main__':
+    print('EtcdObj (slots):   {0:.1f} bytes/instance'.format(
+        measure(Slotted)))
+    print('dict per instance: {0:.1f} bytes/instance'.format(
+        measure(DictBacked)))
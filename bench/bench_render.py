@@ -0,0 +1,86 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     (1) Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#
+#     (2) Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#
+#     (3)The name of the author may not be used to
+#     endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Measures renders per second of a 50 field model.
+
+Run with: PYTHONPATH=src python bench/bench_render.py
+"""
+
+import datetime
+import timeit
+
+from etcdobj import EtcdObj, fields
+
+NUMBER = 20000
+
+
+def make_model():
+    """
+    Builds a model with 40 scalar fields, 5 datetimes and 5 small dicts.
+    """
+    attrs = {'__name__': 'wide'}
+    for x in range(20):
+        attrs['int{0:02d}'.format(x)] = fields.IntField('int{0:02d}'.format(x))
+        attrs['str{0:02d}'.format(x)] = fields.StrField('str{0:02d}'.format(x))
+    for x in range(5):
+        name = 'when{0}'.format(x)
+        attrs[name] = fields.DateTimeField(name, '%Y-%m-%dT%H:%M:%S')
+        name = 'dict{0}'.format(x)
+        attrs[name] = fields.DictField(name)
+    return type('Wide', (EtcdObj,), attrs)
+
+
+def make_instance(model, **kwargs):
+    """
+    Builds an instance with every field set.
+    """
+    values = {}
+    for name in model._fields:
+        if name.startswith('int'):
+            values[name] = 1
+        elif name.startswith('str'):
+            values[name] = 'value'
+        elif name.startswith('when'):
+            values[name] = datetime.datetime(2016, 1, 1)
+        else:
+            values[name] = {'a': 1, 'b': 2}
+    values.update(kwargs)
+    return model(**values)
+
+
+if __name__ == '__main__':
+    model = make_model()
+    for label, obj in (('unkeyed', make_instance(model)),
+                       ('keyed', make_instance(model, _id='node1'))):
+        methods = [('render', obj.render)]
+        if hasattr(obj, '_render_items'):
+            methods.append(('_render_items', obj._render_items))
+        for name, method in methods:
+            elapsed = min(timeit.repeat(method, number=NUMBER, repeat=3))
+            print('{0:<8} {1:<14} {2:>10,.0f} renders/sec'.format(
+                label, name, NUMBER / elapsed))
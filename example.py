@@ -87,8 +87,8 @@ print(json.dumps(e.render(), indent=2))
 server = Server(etcd_kwargs={'port': 2379})
 server.save(e)
 
-# Retrieving from etcd
-from_etcd = server.read(Example())
+# Retrieving from etcd. A recursive read also loads the adict entries
+from_etcd = server.read(Example(), recursive=True)
 print("Result read back from etcd")
 print(json.dumps(from_etcd.render(), indent=2))
 # Output:
@@ -50,6 +50,7 @@ setup(
     url='https://github.com/ashcrow/etcdobj',
     license="MBSD",
 
+    python_requires='>=3.7',
     install_requires=install_requires,
     tests_require=test_require,
     package_dir={'': 'src'},
@@ -29,32 +29,290 @@
 A simplistic etcd orm.
 """
 
-import json
+import collections
+import copy
+import functools
+import types
 
-from etcdobj.fields import Field
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, unquote
+
+from etcdobj import serialize, snapshot
+from etcdobj.fields import DictField, Field
+from etcdobj.instrument import instrumented, synced_size
+from etcdobj.lease import refresh_ttl
+from etcdobj.pool import ClientPool
 
 __version__ = '0.0.0'
 
+#: Default number of keys sent per batch. Matches etcd's default
+#: --max-txn-ops limit.
+DEFAULT_BATCH_SIZE = 128
+
+#: Default number of threads used by the *_many methods. Matches the
+#: default per_host_pool_size of etcd.Client.
+DEFAULT_WORKERS = 10
+
+#: The directory secondary index keys are stored under. An index key
+#: looks like /_idx/<model>/<field>/<value>/<id>.
+INDEX_PREFIX = '/_idx'
+
+#: Read consistency levels. LINEARIZABLE reads go through the leader and
+#: see every write committed before them. SERIALIZABLE reads are served
+#: by any member and may be stale. CACHED reads are served from the
+#: Server's cache when it has the object and fall back to SERIALIZABLE
+#: when the Server has no cache.
+LINEARIZABLE = 'linearizable'
+SERIALIZABLE = 'serializable'
+CACHED = 'cached'
+CONSISTENCY_LEVELS = (LINEARIZABLE, SERIALIZABLE, CACHED)
+
+#: Render plan kinds. See _EtcdObjMeta._compile.
+_RAW, _CONVERT, _DICT, _CUSTOM, _CODEC = range(5)
+
+#: The outcome for one object of a *_many call. error is None on success.
+BulkResult = collections.namedtuple('BulkResult', ['obj', 'error'])
+
+#: Rendered values which can not change in place.
+_IMMUTABLE = frozenset((str, int, float, bool, bytes, type(None)))
+
+
+def _index_key(model_cls, field, value, obj_id):
+    """
+    Returns the index key for a rendered field value.
+
+    :param model_cls: A class that subclasses EtcdObj
+    :type model_cls: type
+    :param field: The indexed field.
+    :type field: etcdobj.fields.Field
+    :param value: The rendered value.
+    :type value: mixed
+    :param obj_id: The id of the object or None for the value directory.
+    :type obj_id: str
+    :returns: The index key
+    :rtype: str
+    """
+    key = '{0}{1}/{2}/{3}'.format(
+        INDEX_PREFIX, model_cls._prefix, field.name,
+        quote(str(value), safe=''))
+    if obj_id is not None:
+        # Quoted like the value so find can unquote both
+        key = '{0}/{1}'.format(key, quote(obj_id, safe=''))
+    return key
+
+
+def _synced_value(value):
+    """
+    Returns a rendered value as it is kept in EtcdObj._synced.
+
+    Values which can change in place are copied so later changes to the
+    live value are still seen as changes.
+
+    :param value: A rendered value.
+    :type value: mixed
+    :returns: The value or a deep copy of it
+    :rtype: mixed
+    """
+    if type(value) in _IMMUTABLE:
+        return value
+    return copy.deepcopy(value)
+
+
+def _items_size(items, obj):
+    """
+    Returns the size of the values of rendered items.
+
+    :param items: The result of EtcdObj._render_items().
+    :type items: list
+    :param obj: The rendered object.
+    :type obj: EtcdObj
+    :returns: The number of bytes
+    :rtype: int
+    """
+    return sum(len(str(item[2])) for item in items)
+
+
+class BatchSaveError(Exception):
+    """
+    Raised when a batched save fails before all batches were committed.
+    """
+
+    def __init__(self, committed, cause):
+        """
+        Creates a new instance of BatchSaveError.
+
+        :param committed: The keys which were committed before the failure.
+        :type committed: list
+        :param cause: The exception which stopped the save.
+        :type cause: Exception
+        """
+        super(BatchSaveError, self).__init__(
+            'Batched save failed after committing {0} key(s): {1}'.format(
+                len(committed), cause))
+        self.committed = committed
+        self.cause = cause
+
+
+class ConflictError(Exception):
+    """
+    Raised when a compare-and-swap save finds keys changed by others.
+    """
+
+    def __init__(self, keys):
+        """
+        Creates a new instance of ConflictError.
+
+        :param keys: The keys which changed since they were read.
+        :type keys: list
+        """
+        super(ConflictError, self).__init__(
+            'Keys changed since they were read: {0}'.format(
+                ', '.join(keys)))
+        self.keys = keys
+
+
+class _LazyValues(list):
+    """
+    The values of an object read with lazy.
+
+    Reading a position which was not loaded yet loads it first. Setting
+    a position means it never needs to be loaded.
+    """
+
+    __slots__ = ('_load', '_pending')
+
+    def __init__(self, values, load):
+        """
+        Creates a new instance of _LazyValues.
+
+        :param values: The current values of the object.
+        :type values: list
+        :param load: Called with the position of a value which is needed.
+        :type load: callable
+        """
+        super(_LazyValues, self).__init__(values)
+        self._load = load
+        self._pending = set(range(len(values)))
+
+    def __getitem__(self, index):
+        """
+        Returns a value, loading it first if needed.
+
+        :param index: The position of the value.
+        :type index: int
+        :returns: The value
+        :rtype: mixed
+        """
+        pending = self._pending
+        if index in pending:
+            # No longer pending while loading so the load can read it
+            pending.discard(index)
+            try:
+                self._load(index)
+            except Exception:
+                pending.add(index)
+                raise
+        return list.__getitem__(self, index)
+
+    def __setitem__(self, index, value):
+        """
+        Sets a value which then no longer needs to be loaded.
+
+        :param index: The position of the value.
+        :type index: int
+        :param value: The value to set.
+        :type value: mixed
+        """
+        self._pending.discard(index)
+        list.__setitem__(self, index, value)
+
 
 class _Server(object):
     """
     Parent class for all Server implementations.
     """
 
-    def __init__(self, client, *args, **kwargs):
+    def __init__(self, client, cache=None, consistency=None,
+                 write_quorum=True, watch=True, *args, **kwargs):
         """
         Creates a new instance of a Server implementation.
 
         :param client: The etcd client to use.
         :type client: object
+        :param cache: An optional cache to serve reads from.
+        :type cache: etcdobj.cache.ReadCache
+        :param consistency: The default read consistency level. None is
+                            CACHED with a cache and LINEARIZABLE without.
+        :type consistency: str
+        :param write_quorum: The default quorum flag given with writes.
+        :type write_quorum: bool
+        :param watch: If True the watch keeping the cache up to date is
+                      started with client. Without it the cache must be
+                      given a max_age or be watched by the caller.
+        :type watch: bool
         :param args: All other non-keyword arguments.
         :type args: list
         :param kwargs: All other keyword arguments.
         :type kwargs: dict
         :raises: ValueError
         """
+        if consistency is not None and (
+                consistency not in CONSISTENCY_LEVELS):
+            raise ValueError(
+                'Unknown consistency level: {0}'.format(consistency))
         self.client = None
+        self.cache = cache
+        self.consistency = consistency
+        self.write_quorum = write_quorum
         self._verify_client(client)
+        if cache is not None and watch:
+            cache.start(self.client)
+
+    def _consistency(self, model_cls, consistency=None):
+        """
+        Works out the consistency level of a read.
+
+        The level given for the call wins over __consistency__ of the
+        model, which wins over the level of the Server.
+
+        :param model_cls: A class that subclasses EtcdObj
+        :type model_cls: type
+        :param consistency: The level asked for by the call or None.
+        :type consistency: str
+        :returns: One of CONSISTENCY_LEVELS
+        :rtype: str
+        :raises: ValueError
+        """
+        for level in (consistency, model_cls.__consistency__,
+                      self.consistency):
+            if level is not None:
+                break
+        else:
+            level = LINEARIZABLE if self.cache is None else CACHED
+        if level not in CONSISTENCY_LEVELS:
+            raise ValueError('Unknown consistency level: {0}'.format(level))
+        if level == CACHED and self.cache is None:
+            level = SERIALIZABLE
+        return level
+
+    def _write_quorum(self, model_cls, write_quorum=None):
+        """
+        Works out the quorum flag given with writes.
+
+        The etcd v2 API commits every write through the leader and
+        ignores the flag; clients for other APIs may honour it.
+
+        :param model_cls: A class that subclasses EtcdObj
+        :type model_cls: type
+        :param write_quorum: The flag asked for by the call or None.
+        :type write_quorum: bool
+        :returns: The quorum flag
+        :rtype: bool
+        """
+        for quorum in (write_quorum, model_cls.__write_quorum__):
+            if quorum is not None:
+                return quorum
+        return self.write_quorum
 
     def _verify_client(self, client):
         """
@@ -75,37 +333,1222 @@ class _Server(object):
 
         self.client = client
 
-    def save(self, obj):
+    @instrumented('save', synced_size)
+    def save(self, obj, full=False, cas=False, ttl=None, write_quorum=None):
         """
         Save an object.
 
+        Only keys which changed since the object was last read or saved
+        are written and removed DictField entries are deleted.
+
+        With a ttl (or a __ttl__ on the model) the directory of the object
+        is given that TTL before the keys are written so they all expire
+        together. If the directory had already expired every key is
+        written again. Index keys live outside the directory so they are
+        written with the same TTL on every save. Use
+        etcdobj.lease.KeepAlive to keep the object and its index keys
+        alive without rewriting its keys.
+
+        With cas every write and delete only succeeds if the key still
+        has the modifiedIndex recorded when it was read or last saved,
+        and keys which were never seen must not exist yet. All keys are
+        checked with one read first; if any fails the check nothing is
+        written and a ConflictError lists them. A key changed by someone
+        else after that read stops the save at that key with a
+        ConflictError; keys written before it stay written.
+
+        :param obj: An instance that subclasses EtcdObj
+        :type obj: EtcdObj
+        :param full: If True every key is written.
+        :type full: bool
+        :param cas: If True use compare-and-swap on every key.
+        :type cas: bool
+        :param ttl: Seconds until the object expires.
+        :type ttl: int
+        :param write_quorum: The quorum flag given with the writes.
+        :type write_quorum: bool
+        :returns: The same instance
+        :rtype: EtcdObj
+        :raises: ConflictError
+        """
+        import etcd
+        quorum = self._write_quorum(type(obj), write_quorum)
+        items = obj._render_items()
+        ttl = self._ttl(obj, ttl)
+        if self._apply_ttl(obj, ttl):
+            full = True
+        writes, deletes = obj._changes(items, full)
+        # Index keys of objects with a TTL are written again to refresh it
+        index_writes, index_deletes = self._index_changes(
+            obj, items, full or ttl is not None)
+        unchanged = self._unchanged_keys(obj, writes, ttl)
+        if obj._indexes is None:
+            obj._indexes = {}
+        indexes = obj._indexes
+        stale = []
+        if cas:
+            stale = self._stale_keys(obj, writes, deletes)
+        done = set()
+        try:
+            for _, key, value, _ in writes:
+                if stale:
+                    break
+                kwargs = {'quorum': quorum}
+                if cas:
+                    if indexes.get(key) is None:
+                        kwargs['prevExist'] = False
+                    else:
+                        kwargs['prevIndex'] = indexes[key]
+                try:
+                    etcd_resp = self.client.write(key, value, **kwargs)
+                except (etcd.EtcdCompareFailed, etcd.EtcdAlreadyExist,
+                        etcd.EtcdKeyNotFound):
+                    if not cas:
+                        raise
+                    stale.append(key)
+                    break
+                done.add(key)
+                index = getattr(etcd_resp, 'modifiedIndex', None)
+                if index is not None:
+                    indexes[key] = index
+            for key in deletes:
+                if stale:
+                    break
+                kwargs = {}
+                if cas and indexes.get(key) is not None:
+                    kwargs['prevIndex'] = indexes[key]
+                try:
+                    self._delete_key(key, **kwargs)
+                except etcd.EtcdCompareFailed:
+                    if not cas:
+                        raise
+                    stale.append(key)
+                    break
+                done.add(key)
+                indexes.pop(key, None)
+            # Only the index keys of fields which were written are changed
+            for key, index_key in index_writes:
+                if key in done or key in unchanged:
+                    self._write_index(index_key, quorum, ttl)
+            for key, index_key in index_deletes:
+                if key in done:
+                    self._delete_key(index_key)
+        finally:
+            self._invalidate(obj)
+        if stale:
+            raise ConflictError(stale)
+        obj._mark_synced(items)
+        return obj
+
+    def _stale_keys(self, obj, writes, deletes):
+        """
+        Returns the keys a cas save would fail on, using one read.
+
+        :param obj: An instance that subclasses EtcdObj
+        :type obj: EtcdObj
+        :param writes: The items to write.
+        :type writes: list
+        :param deletes: The keys to delete.
+        :type deletes: list
+        :returns: The stale keys
+        :rtype: list
+        """
+        import etcd
+        try:
+            leaves = self._fetch_leaves(obj._path)[0]
+        except etcd.EtcdKeyNotFound:
+            leaves = {}
+        indexes = obj._indexes
+        stale = []
+        for _, key, _, _ in writes:
+            current = None
+            if key in leaves:
+                current = leaves[key][1]
+            if not obj._seen(key):
+                # Set before a lazy read loaded it, so this read is the
+                # state the write is compared with
+                indexes[key] = current
+            elif current != indexes.get(key):
+                stale.append(key)
+        for key in deletes:
+            expected = indexes.get(key)
+            if key in leaves and expected is not None:
+                if leaves[key][1] != expected:
+                    stale.append(key)
+        return stale
+
+    def _ttl(self, obj, ttl=None):
+        """
+        Returns the TTL an object is saved with.
+
+        :param obj: An instance that subclasses EtcdObj
+        :type obj: EtcdObj
+        :param ttl: Seconds until the object expires or None for __ttl__.
+        :type ttl: int
+        :returns: The TTL or None to keep the object forever
+        :rtype: int
+        """
+        if ttl is None:
+            ttl = obj.__ttl__
+        return ttl
+
+    def _unchanged_keys(self, obj, writes, ttl=None):
+        """
+        Returns the keys of indexed fields a save does not write.
+
+        Their index keys are only written again to refresh a TTL.
+
         :param obj: An instance that subclasses EtcdObj
         :type obj: EtcdObj
+        :param writes: The items the save writes.
+        :type writes: list
+        :param ttl: The TTL of the object.
+        :type ttl: int
+        :returns: The field keys
+        :rtype: set
+        """
+        if ttl is None or obj._id is None:
+            return set()
+        written = set(item[1] for item in writes)
+        keys = set()
+        for field in obj._fields.values():
+            key = '{0}/{1}'.format(obj._path, field.name)
+            if field.indexed and key not in written:
+                keys.add(key)
+        return keys
+
+    def _write_index(self, key, quorum=True, ttl=None):
+        """
+        Writes an index key, with the TTL of its object if it has one.
+
+        :param key: The index key.
+        :type key: str
+        :param quorum: The quorum flag given with the write.
+        :type quorum: bool
+        :param ttl: Seconds until the index key expires.
+        :type ttl: int
+        """
+        kwargs = {'quorum': quorum}
+        if ttl is not None:
+            kwargs['ttl'] = ttl
+        self.client.write(key, '', **kwargs)
+
+    def _apply_ttl(self, obj, ttl=None):
+        """
+        Sets the TTL of the directory of an object, creating it if needed.
+
+        A newly created directory holds none of the keys of the object so
+        what was recorded at the last read or save is dropped.
+
+        :param obj: An instance that subclasses EtcdObj
+        :type obj: EtcdObj
+        :param ttl: Seconds until the object expires or None for __ttl__.
+        :type ttl: int
+        :returns: True if the directory was created
+        :rtype: bool
+        """
+        ttl = self._ttl(obj, ttl)
+        if ttl is None:
+            return False
+        if refresh_ttl(self.client, obj._path, ttl):
+            return False
+        import etcd
+        try:
+            self.client.write(
+                obj._path, None, dir=True, ttl=ttl, prevExist=False)
+        except etcd.EtcdAlreadyExist:
+            # Created by another writer in between
+            return not refresh_ttl(self.client, obj._path, ttl)
+        obj._synced = None
+        obj._indexes = None
+        obj._read = None
+        obj._loaded = None
+        return True
+
+    @instrumented('delete')
+    def delete(self, obj, unchanged=False):
+        """
+        Delete an object and everything stored under its directory.
+
+        The directory is removed with one recursive delete. Index keys of
+        the object are removed as well.
+
+        :param obj: An instance that subclasses EtcdObj
+        :type obj: EtcdObj
+        :param unchanged: If True first check no key changed since the
+                          object was last read or saved.
+        :type unchanged: bool
         :returns: The same instance
         :rtype: EtcdObj
+        :raises: ValueError, ConflictError
         """
-        for item in obj.render():
-            self.client.write(item['key'], item['value'], quorum=True)
+        if unchanged:
+            if obj._indexes is None:
+                raise ValueError(
+                    'unchanged requires an object which was read or saved')
+            leaves = self._fetch_leaves(obj._path)[0]
+            stale = set()
+            for key, (_, index) in leaves.items():
+                if not obj._seen(key):
+                    # Never read, so there is nothing to compare with
+                    continue
+                if obj._indexes.get(key) != index:
+                    stale.add(key)
+            for key in obj._indexes:
+                if key not in leaves:
+                    stale.add(key)
+            if stale:
+                raise ConflictError(sorted(stale))
+
+        index_deletes = self._index_changes(obj, [])[1]
+        try:
+            self.client.delete(obj._path, recursive=True)
+            for _, key in index_deletes:
+                self._delete_key(key)
+        finally:
+            self._invalidate(obj)
+        obj._synced = None
+        obj._indexes = None
+        obj._read = None
+        obj._loaded = None
         return obj
 
-    def read(self, obj):
+    def delete_many(self, objs, unchanged=False, workers=DEFAULT_WORKERS):
+        """
+        Delete many objects, spreading the deletes over a thread pool.
+
+        :param objs: Instances that subclass EtcdObj
+        :type objs: iterable
+        :param unchanged: If True check each object is unchanged, see delete.
+        :type unchanged: bool
+        :param workers: The number of threads to use.
+        :type workers: int
+        :returns: A BulkResult per object in the order given
+        :rtype: list
+        """
+        objs = list(objs)
+        calls = [
+            (index, functools.partial(self.delete, obj, unchanged))
+            for index, obj in enumerate(objs)]
+        errors = self._fan_out(calls, len(objs), workers)[1]
+        return [BulkResult(obj, error) for obj, error in zip(objs, errors)]
+
+    def _index_key(self, model_cls, field, value, obj_id):
+        """
+        Returns the index key for a rendered field value.
+
+        :param model_cls: A class that subclasses EtcdObj
+        :type model_cls: type
+        :param field: The indexed field.
+        :type field: etcdobj.fields.Field
+        :param value: The rendered value.
+        :type value: mixed
+        :param obj_id: The id of the object or None for the value directory.
+        :type obj_id: str
+        :returns: The index key
+        :rtype: str
+        """
+        return _index_key(model_cls, field, value, obj_id)
+
+    def _index_changes(self, obj, items, full=False):
+        """
+        Works out which index keys saving an object adds and removes.
+
+        Only instances with an _id are indexed. When the previous value
+        of an indexed field is not known from the last read or save it is
+        read from etcd.
+
+        :param obj: An instance that subclasses EtcdObj
+        :type obj: EtcdObj
+        :param items: The result of obj._render_items().
+        :type items: list
+        :param full: If True index keys are written even if unchanged.
+        :type full: bool
+        :returns: (field key, index key) tuples to write and to delete
+        :rtype: tuple(list, list)
+        """
+        import etcd
+        old = {}
+        for key in self._unknown_index_keys(obj):
+            try:
+                old[key] = self.client.read(key, quorum=True).value
+            except etcd.EtcdKeyNotFound:
+                old[key] = None
+        return self._index_diff(obj, items, old, full)
+
+    def _unknown_index_keys(self, obj):
+        """
+        Returns the keys of indexed fields whose stored value is unknown.
+
+        :param obj: An instance that subclasses EtcdObj
+        :type obj: EtcdObj
+        :returns: The keys to read before saving
+        :rtype: list
+        """
+        if obj._id is None:
+            return []
+        synced = obj._synced or {}
+        read = obj._read
+        keys = []
+        for attr, field in obj._fields.items():
+            if field.indexed and (read is None or attr in read):
+                key = '{0}/{1}'.format(obj._path, field.name)
+                if key not in synced:
+                    keys.append(key)
+        return keys
+
+    def _index_diff(self, obj, items, old, full=False):
+        """
+        Compares the indexed values of an object with the stored ones.
+
+        Each index key is given with the key of the field it belongs to
+        so it is only changed once that field was written.
+
+        :param obj: An instance that subclasses EtcdObj
+        :type obj: EtcdObj
+        :param items: The result of obj._render_items().
+        :type items: list
+        :param old: Stored values of the keys from _unknown_index_keys.
+        :type old: dict
+        :param full: If True index keys are written even if unchanged.
+        :type full: bool
+        :returns: (field key, index key) tuples to write and to delete
+        :rtype: tuple(list, list)
+        """
+        writes = []
+        deletes = []
+        if obj._id is None:
+            return writes, deletes
+        current = dict((item[1], item[2]) for item in items)
+        synced = obj._synced or {}
+        read = obj._read
+        for attr, field in obj._fields.items():
+            if not field.indexed or (read is not None and attr not in read):
+                continue
+            key = '{0}/{1}'.format(obj._path, field.name)
+            known = key in synced
+            if known:
+                old_value = synced[key]
+            else:
+                old_value = old.get(key)
+            new = current.get(key)
+            new_key = None
+            if new is not None:
+                new_key = self._index_key(type(obj), field, new, obj._id)
+            if old_value is not None:
+                old_key = self._index_key(
+                    type(obj), field, old_value, obj._id)
+                if old_key != new_key:
+                    deletes.append((key, old_key))
+                elif known and not full:
+                    continue
+            if new_key is not None:
+                writes.append((key, new_key))
+        return writes, deletes
+
+    def find(self, model_cls, consistency=None, **criteria):
+        """
+        Lazily yields the instances of a model matching field values.
+
+        Every criterion must name an indexed field. Each one is resolved
+        with one read of its index directory and the matching ids are
+        intersected before any object is read.
+
+        :param model_cls: A class that subclasses EtcdObj
+        :type model_cls: type
+        :param consistency: The read consistency level, see read.
+        :type consistency: str
+        :param criteria: Attribute names and the values to match.
+        :type criteria: dict
+        :returns: A generator of filled out instances
+        :rtype: generator
+        :raises: ValueError
+        """
+        import etcd
+        if not criteria:
+            raise ValueError('At least one criterion is required')
+        level = self._consistency(model_cls, consistency)
+        lookups = []
+        expected = {}
+        for name, value in criteria.items():
+            field = model_cls._fields.get(name)
+            if field is None or not field.indexed:
+                raise ValueError('{0} is not an indexed field'.format(name))
+            expected[name] = field._cast(value)
+            rendered = field._encode(expected[name])
+            lookups.append(self._index_key(model_cls, field, rendered, None))
+
+        ids = None
+        for key in lookups:
+            try:
+                listing = self.client.read(
+                    key, quorum=level == LINEARIZABLE)
+            except etcd.EtcdKeyNotFound:
+                return
+            found = set(
+                unquote(leaf.key.rsplit('/', 1)[-1])
+                for leaf in listing.leaves if leaf.key != listing.key)
+            ids = found if ids is None else ids & found
+
+        for obj_id in sorted(ids):
+            obj = model_cls(_id=obj_id)
+            try:
+                self._read_recursive(obj, level)
+            except etcd.EtcdKeyNotFound:
+                # Index entry left behind by a removed object
+                continue
+            # Skip index entries which no longer match the stored values
+            for name, value in expected.items():
+                if getattr(obj, name) != value:
+                    break
+            else:
+                yield obj
+
+    def _delete_key(self, key, done=None, **kwargs):
+        """
+        Deletes a single key, ignoring keys which are already gone.
+
+        :param key: The key to delete.
+        :type key: str
+        :param done: A set the key is added to once it is gone.
+        :type done: set
+        :param kwargs: Conditions passed along to the client.
+        :type kwargs: dict
+        """
+        import etcd
+        try:
+            self.client.delete(key, **kwargs)
+        except etcd.EtcdKeyNotFound:
+            pass
+        if done is not None:
+            done.add(key)
+
+    def save_batch(self, obj, batch_size=DEFAULT_BATCH_SIZE, ttl=None,
+                   write_quorum=None):
+        """
+        Save an object sending its keys in batches.
+
+        If the client provides a callable ``txn`` it is given each batch as
+        a list of (key, value) tuples and must apply it atomically. Other
+        clients have the keys of each batch written concurrently, one
+        batch after another. New index keys go in the same batches.
+        Removed DictField entries and outdated index keys are deleted
+        afterwards.
+
+        :param obj: An instance that subclasses EtcdObj
+        :type obj: EtcdObj
+        :param batch_size: The maximum number of keys per batch.
+        :type batch_size: int
+        :param ttl: Seconds until the object expires, see save.
+        :type ttl: int
+        :param write_quorum: The quorum flag given with the writes.
+        :type write_quorum: bool
+        :returns: The keys which were committed
+        :rtype: list
+        :raises: ValueError, BatchSaveError
+        """
+        items = obj._render_items()
+        ttl = self._ttl(obj, ttl)
+        self._apply_ttl(obj, ttl)
+        quorum = self._write_quorum(type(obj), write_quorum)
+        index_writes, index_deletes = self._index_changes(
+            obj, items, ttl is not None)
+        deletes = obj._changes(items)[1]
+        deletes.extend(key for _, key in index_deletes)
+        writes = [(key, value) for _, key, value, _ in obj._scope(items)]
+        if ttl is None:
+            writes.extend((key, '') for _, key in index_writes)
+        try:
+            committed = self._write_batches(writes, batch_size, quorum)
+            if ttl is not None:
+                # Batches carry no TTL so index keys are written after
+                for _, key in index_writes:
+                    self._write_index(key, quorum, ttl)
+                    committed.append(key)
+            for key in deletes:
+                self._delete_key(key)
+        finally:
+            self._invalidate(obj)
+        obj._mark_synced(items)
+        return committed
+
+    def _write_batches(self, items, batch_size, quorum=True):
+        """
+        Writes items to etcd in batches of at most batch_size keys.
+
+        :param items: The (key, value) tuples to write.
+        :type items: list
+        :param batch_size: The maximum number of keys per batch.
+        :type batch_size: int
+        :param quorum: The quorum flag given with single writes.
+        :type quorum: bool
+        :returns: The keys which were committed
+        :rtype: list
+        :raises: ValueError, BatchSaveError
+        """
+        if batch_size < 1:
+            raise ValueError(
+                'batch_size must be at least 1. Provided: {0}'.format(
+                    batch_size))
+
+        txn = getattr(self.client, 'txn', None)
+        committed = []
+        for start in range(0, len(items), batch_size):
+            batch = items[start:start + batch_size]
+            if callable(txn):
+                try:
+                    txn(batch)
+                except Exception as error:
+                    raise BatchSaveError(committed, error)
+                committed.extend([key for key, _ in batch])
+                continue
+            # Without transactions the keys of a batch are written at once
+            errors = self._fan_out([
+                (index, functools.partial(
+                    self.client.write, key, value, quorum=quorum))
+                for index, (key, value) in enumerate(batch)],
+                len(batch), min(len(batch), DEFAULT_WORKERS))[1]
+            committed.extend([
+                key for (key, _), error in zip(batch, errors)
+                if error is None])
+            for error in errors:
+                if error is not None:
+                    raise BatchSaveError(committed, error)
+        return committed
+
+    @instrumented('read', synced_size)
+    def read(self, obj, recursive=False, consistency=None, lazy=False):
         """
         Retrieve an object.
 
+        With lazy nothing is read up front. Each field, or the whole
+        subtree of a DictField, is read the first time its value is used
+        and kept on the instance. Fields set before they were used are
+        not read. Rendering or saving the object reads the fields which
+        were not used yet.
+
+        .. note::
+
+           CACHED reads are served through the cache and behave like a
+           recursive read, even when lazy. Without a consistency level
+           given for the call, on the model (__consistency__) or on the
+           Server, reads are CACHED when the Server has a cache and
+           LINEARIZABLE otherwise.
+
         :param obj: An instance that subclasses EtcdObj
         :type obj: EtcdObj
+        :param recursive: If True the object is read in one recursive call.
+        :type recursive: bool
+        :param consistency: One of CONSISTENCY_LEVELS.
+        :type consistency: str
+        :param lazy: If True fields are read when first used.
+        :type lazy: bool
         :returns: A filled out instance
         :rtype: EtcdObj
+        :raises: ValueError
+        """
+        level = self._consistency(type(obj), consistency)
+        self._drop_pending(obj)
+        if recursive or level == CACHED:
+            return self._read_recursive(obj, level)
+        if lazy:
+            obj._values = _LazyValues(obj._values, functools.partial(
+                self._hydrate, obj, level == LINEARIZABLE))
+            obj._synced = {}
+            obj._indexes = {}
+            obj._read = None
+            obj._loaded = set()
+            return obj
+
+        quorum = level == LINEARIZABLE
+        indexes = {}
+        for item in obj._render_items():
+            etcd_resp = self.client.read(item[1], quorum=quorum)
+            self._apply_item(obj, item, etcd_resp.value)
+            indexes[item[1]] = etcd_resp.modifiedIndex
+        obj._mark_synced(indexes=indexes)
+        return obj
+
+    @staticmethod
+    def _drop_pending(obj):
+        """
+        Stops a lazily read object from reading its pending fields.
+
+        Used before reads which replace every value anyway.
+
+        :param obj: An instance that subclasses EtcdObj
+        :type obj: EtcdObj
+        """
+        if type(obj._values) is _LazyValues:
+            obj._values = list(obj._values)
+
+    @instrumented('hydrate', arg=1)
+    def _hydrate(self, obj, quorum, index):
+        """
+        Reads one field of an object read with lazy.
+
+        Fields without a key in etcd keep their current value.
+
+        :param obj: An instance that subclasses EtcdObj
+        :type obj: EtcdObj
+        :param quorum: If True the read is linearizable.
+        :type quorum: bool
+        :param index: The position of the field in the values of obj.
+        :type index: int
         """
-        for item in obj.render():
-            etcd_resp = self.client.read(item['key'], quorum=True)
-            value = etcd_resp.value
-            if item['dir']:
-                key = item['key'].split('/')[-1]
-                dct = getattr(obj, item['name'])
-                dct[key] = value
+        import etcd
+        plan_entry = obj._render_plan[index]
+        field = plan_entry[1]
+        key = '{0}/{1}'.format(obj._path, field.name)
+        indexes = {}
+        try:
+            if field._subtree:
+                leaves = self._fetch_leaves(key, quorum)[0]
+                value = {}
+                for leaf_key, (leaf_value, leaf_index) in leaves.items():
+                    value[leaf_key[len(key) + 1:]] = leaf_value
+                    indexes[leaf_key] = leaf_index
             else:
-                setattr(obj, item['name'], value)
+                etcd_resp = self.client.read(key, quorum=quorum)
+                value = etcd_resp.value
+                indexes[key] = etcd_resp.modifiedIndex
+            list.__setitem__(obj._values, index, field._load(value))
+        except etcd.EtcdKeyNotFound:
+            pass
+        else:
+            obj._indexes.update(indexes)
+            obj._synced.update(
+                (item[1], _synced_value(item[2]))
+                for item in obj._render_items((plan_entry,)))
+        obj._loaded.add(plan_entry[0])
+        values = obj._values
+        if not values._pending:
+            # Fully read, so plain list access from now on
+            obj._values = list(values)
+
+    @instrumented('cast')
+    def _apply_item(self, obj, item, value):
+        """
+        Sets a value read for one rendered item on an object.
+
+        :param obj: An instance that subclasses EtcdObj
+        :type obj: EtcdObj
+        :param item: The item from _render_items the value was read for.
+        :type item: tuple
+        :param value: The value read from etcd.
+        :type value: str
+        """
+        attr, _, _, entry = item
+        field = obj._fields[attr]
+        if entry is not None:
+            field._set_entry(getattr(obj, attr), entry, value)
+        else:
+            setattr(obj, attr, field._decode(value))
+
+    def save_many(self, objs, workers=DEFAULT_WORKERS, full=False,
+                  ttl=None, write_quorum=None):
+        """
+        Save many objects, spreading their writes over a thread pool.
+
+        .. note::
+
+           All threads share the client. Keep workers at or below the
+           client's connection pool size (per_host_pool_size for
+           etcd.Client) so every request reuses a pooled connection.
+
+        :param objs: Instances that subclass EtcdObj
+        :type objs: iterable
+        :param workers: The number of threads to use.
+        :type workers: int
+        :param full: If True every key is written, see save.
+        :type full: bool
+        :param ttl: Seconds until each object expires, see save.
+        :type ttl: int
+        :param write_quorum: The quorum flag given with the writes.
+        :type write_quorum: bool
+        :returns: A BulkResult per object in the order given
+        :rtype: list
+        """
+        objs = list(objs)
+        # TTLs and stored index values are looked up on the pool as well
+        plans, errors = self._fan_out([
+            (index, functools.partial(self._plan_save, obj, full, ttl))
+            for index, obj in enumerate(objs)], len(objs), workers)
+        quorums = [self._write_quorum(type(obj), write_quorum)
+                   for obj in objs]
+        done = [set() for _ in objs]
+
+        calls = []
+        for index, plan in enumerate(plans):
+            if plan is None:
+                continue
+            for _, key, value, _ in plan[1]:
+                calls.append((index, functools.partial(
+                    self._write_key, done[index], key, value,
+                    quorum=quorums[index])))
+            for key in plan[2]:
+                calls.append((index, functools.partial(
+                    self._delete_key, key, done=done[index])))
+        errors = self._first_errors(
+            errors, self._fan_out(calls, len(objs), workers)[1])
+
+        # Only the index keys of fields which were written are changed
+        calls = []
+        for index, plan in enumerate(plans):
+            if plan is None:
+                continue
+            for key, index_key in plan[3]:
+                if key in done[index] or key in plan[5]:
+                    calls.append((index, functools.partial(
+                        self._write_index, index_key, quorums[index],
+                        self._ttl(objs[index], ttl))))
+            for key, index_key in plan[4]:
+                if key in done[index]:
+                    calls.append((index, functools.partial(
+                        self._delete_key, index_key)))
+        errors = self._first_errors(
+            errors, self._fan_out(calls, len(objs), workers)[1])
+
+        for obj, plan, error in zip(objs, plans, errors):
+            self._invalidate(obj)
+            if error is None:
+                obj._mark_synced(plan[0])
+        return [BulkResult(obj, error) for obj, error in zip(objs, errors)]
+
+    def _plan_save(self, obj, full=False, ttl=None):
+        """
+        Works out what saving an object writes and deletes.
+
+        The TTL of the object is applied first, see save.
+
+        :param obj: An instance that subclasses EtcdObj
+        :type obj: EtcdObj
+        :param full: If True every key is written.
+        :type full: bool
+        :param ttl: Seconds until the object expires.
+        :type ttl: int
+        :returns: The items, the items to write, the keys to delete, the
+                  index keys to write and to delete and the keys of
+                  indexed fields which are not written
+        :rtype: tuple
+        """
+        items = obj._render_items()
+        ttl = self._ttl(obj, ttl)
+        if self._apply_ttl(obj, ttl):
+            full = True
+        writes, deletes = obj._changes(items, full)
+        index_writes, index_deletes = self._index_changes(
+            obj, items, full or ttl is not None)
+        unchanged = self._unchanged_keys(obj, writes, ttl)
+        return items, writes, deletes, index_writes, index_deletes, unchanged
+
+    def _write_key(self, done, key, value, **kwargs):
+        """
+        Writes a single key and records it in done.
+
+        :param done: The keys written so far.
+        :type done: set
+        :param key: The key to write.
+        :type key: str
+        :param value: The value to write.
+        :type value: str
+        :param kwargs: Passed along to the client.
+        :type kwargs: dict
+        :returns: The result of the write
+        :rtype: etcd.EtcdResult
+        """
+        etcd_resp = self.client.write(key, value, **kwargs)
+        done.add(key)
+        return etcd_resp
+
+    @staticmethod
+    def _first_errors(errors, more):
+        """
+        Keeps the first error per object of two rounds of calls.
+
+        :param errors: The errors of the first round.
+        :type errors: list
+        :param more: The errors of the second round.
+        :type more: list
+        :returns: The first error per object
+        :rtype: list
+        """
+        return [a if a is not None else b for a, b in zip(errors, more)]
+
+    def read_many(self, objs, recursive=False, workers=DEFAULT_WORKERS,
+                  consistency=None):
+        """
+        Retrieve many objects, spreading their reads over a thread pool.
+
+        Without recursive every key is its own task; with recursive (or a
+        CACHED read) each object is read with one recursive read.
+
+        :param objs: Instances that subclass EtcdObj
+        :type objs: iterable
+        :param recursive: If True each object is read in one recursive call.
+        :type recursive: bool
+        :param workers: The number of threads to use.
+        :type workers: int
+        :param consistency: The read consistency level, see read.
+        :type consistency: str
+        :returns: A BulkResult per object in the order given
+        :rtype: list
+        :raises: ValueError
+        """
+        objs = list(objs)
+        levels = [self._consistency(type(obj), consistency) for obj in objs]
+        calls = []
+        if recursive or CACHED in levels:
+            for index, obj in enumerate(objs):
+                calls.append((index, functools.partial(
+                    self._read_recursive, obj, levels[index])))
+            errors = self._fan_out(calls, len(objs), workers)[1]
+        else:
+            items = []
+            for index, obj in enumerate(objs):
+                quorum = levels[index] == LINEARIZABLE
+                self._drop_pending(obj)
+                for item in obj._render_items():
+                    items.append(item)
+                    calls.append((index, functools.partial(
+                        self.client.read, item[1], quorum=quorum)))
+            results, errors = self._fan_out(calls, len(objs), workers)
+            indexes = [{} for _ in objs]
+            for (index, _), item, etcd_resp in zip(calls, items, results):
+                if errors[index] is None:
+                    self._apply_item(objs[index], item, etcd_resp.value)
+                    indexes[index][item[1]] = etcd_resp.modifiedIndex
+            for obj, error, obj_indexes in zip(objs, errors, indexes):
+                if error is None:
+                    obj._mark_synced(indexes=obj_indexes)
+        return [BulkResult(obj, error) for obj, error in zip(objs, errors)]
+
+    def _fan_out(self, calls, count, workers):
+        """
+        Runs calls on a thread pool and collects errors per object.
+
+        :param calls: (object position, callable) tuples.
+        :type calls: list
+        :param count: The number of objects the calls belong to.
+        :type count: int
+        :param workers: The number of threads to use.
+        :type workers: int
+        :returns: The results of calls and the first error per object
+        :rtype: tuple
+        """
+        results = []
+        errors = [None] * count
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                (index, pool.submit(call)) for index, call in calls]
+            for index, future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as error:
+                    results.append(None)
+                    if errors[index] is None:
+                        errors[index] = error
+        return results, errors
+
+    def export(self, model_cls, path, consistency=None):
+        """
+        Writes every key stored under a model's prefix to a snapshot file.
+
+        The index keys of the model are written as well so find works on
+        the objects once the snapshot is imported. Keys are listed one
+        directory at a time so memory use does not grow with the number
+        of keys. The cache is never used. A model with nothing stored
+        gives an empty snapshot.
+
+        :param model_cls: A class that subclasses EtcdObj
+        :type model_cls: type
+        :param path: The path of the snapshot file to write.
+        :type path: str
+        :param consistency: The read consistency level, see read.
+        :type consistency: str
+        :returns: The number of keys written
+        :rtype: int
+        :raises: ValueError
+        """
+        quorum = self._consistency(model_cls, consistency) == LINEARIZABLE
+        with open(path, 'w', encoding='utf-8') as fp:
+            return snapshot.write_snapshot(
+                self._iter_model_leaves(model_cls, quorum), fp)
+
+    def _iter_model_leaves(self, model_cls, quorum=True):
+        """
+        Yields (key, value) for every key of a model and its indexes.
+
+        :param model_cls: A class that subclasses EtcdObj
+        :type model_cls: type
+        :param quorum: If True the reads are linearizable.
+        :type quorum: bool
+        :returns: A generator of (key, value) tuples
+        :rtype: generator
+        """
+        import etcd
+        prefixes = [model_cls._prefix]
+        if any(field.indexed for field in model_cls._fields.values()):
+            prefixes.append(INDEX_PREFIX + model_cls._prefix)
+        for prefix in prefixes:
+            try:
+                for item in self._iter_leaves(prefix, quorum):
+                    yield item
+            except etcd.EtcdKeyNotFound:
+                pass
+
+    def import_(self, path, batch_size=DEFAULT_BATCH_SIZE, use_mmap=True):
+        """
+        Writes every key in a snapshot file back to etcd in batches.
+
+        :param path: The path of the snapshot file to read.
+        :type path: str
+        :param batch_size: The maximum number of keys per batch.
+        :type batch_size: int
+        :param use_mmap: If True the file is memory-mapped instead of read.
+        :type use_mmap: bool
+        :returns: The number of keys written
+        :rtype: int
+        :raises: ValueError, BatchSaveError
+        """
+        if batch_size < 1:
+            raise ValueError(
+                'batch_size must be at least 1. Provided: {0}'.format(
+                    batch_size))
+        count = 0
+        batch = []
+        try:
+            for item in snapshot.read_snapshot(path, use_mmap):
+                batch.append(item)
+                if len(batch) == batch_size:
+                    count += len(self._write_batches(batch, batch_size))
+                    batch = []
+            if batch:
+                count += len(self._write_batches(batch, batch_size))
+        finally:
+            if self.cache is not None:
+                self.cache.clear()
+        return count
+
+    def query(self, model_cls, limit=None, prefix=None, fields=None,
+              consistency=None):
+        """
+        Lazily yields the stored instances of a model which have an _id.
+
+        The ids are listed with one read of the model directory. Each
+        object is then read when the generator reaches it, so only one
+        object is held at a time.
+
+        :param model_cls: A class that subclasses EtcdObj
+        :type model_cls: type
+        :param limit: The maximum number of objects to yield.
+        :type limit: int
+        :param prefix: Only yield objects whose id starts with prefix.
+        :type prefix: str
+        :param fields: Only read these fields, by attribute name. Saving
+                       or deleting with unchanged such an object only
+                       writes and checks the fields read.
+        :type fields: list
+        :param consistency: The read consistency level, see read. Reads of
+                            only some fields never use the cache.
+        :type consistency: str
+        :returns: A generator of filled out instances
+        :rtype: generator
+        :raises: ValueError
+        """
+        import etcd
+        level = self._consistency(model_cls, consistency)
+        quorum = level == LINEARIZABLE
+        if fields is not None:
+            unknown = [
+                name for name in fields if name not in model_cls._fields]
+            if unknown:
+                raise ValueError('Unknown fields: {0}'.format(
+                    ', '.join(unknown)))
+        field_keys = set(field.name for field in model_cls._fields.values())
+        try:
+            listing = self.client.read(
+                model_cls._prefix, quorum=quorum, sorted=True)
+        except etcd.EtcdKeyNotFound:
+            return
+
+        count = 0
+        for child in listing.leaves:
+            if limit is not None and count >= limit:
+                return
+            if not child.dir or child.key == listing.key:
+                continue
+            obj_id = child.key.rsplit('/', 1)[-1]
+            if obj_id in field_keys or (
+                    prefix is not None and not obj_id.startswith(prefix)):
+                continue
+            obj = model_cls(_id=obj_id)
+            try:
+                if fields is None:
+                    self._read_recursive(obj, level)
+                else:
+                    self._read_fields(obj, fields, quorum)
+            except etcd.EtcdKeyNotFound:
+                # Removed since the listing
+                continue
+            count += 1
+            yield obj
+
+    def _read_fields(self, obj, names, quorum=True):
+        """
+        Retrieve only some fields of an object.
+
+        :param obj: An instance that subclasses EtcdObj
+        :type obj: EtcdObj
+        :param names: The attribute names of the fields to read.
+        :type names: list
+        :param quorum: If True the reads are linearizable.
+        :type quorum: bool
+        :returns: A filled out instance
+        :rtype: EtcdObj
+        """
+        import etcd
+        path = obj._path
+        leaves = {}
+        for name in names:
+            field = obj._fields[name]
+            key = '{0}/{1}'.format(path, field.name)
+            try:
+                if field._subtree:
+                    leaves.update(self._fetch_leaves(key, quorum)[0])
+                else:
+                    etcd_resp = self.client.read(key, quorum=quorum)
+                    leaves[key] = (etcd_resp.value, etcd_resp.modifiedIndex)
+            except etcd.EtcdKeyNotFound:
+                pass
+        return self._load_leaves(obj, path, leaves, names)
+
+    def _iter_leaves(self, key, quorum=True):
+        """
+        Yields (key, value) for every key under key.
+
+        :param key: The key to start from.
+        :type key: str
+        :param quorum: If True the reads are linearizable.
+        :type quorum: bool
+        :returns: A generator of (key, value) tuples
+        :rtype: generator
+        """
+        etcd_resp = self.client.read(key, quorum=quorum)
+        if not etcd_resp.dir:
+            yield etcd_resp.key, etcd_resp.value
+            return
+        for child in etcd_resp.leaves:
+            if not child.dir:
+                yield child.key, child.value
+            elif child.key != etcd_resp.key:
+                for item in self._iter_leaves(child.key, quorum):
+                    yield item
+
+    def _invalidate(self, obj):
+        """
+        Drops the cached values of an object, if a cache is in use.
+
+        :param obj: An instance that subclasses EtcdObj
+        :type obj: EtcdObj
+        """
+        if self.cache is not None:
+            self.cache.invalidate(obj._path)
+
+    def _read_recursive(self, obj, level=None):
+        """
+        Retrieve an object with a single recursive read of its prefix.
+
+        Every DictField is replaced with the entries found in etcd so
+        keys which are not yet known locally are loaded as well.
+
+        :param obj: An instance that subclasses EtcdObj
+        :type obj: EtcdObj
+        :param level: The consistency level or None for the default.
+        :type level: str
+        :returns: A filled out instance
+        :rtype: EtcdObj
+        """
+        self._drop_pending(obj)
+        prefix = obj._path
+        if level is None:
+            level = self._consistency(type(obj))
+        if level != CACHED:
+            leaves = self._fetch_leaves(prefix, level == LINEARIZABLE)[0]
+        else:
+            leaves = self.cache.get(prefix)
+            if leaves is None:
+                leaves, index = self._fetch_leaves(prefix)
+                self.cache.set(prefix, leaves, index)
+        return self._load_leaves(obj, prefix, leaves)
+
+    def _fetch_leaves(self, prefix, quorum=True):
+        """
+        Reads every key under prefix with one recursive read.
+
+        :param prefix: The key prefix to read.
+        :type prefix: str
+        :param quorum: If True the read is linearizable.
+        :type quorum: bool
+        :returns: A dict of key to (value, modifiedIndex) and the etcd
+                  index of the read
+        :rtype: tuple
+        """
+        etcd_resp = self.client.read(
+            prefix, recursive=True, quorum=quorum)
+        leaves = {}
+        index = 0
+        for leaf in etcd_resp.leaves:
+            if not leaf.dir:
+                leaves[leaf.key] = (leaf.value, leaf.modifiedIndex)
+            index = max(index, leaf.modifiedIndex or 0)
+        return leaves, getattr(etcd_resp, 'etcd_index', None) or index
+
+    @instrumented('cast')
+    def _load_leaves(self, obj, prefix, leaves, names=None):
+        """
+        Fills out an object from the keys and values stored under prefix.
+
+        :param obj: An instance that subclasses EtcdObj
+        :type obj: EtcdObj
+        :param prefix: The key prefix of the object.
+        :type prefix: str
+        :param leaves: A dict of key to (value, modifiedIndex).
+        :type leaves: dict
+        :param names: The attribute names of the fields read or None if
+                      all were read.
+        :type names: list
+        :returns: A filled out instance
+        :rtype: EtcdObj
+        """
+        prefix += '/'
+        fields = {}
+        dicts = {}
+        values = {}
+        indexes = {}
+        for name, field in obj._fields.items():
+            fields[field.name] = name
+            if field._subtree:
+                dicts[name] = values[name] = {}
+
+        for key, (value, index) in leaves.items():
+            if not key.startswith(prefix):
+                continue
+            parts = key[len(prefix):].split('/', 1)
+            name = fields.get(parts[0])
+            if name is None:
+                continue
+            if name in dicts:
+                if len(parts) == 2:
+                    dicts[name][parts[1]] = value
+                    indexes[key] = index
+            elif len(parts) == 1:
+                values[name] = obj._fields[name]._decode(value)
+                indexes[key] = index
+
+        for name, value in values.items():
+            setattr(obj, name, value)
+        obj._mark_synced(indexes=indexes, fields=names)
         return obj
 
 
@@ -113,6 +1556,9 @@ class Server(_Server):
     """
     Server implementation which creates an etcd.Client instance
     as its client.
+
+    Given endpoints it creates one etcd.Client per member and uses them
+    through an etcdobj.pool.ClientPool instead.
     """
 
     def __init__(self, etcd_kwargs={}, *args, **kwargs):
@@ -123,40 +1569,186 @@ class Server(_Server):
         :type client: dict
         :param args: All other non-keyword arguments.
         :type args: list
-        :param kwargs: All other keyword arguments.
+        :param kwargs: All other keyword arguments. endpoints may be a list
+                       of (host, port) tuples, one per member, and
+                       pool_kwargs the keyword arguments for the ClientPool.
         :type kwargs: dict
         :raises: ValueError
         """
         import etcd
-        super(Server, self).__init__(
-            etcd.Client(**etcd_kwargs), *args, **kwargs)
+        endpoints = kwargs.pop('endpoints', None)
+        pool_kwargs = kwargs.pop('pool_kwargs', {})
+        if endpoints:
+            client = ClientPool([
+                etcd.Client(host=host, port=port, **etcd_kwargs)
+                for host, port in endpoints], **pool_kwargs)
+        else:
+            client = etcd.Client(**etcd_kwargs)
+        super(Server, self).__init__(client, *args, **kwargs)
 
 
-class EtcdObj(object):
+class _EtcdObjMeta(type):
+    """
+    Metaclass for EtcdObj which collects the declared Fields once per class.
+    """
+
+    def __new__(mcs, name, bases, attrs):
+        """
+        Creates a new EtcdObj class.
+
+        :param name: The name of the class.
+        :type name: str
+        :param bases: The base classes.
+        :type bases: tuple
+        :param attrs: The class attributes.
+        :type attrs: dict
+        :returns: The new class
+        :rtype: type
+        """
+        cls = super(_EtcdObjMeta, mcs).__new__(mcs, name, bases, attrs)
+        # Inherited fields keep their position so a Field shared with a
+        # parent class points at the same slot in _values.
+        fields = collections.OrderedDict()
+        for base in reversed(cls.__mro__[1:]):
+            fields.update(getattr(base, '_fields', {}))
+        for key in dir(cls):
+            if not key.startswith('_'):
+                attr = getattr(cls, key)
+                if issubclass(attr.__class__, Field) and (
+                        fields.get(key) is not attr):
+                    fields.pop(key, None)
+                    fields[key] = attr
+        for index, key in enumerate(fields):
+            field = fields[key]
+            if field._index not in (None, index):
+                field = copy.copy(field)
+                setattr(cls, key, field)
+                fields[key] = field
+            field._index = index
+        cls._fields = types.MappingProxyType(fields)
+        # The __name__ set in a class body is hidden by type.__name__ on
+        # the class itself, so the key prefix is looked up here.
+        cls._prefix = None
+        for klass in cls.__mro__:
+            if '__name__' in vars(klass):
+                cls._prefix = '/{0}'.format(vars(klass)['__name__'])
+                break
+        cls._render_plan = mcs._compile(cls)
+        return cls
+
+    @staticmethod
+    def _compile(cls):
+        """
+        Builds the render plan of a class.
+
+        Each entry is (attribute, field, kind, key suffix, full key). The
+        full key is the key of the field for instances without an _id.
+        The kind says how a value is rendered: _RAW values are written
+        as is, _CONVERT values go through Field._render_value, _DICT
+        values are written one key per entry, _CODEC values are encoded
+        with the codec of the field and _CUSTOM fields override
+        Field._render or Field.render and are rendered through it.
+
+        Fields which override Field._set_value or Field.render, as fields
+        written for the per-field _value storage do, get their _cast and
+        _render routed through those overrides.
+
+        :param cls: The class to build the plan for.
+        :type cls: type
+        :returns: The render plan
+        :rtype: tuple
+        """
+        plan = []
+        for key, field in cls._fields.items():
+            field_cls = type(field)
+            if field_cls._set_value is not Field._set_value:
+                field._cast = field._cast_with_set_value
+            rendered = field_cls.render is not Field.render
+            if rendered:
+                field._render = field._render_with_render
+            if field.codec is not None:
+                kind = _CODEC
+            elif isinstance(field, DictField):
+                kind = _DICT
+                if rendered or field_cls._render is not DictField._render:
+                    kind = _CUSTOM
+            elif rendered or field_cls._render is not Field._render:
+                kind = _CUSTOM
+            elif field_cls._render_value is Field._render_value:
+                kind = _RAW
+            else:
+                kind = _CONVERT
+            suffix = '/' + field.name
+            full_key = (cls._prefix or '') + suffix
+            plan.append((key, field, kind, suffix, full_key))
+        return tuple(plan)
+
+
+class EtcdObj(_EtcdObjMeta('_EtcdObjBase', (object,), {'__slots__': ()})):
     """
     Class all objects which want to persist to etcd must subclass.
+
+    Field values are kept per instance in a list ordered like _fields and
+    are accessed through the Field descriptors. The field registry is
+    computed once per class by _EtcdObjMeta. Models may declare
+    __slots__ = () so instances carry no __dict__.
+
+    _synced holds the rendered key/value pairs as of the last read or
+    save so only changes need to be written. _indexes holds the etcd
+    modifiedIndex of each key as of the last read or save. _read holds
+    the attribute names of the fields read when only some fields were
+    read, see Server.query; the other fields are never written. _loaded
+    holds the attribute names of the fields loaded so far when the
+    instance was read with lazy, see Server.read.
+
+    Instances created with an _id are stored under /<__name__>/<_id>/
+    so a model can hold many objects. Without one the fields are stored
+    directly under /<__name__>/. A model should use one style only.
     """
 
-    _fields = []
+    __slots__ = (
+        '_values', '_synced', '_indexes', '_read', '_loaded', '_id')
+
+    #: Seconds until saved instances expire or None to keep them forever.
+    __ttl__ = None
+
+    #: The read consistency level or None for the Server's default.
+    __consistency__ = None
 
-    def __new__(cls, **kwargs):
+    #: The quorum flag given with writes or None for the Server's default.
+    __write_quorum__ = None
+
+    def __new__(cls, _id=None, **kwargs):
         """
         Creates a new instance.
 
+        :param _id: The id of the instance within its model.
+        :type _id: str
         :param kwargs: All keyword arguments.
         :type kwargs: dict
         :returns: The new instance
         :rtype: EtcdObj
+        :raises: ValueError
         """
-        cls = super(EtcdObj, cls).__new__(cls)
-        for key in dir(cls):
-            if not key.startswith('_'):
-                attr = getattr(cls, key)
-                if issubclass(attr.__class__, Field):
-                    cls._fields.append(key)
-                    if key in kwargs.keys():
-                        attr.value = kwargs[key]
-        return cls
+        if _id is not None:
+            _id = str(_id)
+            if not _id or '/' in _id:
+                raise ValueError(
+                    'Ids must be non-empty and contain no "/". '
+                    'Provided: {0}'.format(_id))
+        obj = super(EtcdObj, cls).__new__(cls)
+        obj._id = _id
+        values = [field._default() for field in cls._fields.values()]
+        for key, value in kwargs.items():
+            field = cls._fields.get(key)
+            if field is not None:
+                values[field._index] = field._cast(value)
+        obj._values = values
+        obj._synced = None
+        obj._indexes = None
+        obj._read = None
+        obj._loaded = None
+        return obj
 
     def __init__(self, **kwargs):  # pragma: no cover
         """
@@ -167,35 +1759,17 @@ class EtcdObj(object):
         """
         pass
 
-    def __setattr__(self, name, value):
-        """
-        Overridden setattr to catch fields or pass along if not a field.
-
-        :param name: The name of the field.
-        :type name: str
-        :param value: The value to set on name.
-        :type value: any
-        """
-        attr = object.__getattribute__(self, name)
-        if name in self._fields:
-            attr.value = value
-        else:
-            object.__setattr__(self, name, value)
-
-    def __getattribute__(self, name):
+    @property
+    def _path(self):
         """
-        Overridden  getattribute to catch fields or pass along if not a field.
+        The etcd directory the instance is stored under.
 
-        :param name: The name of the field.
-        :type name: str
-        :returns: The value of the field or attribute
-        :rtype: any
-        :raises: AttributeError
+        :returns: The key of the directory
+        :rtype: str
         """
-        if name in object.__getattribute__(self, '_fields'):
-            return object.__getattribute__(self, name).value
-        else:
-            return object.__getattribute__(self, name)
+        if self._id is None:
+            return self._prefix
+        return '{0}/{1}'.format(self._prefix, self._id)
 
     def render(self):
         """
@@ -204,27 +1778,200 @@ class EtcdObj(object):
         :returns: The structure to use for setting.
         :rtype: list(dict{key=str,value=any})
         """
-        rendered = []
-        for x in self._fields:
-            items = object.__getattribute__(self, x).render()
-            if type(items) != list:
-                items = [items]
-            for i in items:
-                i['key'] = '/{0}/{1}'.format(self.__name__, i['key'])
-                rendered.append(i)
-        return rendered
+        fields = self._fields
+        return [{
+            'name': fields[attr].name,
+            'key': key,
+            'value': value,
+            'dir': entry is not None,
+        } for attr, key, value, entry in self._render_items()]
+
+    @instrumented('render', _items_size, arg=0)
+    def _render_items(self, plan=None):
+        """
+        Renders the instance into compact tuples using the render plan.
+
+        :param plan: Entries of the render plan to render or None for all.
+        :type plan: tuple
+        :returns: (attribute, key, value, dict entry or None) tuples
+        :rtype: list
+        """
+        items = []
+        append = items.append
+        values = self._values
+        path = None
+        if self._id is not None:
+            path = self._path
+        for attr, field, kind, suffix, key in plan or self._render_plan:
+            value = values[field._index]
+            if path is not None:
+                key = path + suffix
+            if kind is _RAW:
+                append((attr, key, value, None))
+            elif kind is _CONVERT:
+                append((attr, key, field._render_value(value), None))
+            elif kind is _CODEC:
+                if value is not None:
+                    value = field.codec.encode(value)
+                append((attr, key, value, None))
+            elif kind is _DICT:
+                key += '/'
+                for entry, entry_value in value.items():
+                    append((attr, key + str(entry), entry_value, entry))
+            else:
+                rendered = field._render(value)
+                if type(rendered) is not list:
+                    rendered = [rendered]
+                base = key[:-len(suffix)] + '/'
+                for i in rendered:
+                    entry = None
+                    if i['dir']:
+                        entry = i['key'].split('/', 1)[1]
+                    append((attr, base + i['key'], i['value'], entry))
+        return items
+
+    def _changes(self, items, full=False):
+        """
+        Compares a rendering with the state at the last read or save.
+
+        :param items: The result of _render_items().
+        :type items: list
+        :param full: If True every rendered item is treated as changed.
+        :type full: bool
+        :returns: The items to write and the keys to delete
+        :rtype: tuple(list, list)
+        """
+        items = self._scope(items)
+        synced = self._synced
+        if full or synced is None:
+            return items, []
+        writes = []
+        current = set()
+        for item in items:
+            key = item[1]
+            current.add(key)
+            if key not in synced or synced[key] != item[2]:
+                writes.append(item)
+        deletes = [key for key in synced if key not in current]
+        return writes, deletes
+
+    def _mark_synced(self, items=None, indexes=None, fields=None):
+        """
+        Records the rendered state as matching what is stored in etcd.
+
+        :param items: The result of _render_items() or None to render now.
+        :type items: list
+        :param indexes: The modifiedIndex per key, if they were read.
+        :type indexes: dict
+        :param fields: With indexes, the attribute names of the fields
+                       read or None if all were read.
+        :type fields: list
+        """
+        if indexes is not None:
+            self._indexes = indexes
+            self._read = None if fields is None else frozenset(fields)
+            self._loaded = None
+        if items is None:
+            items = self._render_items()
+        self._synced = dict(
+            (item[1], _synced_value(item[2])) for item in self._scope(items))
+
+    def _scope(self, items):
+        """
+        Drops the items of fields which were not read, see _read.
+
+        :param items: The result of _render_items().
+        :type items: list
+        :returns: The items of the fields which were read
+        :rtype: list
+        """
+        read = self._read
+        if read is None:
+            return items
+        return [item for item in items if item[0] in read]
+
+    def _stored_index_keys(self):
+        """
+        Returns the index keys of the instance as of the last read or save.
+
+        :returns: The index keys
+        :rtype: list
+        """
+        keys = []
+        if self._id is None or not self._synced:
+            return keys
+        for field in self._fields.values():
+            if field.indexed:
+                value = self._synced.get(
+                    '{0}/{1}'.format(self._path, field.name))
+                if value is not None:
+                    keys.append(
+                        _index_key(type(self), field, value, self._id))
+        return keys
+
+    def _seen(self, key):
+        """
+        Checks if the stored state of a key is known from a read or save.
+
+        Keys of fields outside _read, and keys of fields a lazy read did
+        not load yet which were never saved, are not known.
+
+        :param key: A key under the directory of the instance.
+        :type key: str
+        :returns: True if the key was seen
+        :rtype: bool
+        """
+        if self._read is None and self._loaded is None:
+            return True
+        attr = self._attr_of(key)
+        if self._read is not None and attr not in self._read:
+            return False
+        if self._loaded is not None and attr not in self._loaded:
+            return key in (self._indexes or {})
+        return True
 
+    def _attr_of(self, key):
+        """
+        Returns the attribute name of the field a key belongs to.
+
+        :param key: A key under the directory of the instance.
+        :type key: str
+        :returns: The attribute name or None
+        :rtype: str
+        """
+        name = key[len(self._path) + 1:].split('/', 1)[0]
+        for attr, field in self._fields.items():
+            if field.name == name:
+                return attr
+        return None
+
+    @instrumented('json', lambda result, obj: len(result), arg=0)
     @property
     def json(self):
         """
         Dumps the entire object as a json structure.
         """
+        return serialize.dumps(self._native())
+
+    @instrumented('json', arg=0)
+    def dump_json(self, fp):
+        """
+        Writes the entire object as a json structure to fp.
+
+        :param fp: The text file-like object to write to.
+        :type fp: file
+        """
+        serialize.dump(self._native(), fp)
+
+    def _native(self):
+        """
+        Returns the object as plain Python data keyed by field name.
+
+        :returns: The data to encode.
+        :rtype: dict
+        """
+        values = self._values
         data = {}
-        for field in self._fields:
-            # FIXME: This is dumb :-)
-            attribute = object.__getattribute__(self, field)
-            data[attribute.name] = json.loads(attribute.json)
-            # Flatten if needed
-            if attribute.name in data[attribute.name].keys():
-                data[attribute.name] = data[attribute.name][attribute.name]
-        return json.dumps(data)
+        for field in self._fields.values():
+            data[field.name] = field._native(values[field._index])
+        return data
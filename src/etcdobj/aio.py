@@ -0,0 +1,292 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     (1) Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#
+#     (2) Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#
+#     (3)The name of the author may not be used to
+#     endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+asyncio Server implementation.
+
+This module is not imported by etcdobj itself.
+"""
+
+import asyncio
+import functools
+
+from etcdobj import CONSISTENCY_LEVELS, LINEARIZABLE, _Server
+
+#: Default number of etcd requests an AsyncServer runs at once.
+DEFAULT_CONCURRENCY = 16
+
+
+class AsyncServer(object):
+    """
+    Server implementation for clients with coroutine methods.
+
+    Independent keys are written and read concurrently, with at most
+    concurrency requests in flight per call.
+    """
+
+    #: AsyncServer has no cache so CACHED reads are SERIALIZABLE.
+    cache = None
+
+    _consistency = _Server._consistency
+    _write_quorum = _Server._write_quorum
+    _ttl = _Server._ttl
+    _index_key = _Server._index_key
+    _unknown_index_keys = _Server._unknown_index_keys
+    _index_diff = _Server._index_diff
+
+    def __init__(self, client, concurrency=DEFAULT_CONCURRENCY,
+                 consistency=None, write_quorum=True):
+        """
+        Creates a new instance of AsyncServer.
+
+        :param client: The asyncio etcd client to use.
+        :type client: object
+        :param concurrency: The maximum number of requests in flight.
+        :type concurrency: int
+        :param consistency: The default read consistency level.
+        :type consistency: str
+        :param write_quorum: The default quorum flag given with writes.
+        :type write_quorum: bool
+        :raises: ValueError
+        """
+        if concurrency < 1:
+            raise ValueError(
+                'concurrency must be at least 1. Provided: {0}'.format(
+                    concurrency))
+        if consistency is not None and (
+                consistency not in CONSISTENCY_LEVELS):
+            raise ValueError(
+                'Unknown consistency level: {0}'.format(consistency))
+        self.client = None
+        self.concurrency = concurrency
+        self.consistency = consistency
+        self.write_quorum = write_quorum
+        self._verify_client(client)
+
+    def _verify_client(self, client):
+        """
+        Does basic validation that the client can be used.
+
+        :param client: The client to check.
+        :type client: object
+        :raises: ValueError
+        """
+        missing = []
+        for method in ('write', 'read', 'delete'):
+            if not asyncio.iscoroutinefunction(getattr(client, method, None)):
+                missing.append(method)
+
+        if missing:
+            raise ValueError('The following coroutine methods are missing '
+                             'from the client: {0}'.format(', '.join(missing)))
+
+        self.client = client
+
+    async def _gather(self, calls):
+        """
+        Runs calls concurrently, at most concurrency at a time.
+
+        :param calls: Callables returning awaitables.
+        :type calls: list
+        :returns: The results in the same order as calls
+        :rtype: list
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(call):
+            async with semaphore:
+                return await call()
+
+        return await asyncio.gather(*[run(call) for call in calls])
+
+    async def _index_changes(self, obj, items, full=False):
+        """
+        Works out which index keys saving an object adds and removes.
+
+        :param obj: An instance that subclasses EtcdObj
+        :type obj: EtcdObj
+        :param items: The result of obj._render_items().
+        :type items: list
+        :param full: If True index keys are written even if unchanged.
+        :type full: bool
+        :returns: (field key, index key) tuples to write and to delete
+        :rtype: tuple(list, list)
+        """
+        keys = self._unknown_index_keys(obj)
+        values = await self._gather([
+            functools.partial(self._read_value, key) for key in keys])
+        return self._index_diff(obj, items, dict(zip(keys, values)), full)
+
+    async def _apply_ttl(self, obj, ttl):
+        """
+        Sets the TTL of the directory of an object, creating it if needed.
+
+        :param obj: An instance that subclasses EtcdObj
+        :type obj: EtcdObj
+        :param ttl: Seconds until the object expires.
+        :type ttl: int
+        :returns: True if the directory was created
+        :rtype: bool
+        """
+        import etcd
+        write = functools.partial(
+            self.client.write, obj._path, None, dir=True, ttl=ttl)
+        try:
+            await write(prevExist=True)
+            return False
+        except etcd.EtcdKeyNotFound:
+            pass
+        try:
+            await write(prevExist=False)
+        except etcd.EtcdAlreadyExist:
+            # Created by another writer in between
+            await write(prevExist=True)
+            return False
+        obj._synced = None
+        obj._indexes = None
+        obj._read = None
+        obj._loaded = None
+        return True
+
+    async def _read_value(self, key):
+        """
+        Reads the value of a key, or None if it does not exist.
+
+        :param key: The key to read.
+        :type key: str
+        :returns: The value
+        :rtype: str
+        """
+        import etcd
+        try:
+            etcd_resp = await self.client.read(key, quorum=True)
+        except etcd.EtcdKeyNotFound:
+            return None
+        return etcd_resp.value
+
+    async def _delete_key(self, key):
+        """
+        Deletes a single key, ignoring keys which are already gone.
+
+        :param key: The key to delete.
+        :type key: str
+        """
+        import etcd
+        try:
+            await self.client.delete(key)
+        except etcd.EtcdKeyNotFound:
+            pass
+
+    async def save(self, obj, write_quorum=None, ttl=None):
+        """
+        Save an object.
+
+        Removed DictField entries are deleted and index keys are updated
+        once the keys of the object are written. With a ttl (or a __ttl__
+        on the model) the directory of the object and its index keys are
+        given that TTL, see etcdobj.Server.save.
+
+        :param obj: An instance that subclasses EtcdObj
+        :type obj: EtcdObj
+        :param write_quorum: The quorum flag given with the writes.
+        :type write_quorum: bool
+        :param ttl: Seconds until the object expires.
+        :type ttl: int
+        :returns: The same instance
+        :rtype: EtcdObj
+        """
+        quorum = self._write_quorum(type(obj), write_quorum)
+        items = obj._render_items()
+        ttl = self._ttl(obj, ttl)
+        index_kwargs = {'quorum': quorum}
+        if ttl is not None:
+            await self._apply_ttl(obj, ttl)
+            index_kwargs['ttl'] = ttl
+        index_writes, index_deletes = await self._index_changes(
+            obj, items, ttl is not None)
+        deletes = obj._changes(items)[1]
+        deletes.extend(key for _, key in index_deletes)
+        await self._gather([
+            functools.partial(self.client.write, key, value, quorum=quorum)
+            for _, key, value, _ in obj._scope(items)])
+        calls = [
+            functools.partial(self.client.write, key, '', **index_kwargs)
+            for _, key in index_writes]
+        calls.extend(
+            functools.partial(self._delete_key, key) for key in deletes)
+        await self._gather(calls)
+        obj._mark_synced(items)
+        return obj
+
+    async def read(self, obj, consistency=None):
+        """
+        Retrieve an object.
+
+        :param obj: An instance that subclasses EtcdObj
+        :type obj: EtcdObj
+        :param consistency: One of etcdobj.CONSISTENCY_LEVELS.
+        :type consistency: str
+        :returns: A filled out instance
+        :rtype: EtcdObj
+        """
+        quorum = self._consistency(type(obj), consistency) == LINEARIZABLE
+        items = obj._render_items()
+        responses = await self._gather([
+            functools.partial(self.client.read, key, quorum=quorum)
+            for _, key, _, _ in items])
+        indexes = {}
+        for (attr, key, _, entry), etcd_resp in zip(items, responses):
+            indexes[key] = etcd_resp.modifiedIndex
+            field = obj._fields[attr]
+            if entry is not None:
+                field._set_entry(getattr(obj, attr), entry, etcd_resp.value)
+            else:
+                setattr(obj, attr, field._decode(etcd_resp.value))
+        obj._mark_synced(indexes=indexes)
+        return obj
+
+    async def delete(self, obj):
+        """
+        Delete an object and everything stored under its prefix.
+
+        Index keys of the object are removed as well.
+
+        :param obj: An instance that subclasses EtcdObj
+        :type obj: EtcdObj
+        :returns: The same instance
+        :rtype: EtcdObj
+        """
+        index_deletes = (await self._index_changes(obj, []))[1]
+        await self.client.delete(obj._path, recursive=True)
+        await self._gather([
+            functools.partial(self._delete_key, key)
+            for _, key in index_deletes])
+        obj._synced = None
+        obj._indexes = None
+        obj._read = None
+        obj._loaded = None
+        return obj
@@ -0,0 +1,264 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     (1) Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#
+#     (2) Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#
+#     (3)The name of the author may not be used to
+#     endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+A read cache kept fresh by an etcd watch.
+"""
+
+import collections
+import threading
+import time
+
+
+class ReadCache(object):
+    """
+    LRU cache of the values stored under object prefixes.
+
+    Entries are updated or invalidated from etcd watch events and are
+    never served once they are older than max_age seconds. A Server
+    given the cache starts the watch; without a running watch max_age
+    is the only bound on how stale entries get.
+    """
+
+    #: Watch actions which store a new value for a key.
+    _set_actions = ('set', 'create', 'update', 'compareAndSwap')
+
+    def __init__(self, maxsize=128, max_age=None, watch_key='/',
+                 clock=time.time):
+        """
+        Creates a new instance of ReadCache.
+
+        :param maxsize: The maximum number of object prefixes to keep.
+        :type maxsize: int
+        :param max_age: Seconds an entry may be served for or None.
+        :type max_age: float
+        :param watch_key: The key recursively watched for changes.
+        :type watch_key: str
+        :param clock: Callable returning the current time in seconds.
+        :type clock: callable
+        :raises: ValueError
+        """
+        if maxsize < 1:
+            raise ValueError(
+                'maxsize must be at least 1. Provided: {0}'.format(maxsize))
+        self.maxsize = maxsize
+        self.max_age = max_age
+        self.watch_key = watch_key
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.index = None
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def __len__(self):
+        """
+        Returns the number of cached prefixes.
+
+        :returns: The number of cached prefixes
+        :rtype: int
+        """
+        return len(self._entries)
+
+    def get(self, prefix):
+        """
+        Returns the cached values for prefix.
+
+        :param prefix: The object prefix.
+        :type prefix: str
+        :returns: A copy of the dict of key to (value, modifiedIndex) or
+                  None on a miss
+        :rtype: dict or None
+        """
+        with self._lock:
+            entry = self._entries.get(prefix)
+            if entry is not None and self.max_age is not None and (
+                    self.clock() - entry[0] > self.max_age):
+                del self._entries[prefix]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(prefix)
+            self.hits += 1
+            # The watch changes the cached dict in place
+            return dict(entry[2])
+
+    def set(self, prefix, values, index):
+        """
+        Caches the values read for prefix.
+
+        Values read before the last change the watch applied are not
+        stored: that change may belong to prefix and will not be seen
+        again.
+
+        :param prefix: The object prefix.
+        :type prefix: str
+        :param values: A dict of key to (value, modifiedIndex).
+        :type values: dict
+        :param index: The etcd index the values were read at.
+        :type index: int
+        """
+        with self._lock:
+            self._entries.pop(prefix, None)
+            if self.index is not None and (index or 0) < self.index:
+                return
+            self._entries[prefix] = [self.clock(), index, dict(values)]
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            if self.index is None:
+                self.index = index
+
+    def invalidate(self, prefix):
+        """
+        Drops the entry for prefix if it is cached.
+
+        :param prefix: The object prefix.
+        :type prefix: str
+        """
+        with self._lock:
+            self._entries.pop(prefix, None)
+
+    def clear(self):
+        """
+        Drops every entry.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def _find(self, key):
+        """
+        Returns the cached prefix which contains key.
+
+        :param key: The key to look up.
+        :type key: str
+        :returns: The prefix or None
+        :rtype: str or None
+        """
+        while key:
+            key = key.rsplit('/', 1)[0]
+            if key in self._entries:
+                return key
+        return None
+
+    def apply(self, event):
+        """
+        Updates or invalidates entries from an etcd watch event.
+
+        :param event: The watch event.
+        :type event: etcd.EtcdResult
+        """
+        with self._lock:
+            if event.modifiedIndex is not None:
+                self.index = max(self.index or 0, event.modifiedIndex)
+            if event.dir:
+                dirkey = event.key.rstrip('/') + '/'
+                for prefix in list(self._entries.keys()):
+                    if (prefix + '/').startswith(dirkey):
+                        del self._entries[prefix]
+                prefix = self._find(event.key)
+                if prefix is not None:
+                    del self._entries[prefix]
+                return
+
+            prefix = self._find(event.key)
+            if prefix is None:
+                return
+            entry = self._entries[prefix]
+            if event.modifiedIndex is not None and (
+                    event.modifiedIndex <= entry[1]):
+                # The entry was read after this change happened
+                return
+            if event.action in self._set_actions:
+                entry[2][event.key] = (event.value, event.modifiedIndex)
+            else:
+                entry[2].pop(event.key, None)
+            entry[1] = event.modifiedIndex
+
+    def watch_once(self, client, timeout=None):
+        """
+        Waits for the next change under watch_key and applies it.
+
+        :param client: The etcd client to watch with.
+        :type client: etcd.Client
+        :param timeout: Seconds to wait for a change.
+        :type timeout: float
+        :returns: The applied event
+        :rtype: etcd.EtcdResult
+        """
+        import etcd
+        index = None
+        if self.index is not None:
+            index = self.index + 1
+        try:
+            event = client.watch(
+                self.watch_key, index=index, timeout=timeout, recursive=True)
+        except etcd.EtcdEventIndexCleared:
+            # Changes were missed so nothing cached can be trusted
+            with self._lock:
+                self._entries.clear()
+                self.index = None
+            return None
+        self.apply(event)
+        return event
+
+    def start(self, client, timeout=60, retry_interval=1):
+        """
+        Starts a background thread which keeps the cache up to date.
+
+        :param client: The etcd client to watch with.
+        :type client: etcd.Client
+        :param timeout: Seconds each watch waits for a change.
+        :type timeout: float
+        :param retry_interval: Seconds to wait after a failed watch.
+        :type retry_interval: float
+        """
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+
+        def run():
+            while not self._stopped.is_set():
+                try:
+                    self.watch_once(client, timeout=timeout)
+                except Exception:
+                    self._stopped.wait(retry_interval)
+
+        self._thread = threading.Thread(target=run, name='etcdobj-cache')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops the background watch thread.
+        """
+        self._stopped.set()
+        self._thread = None
@@ -29,24 +29,214 @@
 All fields.
 """
 
+import array
+import base64
+import copy
 import datetime
 import json
+import re
+import sys
+
+from etcdobj import codecs
+
+#: Regex and slot in (year, month, day, hour, minute, second, microsecond)
+#: of each strptime directive the compiled parsers handle.
+_DIRECTIVES = {
+    'Y': ('([0-9]{4})', 0),
+    'm': ('([0-9]{2})', 1),
+    'd': ('([0-9]{2})', 2),
+    'H': ('([0-9]{2})', 3),
+    'M': ('([0-9]{2})', 4),
+    'S': ('([0-9]{2})', 5),
+    'f': ('([0-9]{1,6})', 6),
+}
+
+#: Formats whose values datetime.fromisoformat can read.
+_ISO_FORMAT = re.compile(r'%Y-%m-%d(?:[T ]%H:%M:%S(?:\.%f)?)?$')
+
+#: Parsers by datefmt, shared by all DateTimeFields.
+_PARSERS = {}
+
+
+def _iso_parser(datefmt):
+    """
+    Builds a parser for an ISO 8601 format using datetime.fromisoformat.
+
+    fromisoformat accepts more shapes than strptime, such as time zones,
+    so only values with the exact length, separators and trailing digits
+    of datefmt are passed to it.
+
+    :param datefmt: A format matched by _ISO_FORMAT.
+    :type datefmt: str
+    :returns: A function returning a datetime or None
+    :rtype: callable
+    """
+    shape = datefmt.replace('%Y', '0000').replace('%f', '000000')
+    shape = re.sub('%[mdHMS]', '00', shape)
+    length = len(shape)
+    separators = re.sub(r'\d', '', shape)
+    # Every separator is 3 characters after the one before it
+    stop = 3 * len(separators) + 2
+    tail = -6 if datefmt.endswith('%f') else -2
+    fromisoformat = datetime.datetime.fromisoformat
+
+    def parse(value):
+        if len(value) != length or value[4:stop:3] != separators:
+            return None
+        if not value[tail:].isdigit():
+            return None
+        return fromisoformat(value)
+    return parse
+
+
+def _regex_parser(datefmt):
+    """
+    Builds a parser for datefmt from a regex of fixed width fields.
+
+    :param datefmt: The datetime format.
+    :type datefmt: str
+    :returns: A function returning a datetime or None, or None if datefmt
+              uses directives other than those in _DIRECTIVES
+    :rtype: callable
+    """
+    pattern = []
+    slots = []
+    chars = iter(datefmt)
+    for char in chars:
+        if char != '%':
+            pattern.append(re.escape(char))
+            continue
+        char = next(chars, None)
+        if char == '%':
+            pattern.append('%')
+            continue
+        directive = _DIRECTIVES.get(char)
+        if directive is None or directive[1] in slots:
+            return None
+        pattern.append(directive[0])
+        slots.append(directive[1])
+    fullmatch = re.compile(''.join(pattern)).fullmatch
+    fraction = 6 in slots and slots.index(6)
+
+    def parse(value):
+        match = fullmatch(value)
+        if match is None:
+            return None
+        groups = match.groups()
+        parts = [1900, 1, 1, 0, 0, 0, 0]
+        for slot, text in zip(slots, groups):
+            parts[slot] = int(text)
+        if fraction is not False:
+            parts[6] = int(groups[fraction].ljust(6, '0'))
+        return datetime.datetime(*parts)
+    return parse
+
+
+def _datetime_parser(datefmt):
+    """
+    Returns a function which parses strings the way
+    datetime.datetime.strptime(value, datefmt) does.
+
+    ISO 8601 formats are read with datetime.fromisoformat and other
+    formats with a regex compiled once per datefmt. Values these can not
+    read, and formats with other directives, go through strptime so the
+    results and errors are always those of strptime.
+
+    :param datefmt: The datetime format.
+    :type datefmt: str
+    :returns: The parser
+    :rtype: callable
+    """
+    parser = _PARSERS.get(datefmt)
+    if parser is not None:
+        return parser
+    if _ISO_FORMAT.match(datefmt):
+        fast = _iso_parser(datefmt)
+    else:
+        fast = _regex_parser(datefmt)
+    strptime = datetime.datetime.strptime
+
+    if fast is None:
+        def parser(value):
+            return strptime(value, datefmt)
+    else:
+        def parser(value):
+            try:
+                result = fast(value)
+            except (TypeError, ValueError):
+                result = None
+            if result is None:
+                return strptime(value, datefmt)
+            return result
+    _PARSERS[datefmt] = parser
+    return parser
 
 
 class Field(object):
     """
     Base class for all fields.
+
+    A Field declared on an EtcdObj only describes how values are cast and
+    rendered. The values themselves are stored on each EtcdObj instance
+    and reached through the descriptor protocol.
     """
 
-    def __init__(self, name):
+    #: Position of the value in EtcdObj._values. Set by the owning class.
+    _index = None
+
+    #: True if values are stored as a directory of keys.
+    _subtree = False
+
+    def __init__(self, name, indexed=False, codec=None):
         """
         Initializes a new Field instance.
 
         :param name: The name of the field
         :type name: str
+        :param indexed: If True Server.save maintains an index of values.
+        :type indexed: bool
+        :param codec: Encodes values written to and read from etcd.
+        :type codec: etcdobj.codecs.Codec
         """
         self.name = name
-        self._value = None
+        self.indexed = indexed
+        self.codec = codec
+        self._value = self._default()
+
+    def __get__(self, instance, owner):
+        """
+        Returns the value of the field for an EtcdObj instance.
+
+        :param instance: The instance the field is accessed through.
+        :type instance: EtcdObj or None
+        :param owner: The class the field is declared on.
+        :type owner: type
+        :returns: The value for instance or the Field itself on the class
+        :rtype: mixed
+        """
+        if instance is None or self._index is None:
+            return self
+        return instance._values[self._index]
+
+    def __set__(self, instance, value):
+        """
+        Sets the value of the field for an EtcdObj instance.
+
+        :param instance: The instance the field is set through.
+        :type instance: EtcdObj
+        :param value: The value to use.
+        :type value: mixed
+        """
+        instance._values[self._index] = self._cast(value)
+
+    def _default(self):
+        """
+        Returns the value a new instance of the field starts with.
+
+        :returns: The default value
+        :rtype: mixed
+        """
+        return None
 
     @property
     def json(self):
@@ -56,7 +246,29 @@ class Field(object):
         :returns: JSON representation.
         :rtype: str
         """
-        return json.dumps({self.name: self._value})
+        return self._json(self._value)
+
+    def _json(self, value):
+        """
+        Returns a json version of the field for the given value.
+
+        :param value: The value to serialize.
+        :type value: mixed
+        :returns: JSON representation.
+        :rtype: str
+        """
+        return json.dumps({self.name: self._native(value)})
+
+    def _native(self, value):
+        """
+        Returns the value as plain Python data which can be JSON encoded.
+
+        :param value: The value to convert.
+        :type value: mixed
+        :returns: A JSON compatible value
+        :rtype: mixed
+        """
+        return value
 
     @property
     def value(self):
@@ -85,22 +297,150 @@ class Field(object):
         :param value: The value to use.
         :type value: mixed
         """
-        self._value = value
+        self._value = self._cast(value)
+
+    def _cast(self, value):
+        """
+        Internal method that converts a value to what the field stores.
+
+        :param value: The value to convert.
+        :type value: mixed
+        :returns: The converted value
+        :rtype: mixed
+        """
+        return value
 
     def render(self):
         """
         Renders the field into a structure that can be persisted to etcd.
 
+        :returns: A structure to be used with etcd
+        :rtype: dict
+        """
+        return self._render(self._value)
+
+    def _detached(self, value):
+        """
+        Returns a copy of the field holding value in _value.
+
+        Subclasses which override _set_value or render work on _value,
+        so EtcdObj calls them on a copy to keep values per instance.
+
+        :param value: The value the copy holds.
+        :type value: mixed
+        :returns: The copy
+        :rtype: Field
+        """
+        field = copy.copy(self)
+        field.__dict__.pop('_cast', None)
+        field.__dict__.pop('_render', None)
+        field._value = value
+        return field
+
+    def _cast_with_set_value(self, value):
+        """
+        Converts a value through an overridden _set_value.
+
+        :param value: The value to convert.
+        :type value: mixed
+        :returns: The converted value
+        :rtype: mixed
+        """
+        field = self._detached(None)
+        field._set_value(value)
+        return field._value
+
+    def _render_with_render(self, value):
+        """
+        Renders a value through an overridden render.
+
+        :param value: The value to render.
+        :type value: mixed
+        :returns: A structure to be used with etcd
+        :rtype: dict or list
+        """
+        return self._detached(value).render()
+
+    def _render(self, value):
+        """
+        Renders the given value into a structure that can be persisted.
+
+        :param value: The value to render.
+        :type value: mixed
         :returns: A structure to be used with etcd
         :rtype: dict
         """
         return {
             'name': self.name,
             'key': self.name,
-            'value': self._value,
+            'value': self._encode(value),
             'dir': False,
         }
 
+    def _encode(self, value):
+        """
+        Converts a value to what is written to etcd, using the codec if
+        the field has one.
+
+        :param value: The value to convert.
+        :type value: mixed
+        :returns: The value to write
+        :rtype: mixed
+        """
+        if self.codec is None:
+            return self._render_value(value)
+        if value is not None:
+            return self.codec.encode(value)
+        return value
+
+    def _decode(self, value):
+        """
+        Decodes a value read from etcd if the field has a codec.
+
+        :param value: The value read from etcd.
+        :type value: str
+        :returns: The decoded value
+        :rtype: mixed
+        """
+        if self.codec is not None and value is not None:
+            return self.codec.decode(value)
+        return value
+
+    def _load(self, value):
+        """
+        Converts a value read from etcd to what the field stores.
+
+        :param value: The value read from etcd.
+        :type value: str
+        :returns: The converted value
+        :rtype: mixed
+        """
+        return self._cast(self._decode(value))
+
+    def _set_entry(self, value, entry, item):
+        """
+        Stores one entry read from etcd in the current value.
+
+        :param value: The current value of the field.
+        :type value: mixed
+        :param entry: The key of the entry.
+        :type entry: str
+        :param item: The value read from etcd.
+        :type item: str
+        """
+        value[entry] = item
+
+    def _render_value(self, value):
+        """
+        Converts a value to what is written to etcd.
+
+        :param value: The value to convert.
+        :type value: mixed
+        :returns: The value to write
+        :rtype: mixed
+        """
+        return value
+
 
 class _CastField(Field):  # pragma: no cover
     """
@@ -108,14 +448,16 @@ class _CastField(Field):  # pragma: no cover
     """
     _caster = None
 
-    def _set_value(self, value):
+    def _cast(self, value):
         """
-        Internal method that sets the field value.
+        Internal method that converts a value to what the field stores.
 
-        :param value: The value to use.
+        :param value: The value to convert.
         :type value: mixed
+        :returns: The converted value
+        :rtype: mixed
         """
-        self._value = self._caster(value)
+        return self._caster(value)
 
 
 class IntField(_CastField):
@@ -152,45 +494,43 @@ class DateTimeField(Field):
         """
         super(DateTimeField, self).__init__(name, *args, **kwargs)
         self._datefmt = datefmt
+        self._parse = _datetime_parser(datefmt)
 
-    def _set_value(self, value):
+    def _cast(self, value):
         """
-        Internal method that sets the field value.
+        Internal method that converts a value to what the field stores.
 
-        :param value: The value to use.
+        :param value: The value to convert.
         :type value: str or datetime.datetime
+        :returns: The converted value
+        :rtype: datetime.datetime
         :raises: TypeError
         """
         if type(value) is datetime.datetime:
-            self._value = value
-        else:
-            self._value = datetime.datetime.strptime(value, self._datefmt)
+            return value
+        return self._parse(value)
 
-    @property
-    def json(self):
+    def _native(self, value):
         """
-        Returns a json version of the field.
+        Returns the value as plain Python data which can be JSON encoded.
 
-        :returns: JSON representation.
+        :param value: The value to convert.
+        :type value: datetime.datetime
+        :returns: The formatted datetime
         :rtype: str
         """
-        return json.dumps({
-            self.name: datetime.datetime.strftime(self._value, self._datefmt),
-        })
+        return datetime.datetime.strftime(value, self._datefmt)
 
-    def render(self):
+    def _render_value(self, value):
         """
-        Renders the field into a structure that can be persisted to etcd.
+        Converts a value to what is written to etcd.
 
-        :returns: A structure to be used with etcd
-        :rtype: dict
+        :param value: The value to convert.
+        :type value: datetime.datetime
+        :returns: The formatted datetime
+        :rtype: str
         """
-        return {
-            'name': self.name,
-            'key': self.name,
-            'value': datetime.datetime.strftime(self._value, self._datefmt),
-            'dir': False,
-        }
+        return datetime.datetime.strftime(value, self._datefmt)
 
 
 class DictField(Field):
@@ -208,58 +548,301 @@ class DictField(Field):
         :type caster: dict
         :param kwargs: All keyword arguments.
         :type kwargs: dict
+        :raises: ValueError
         """
         super(DictField, self).__init__(name, *args, **kwargs)
+        if self.indexed:
+            raise ValueError('DictField can not be indexed')
         self._caster = caster
-        self._value = {}
+        # Only callable casters are applied
+        self._casters = dict(
+            (key, func) for key, func in caster.items() if callable(func))
+        # With a codec the whole dict is stored under a single key
+        self._subtree = self.codec is None
 
-    @property
-    def json(self):
+    def _default(self):
         """
-        Returns a json version of the field.
+        Returns the value a new instance of the field starts with.
+
+        :returns: A new, empty dict
+        :rtype: dict
+        """
+        return {}
+
+    def _json(self, value):
+        """
+        Returns a json version of the field for the given value.
 
         .. note::
 
            DictField serializes the dictionary without the name.
 
+        :param value: The value to serialize.
+        :type value: dict
         :returns: JSON representation.
         :rtype: str
         """
-        return json.dumps(self._value)
+        return json.dumps(self._native(value))
 
-    def _set_value(self, value):
+    def _cast(self, value):
         """
-        Internal method that sets the field value.
+        Internal method that converts a value to what the field stores.
 
-        :param value: The value to use.
+        Values with a caster are converted into a new dict, leaving the
+        given dict untouched.
+
+        :param value: The value to convert.
         :type value: dict
+        :returns: The converted value
+        :rtype: dict
         :raises: TypeError
         """
         if type(value) != dict:
             raise TypeError('Must use dict. Provided: {0}'.format(type(value)))
 
-        # Force casting if we were given a caster.
-        if self._caster:
-            for x in value.keys():
-                caster = self._caster.get(x, None)
-                if callable(caster):
-                    value[x] = caster(value[x])
-
-        super(DictField, self)._set_value(value)
-
-    def render(self):
+        # Force casting if we were given a caster. Walk whichever of the
+        # casters and the value is smaller.
+        casters = self._casters
+        cast = None
+        if len(casters) < len(value):
+            for x, caster in casters.items():
+                if x in value:
+                    if cast is None:
+                        cast = dict(value)
+                    cast[x] = caster(value[x])
+        else:
+            get = casters.get
+            for x, item in value.items():
+                caster = get(x)
+                if caster is not None:
+                    if cast is None:
+                        cast = dict(value)
+                    cast[x] = caster(item)
+        if cast is None:
+            return value
+        return cast
+
+    def _render(self, value):
         """
-        Renders the field into a structure that can be persisted to etcd.
+        Renders the given value into a structure that can be persisted.
 
+        :param value: The value to render.
+        :type value: dict
         :returns: A list of structures to be used with etcd
         :rtype: list
         """
+        if self.codec is not None:
+            return [super(DictField, self)._render(value)]
         rendered = []
-        for x in self._value.keys():
+        for x in value.keys():
             rendered.append({
                 'name': self.name,
                 'key': '{0}/{1}'.format(self.name, x),
-                'value': self._value[x],
+                'value': value[x],
+                'dir': True,
+            })
+        return rendered
+
+
+class _ArrayField(Field):
+    """
+    Base class for fields holding numbers in an array.array.
+
+    Values are stored in etcd as base64 of the little endian array bytes,
+    either as a single key or, with chunk_size, as one key per chunk of
+    chunk_size elements so only changed chunks are written on save.
+    Bytes of at least threshold are compressed first, see
+    etcdobj.codecs.Compressed. memoryview(value) gives the numbers
+    without copying.
+    """
+
+    #: The default array.array typecode.
+    typecode = None
+
+    #: The typecodes which may be used instead of the default.
+    typecodes = ()
+
+    def __init__(self, name, chunk_size=None, typecode=None,
+                 compression='zlib', threshold=256, *args, **kwargs):
+        """
+        Initializes an instance of an array field.
+
+        :param name: The name of the field
+        :type name: str
+        :param chunk_size: Elements per key or None to use a single key.
+        :type chunk_size: int
+        :param typecode: An array.array typecode from typecodes.
+        :type typecode: str
+        :param compression: An algorithm from etcdobj.codecs.ALGORITHMS
+                            or None to store the bytes uncompressed.
+        :type compression: str
+        :param threshold: The smallest size in bytes which is compressed.
+        :type threshold: int
+        :param args: All non-keyword arguments.
+        :type args: list
+        :param kwargs: All keyword arguments.
+        :type kwargs: dict
+        :raises: ValueError, ImportError
+        """
+        if typecode is not None:
+            if typecode not in self.typecodes:
+                raise ValueError('typecode must be one of {0}'.format(
+                    ', '.join(self.typecodes)))
+            self.typecode = typecode
+        super(_ArrayField, self).__init__(name, *args, **kwargs)
+        if self.indexed:
+            raise ValueError('{0} can not be indexed'.format(
+                type(self).__name__))
+        if self.codec is not None:
+            raise ValueError('{0} can not use a codec'.format(
+                type(self).__name__))
+        if chunk_size is not None and chunk_size < 1:
+            raise ValueError('chunk_size must be at least 1')
+        self.chunk_size = chunk_size
+        self._subtree = chunk_size is not None
+        self._compressed = None
+        if compression is not None:
+            self._compressed = codecs.Compressed(
+                codecs.BytesCodec(), threshold, compression)
+
+    def _default(self):
+        """
+        Returns the value a new instance of the field starts with.
+
+        :returns: A new, empty array
+        :rtype: array.array
+        """
+        return array.array(self.typecode)
+
+    def _cast(self, value):
+        """
+        Internal method that converts a value to what the field stores.
+
+        Arrays of the field's typecode are kept as is. Text and dicts of
+        chunk number to text are decoded as read from etcd. Any other
+        iterable of numbers is copied into a new array.
+
+        :param value: The value to convert.
+        :type value: array.array, str, dict or iterable
+        :returns: The converted value
+        :rtype: array.array
+        :raises: TypeError, ValueError
+        """
+        if type(value) is array.array and value.typecode == self.typecode:
+            return value
+        if type(value) is str:
+            return self._unpack(value)
+        if type(value) is dict:
+            cast = array.array(self.typecode)
+            for chunk in sorted(value, key=int):
+                cast.extend(self._unpack(value[chunk]))
+            return cast
+        return array.array(self.typecode, value)
+
+    def _pack(self, value):
+        """
+        Converts an array to the text written to etcd.
+
+        :param value: The array to convert.
+        :type value: array.array
+        :returns: base64 of the little endian bytes
+        :rtype: str
+        """
+        if sys.byteorder == 'big':  # pragma: no cover
+            value = array.array(self.typecode, value)
+            value.byteswap()
+        if self._compressed is not None:
+            value = self._compressed.dumps(value)
+        return base64.b64encode(value).decode('ascii')
+
+    def _unpack(self, text):
+        """
+        Converts text read from etcd to an array.
+
+        :param text: base64 of the little endian bytes.
+        :type text: str
+        :returns: The array
+        :rtype: array.array
+        """
+        data = base64.b64decode(text)
+        if self._compressed is not None:
+            data = self._compressed.loads(data)
+        value = array.array(self.typecode)
+        value.frombytes(data)
+        if sys.byteorder == 'big':  # pragma: no cover
+            value.byteswap()
+        return value
+
+    def _native(self, value):
+        """
+        Returns the value as plain Python data which can be JSON encoded.
+
+        :param value: The value to convert.
+        :type value: array.array
+        :returns: The numbers
+        :rtype: list
+        """
+        return value.tolist()
+
+    def _render(self, value):
+        """
+        Renders the given value into a structure that can be persisted.
+
+        :param value: The value to render.
+        :type value: array.array
+        :returns: A structure, or a list of them when chunked
+        :rtype: dict or list
+        """
+        if self.chunk_size is None:
+            return super(_ArrayField, self)._render(value)
+        size = self.chunk_size
+        rendered = []
+        for x in range(0, len(value), size):
+            rendered.append({
+                'name': self.name,
+                'key': '{0}/{1}'.format(self.name, x // size),
+                'value': self._pack(value[x:x + size]),
                 'dir': True,
             })
         return rendered
+
+    def _render_value(self, value):
+        """
+        Converts a value to what is written to etcd.
+
+        :param value: The value to convert.
+        :type value: array.array
+        :returns: The packed array
+        :rtype: str
+        """
+        return self._pack(value)
+
+    def _set_entry(self, value, entry, item):
+        """
+        Stores one chunk read from etcd in the current value.
+
+        :param value: The current value of the field.
+        :type value: array.array
+        :param entry: The chunk number.
+        :type entry: str
+        :param item: The chunk read from etcd.
+        :type item: str
+        """
+        start = int(entry) * self.chunk_size
+        value[start:start + self.chunk_size] = self._unpack(item)
+
+
+class IntArrayField(_ArrayField):
+    """
+    A Field holding signed integers. Defaults to 64 bit ('q').
+    """
+    typecode = 'q'
+    typecodes = ('b', 'h', 'i', 'q')
+
+
+class FloatArrayField(_ArrayField):
+    """
+    A Field holding floats. Defaults to double precision ('d').
+    """
+    typecode = 'd'
+    typecodes = ('f', 'd')
@@ -0,0 +1,388 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     (1) Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#
+#     (2) Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#
+#     (3)The name of the author may not be used to
+#     endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Optional instrumentation of saves, reads, renders and JSON encoding.
+
+Instrumentation is off until enable() is called. Instrumented methods
+are only swapped for recording wrappers by enable() and swapped back by
+disable(), so while it is off the plain methods run at no extra cost.
+
+.. code-block:: python
+
+   from etcdobj import instrument
+
+   stats = instrument.enable()
+   stats.add_hook(after=lambda op, model, elapsed, size, error: ...)
+   ...
+   for (op, model), op_stats in stats.stats.items():
+       print(op, model._prefix, op_stats.count, op_stats.histogram.total)
+"""
+
+import bisect
+import functools
+import threading
+import time
+
+#: Upper bounds in seconds of the latency histogram buckets. They start
+#: at 10 microseconds for renders and go up to 10 seconds for slow
+#: round trips.
+DEFAULT_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+#: The Instrumentation in use or None when instrumentation is off.
+_active = None
+
+#: (class, attribute, plain, wrapper) for every instrumented attribute.
+_registry = []
+
+
+class Histogram(object):
+    """
+    A latency histogram with fixed buckets.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        Creates a new instance of Histogram.
+
+        :param buckets: Sorted upper bounds of the buckets in seconds.
+        :type buckets: tuple
+        """
+        self.buckets = tuple(buckets)
+        #: Observations per bucket. The last one counts everything above
+        #: the largest bound.
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        """
+        Records one observation.
+
+        :param value: The observed latency in seconds.
+        :type value: float
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def quantile(self, q):
+        """
+        Returns the upper bound of the bucket holding the q quantile.
+
+        :param q: The quantile between 0 and 1.
+        :type q: float
+        :returns: The bucket bound, inf if above all bounds, or None
+        :rtype: float or None
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+class OperationStats(object):
+    """
+    The counts, bytes and latencies of one operation on one model.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        Creates a new instance of OperationStats.
+
+        :param buckets: Upper bounds of the latency histogram buckets.
+        :type buckets: tuple
+        """
+        self.count = 0
+        self.errors = 0
+        self.bytes = 0
+        self.histogram = Histogram(buckets)
+
+
+class Instrumentation(object):
+    """
+    Collects OperationStats per (operation, model class) and runs hooks.
+
+    The operations are save, read, delete, render, json, cast and
+    hydrate. cast is the time spent setting values read from etcd onto an
+    object and hydrate a field of a lazily read object being read. bytes
+    counts the size of the values of the object as rendered for save,
+    read and render and the encoded size for json.
+
+    before hooks are called with (operation, model class). after hooks
+    are called with (operation, model class, seconds, bytes or None,
+    exception or None). Hooks run on the thread doing the operation.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, clock=time.perf_counter):
+        """
+        Creates a new instance of Instrumentation.
+
+        :param buckets: Upper bounds of the latency histogram buckets.
+        :type buckets: tuple
+        :param clock: Callable returning the current time in seconds.
+        :type clock: callable
+        """
+        self.buckets = buckets
+        self.clock = clock
+        self.stats = {}
+        self.before = []
+        self.after = []
+        self._lock = threading.Lock()
+
+    def add_hook(self, before=None, after=None):
+        """
+        Adds callbacks run before and after every operation.
+
+        :param before: Called with (operation, model class).
+        :type before: callable
+        :param after: Called with (operation, model class, seconds, bytes,
+                      error).
+        :type after: callable
+        """
+        if before is not None:
+            self.before.append(before)
+        if after is not None:
+            self.after.append(after)
+
+    def record(self, operation, model_cls, elapsed, size=None, error=None):
+        """
+        Records one operation.
+
+        :param operation: The name of the operation.
+        :type operation: str
+        :param model_cls: The class of the object the operation was on.
+        :type model_cls: type
+        :param elapsed: Seconds the operation took.
+        :type elapsed: float
+        :param size: The bytes handled or None if not known.
+        :type size: int
+        :param error: The exception the operation raised, if any.
+        :type error: Exception
+        """
+        with self._lock:
+            stats = self.stats.get((operation, model_cls))
+            if stats is None:
+                stats = OperationStats(self.buckets)
+                self.stats[(operation, model_cls)] = stats
+            stats.count += 1
+            if error is not None:
+                stats.errors += 1
+            if size is not None:
+                stats.bytes += size
+            stats.histogram.observe(elapsed)
+
+    def reset(self):
+        """
+        Drops every recorded stat.
+        """
+        with self._lock:
+            self.stats = {}
+
+    def call(self, operation, size, func, obj, args, kwargs):
+        """
+        Runs func, recording it as operation on obj.
+
+        :param operation: The name of the operation.
+        :type operation: str
+        :param size: Callable returning the bytes from (result, obj).
+        :type size: callable
+        :param func: The function to run.
+        :type func: callable
+        :param obj: The EtcdObj the operation is on.
+        :type obj: EtcdObj
+        :param args: Non-keyword arguments for func.
+        :type args: tuple
+        :param kwargs: Keyword arguments for func.
+        :type kwargs: dict
+        :returns: The result of func
+        :rtype: mixed
+        """
+        model_cls = type(obj)
+        for hook in self.before:
+            hook(operation, model_cls)
+        start = self.clock()
+        result = error = nbytes = None
+        try:
+            result = func(*args, **kwargs)
+            return result
+        except Exception as err:
+            error = err
+            raise
+        finally:
+            elapsed = self.clock() - start
+            if error is None and size is not None:
+                nbytes = size(result, obj)
+            self.record(operation, model_cls, elapsed, nbytes, error)
+            for hook in self.after:
+                hook(operation, model_cls, elapsed, nbytes, error)
+
+
+def enable(instrumentation=None):
+    """
+    Turns instrumentation on.
+
+    :param instrumentation: The Instrumentation to use or None for a new one.
+    :type instrumentation: Instrumentation
+    :returns: The Instrumentation in use
+    :rtype: Instrumentation
+    """
+    global _active
+    if instrumentation is None:
+        instrumentation = Instrumentation()
+    _active = instrumentation
+    for owner, name, _, wrapper in _registry:
+        setattr(owner, name, wrapper)
+    return instrumentation
+
+
+def disable():
+    """
+    Turns instrumentation off.
+    """
+    global _active
+    _active = None
+    for owner, name, plain, _ in _registry:
+        setattr(owner, name, plain)
+
+
+def active():
+    """
+    Returns the Instrumentation in use.
+
+    :returns: The Instrumentation or None when instrumentation is off
+    :rtype: Instrumentation or None
+    """
+    return _active
+
+
+def synced_size(result, obj):
+    """
+    Returns the size of the values of obj as of its last save or read.
+
+    :param result: The result of the operation.
+    :type result: mixed
+    :param obj: An instance that subclasses EtcdObj
+    :type obj: EtcdObj
+    :returns: The number of bytes
+    :rtype: int
+    """
+    return sum(len(str(value)) for value in (obj._synced or {}).values())
+
+
+def _wrap(func, operation, size, arg):
+    """
+    Returns a wrapper of func which records calls as operation.
+
+    :param func: The function to wrap.
+    :type func: callable
+    :param operation: The name of the operation.
+    :type operation: str
+    :param size: Callable returning the bytes from (result, obj).
+    :type size: callable
+    :param arg: The position of the EtcdObj among the arguments.
+    :type arg: int
+    :returns: The wrapper
+    :rtype: callable
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        instrumentation = _active
+        if instrumentation is None:
+            return func(*args, **kwargs)
+        return instrumentation.call(
+            operation, size, func, args[arg], args, kwargs)
+    return wrapper
+
+
+class _Instrumented(object):
+    """
+    Stands in for an instrumented method or property until its class is
+    created, then registers it and puts the plain version in its place.
+    """
+
+    def __init__(self, target, operation, size, arg):
+        """
+        Creates a new instance of _Instrumented.
+
+        :param target: The function or property to instrument.
+        :type target: callable or property
+        :param operation: The name of the operation.
+        :type operation: str
+        :param size: Callable returning the bytes from (result, obj).
+        :type size: callable
+        :param arg: The position of the EtcdObj among the arguments.
+        :type arg: int
+        """
+        self.target = target
+        self.operation = operation
+        self.size = size
+        self.arg = arg
+
+    def __set_name__(self, owner, name):
+        """
+        Registers the target once the owning class exists.
+
+        :param owner: The class the target was declared on.
+        :type owner: type
+        :param name: The attribute name of the target.
+        :type name: str
+        """
+        target = self.target
+        if isinstance(target, property):
+            wrapper = property(
+                _wrap(target.fget, self.operation, self.size, self.arg),
+                target.fset, target.fdel, target.__doc__)
+        else:
+            wrapper = _wrap(target, self.operation, self.size, self.arg)
+        _registry.append((owner, name, target, wrapper))
+        setattr(owner, name, target if _active is None else wrapper)
+
+
+def instrumented(operation, size=None, arg=1):
+    """
+    Marks a method or property of a class as an instrumented operation.
+
+    :param operation: The name of the operation.
+    :type operation: str
+    :param size: Callable returning the bytes from (result, obj).
+    :type size: callable
+    :param arg: The position of the EtcdObj among the arguments.
+    :type arg: int
+    :returns: The decorator
+    :rtype: callable
+    """
+    def decorator(target):
+        return _Instrumented(target, operation, size, arg)
+    return decorator
@@ -0,0 +1,259 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     (1) Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#
+#     (2) Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#
+#     (3)The name of the author may not be used to
+#     endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+TTL refresh for objects saved with a TTL.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+
+def refresh_ttl(client, path, ttl):
+    """
+    Resets the TTL of an existing directory without touching its keys.
+
+    :param client: The etcd client to use.
+    :type client: etcd.Client
+    :param path: The directory to refresh.
+    :type path: str
+    :param ttl: Seconds until the directory expires.
+    :type ttl: int
+    :returns: False if the directory does not exist (anymore)
+    :rtype: bool
+    """
+    import etcd
+    try:
+        client.write(path, None, dir=True, ttl=ttl, prevExist=True)
+    except etcd.EtcdKeyNotFound:
+        return False
+    return True
+
+
+class KeepAlive(object):
+    """
+    Keeps many objects saved with a TTL alive from one loop.
+
+    Every object is refreshed once a fraction of its TTL has passed by
+    resetting the TTL of its directory. The values are not written again;
+    only its index keys, as of the last read or save, are written with
+    the TTL again. Objects which already expired are dropped and
+    collected in lost.
+    """
+
+    def __init__(self, client, ratio=1.0 / 3, clock=time.time):
+        """
+        Creates a new instance of KeepAlive.
+
+        :param client: The etcd client to refresh with.
+        :type client: etcd.Client
+        :param ratio: The part of the TTL to wait before each refresh.
+        :type ratio: float
+        :param clock: Callable returning the current time in seconds.
+        :type clock: callable
+        :raises: ValueError
+        """
+        if not 0 < ratio < 1:
+            raise ValueError(
+                'ratio must be between 0 and 1. Provided: {0}'.format(ratio))
+        self.client = client
+        self.ratio = ratio
+        self.clock = clock
+        self.lost = []
+        self._leases = {}
+        self._schedule = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def __len__(self):
+        """
+        Returns the number of objects kept alive.
+
+        :returns: The number of objects kept alive
+        :rtype: int
+        """
+        return len(self._leases)
+
+    def add(self, obj, ttl=None):
+        """
+        Starts keeping an object alive.
+
+        The object should have been saved with the same TTL just before.
+
+        :param obj: An instance that subclasses EtcdObj
+        :type obj: EtcdObj
+        :param ttl: Seconds until the object expires or None for __ttl__.
+        :type ttl: int
+        :raises: ValueError
+        """
+        if ttl is None:
+            ttl = obj.__ttl__
+        if ttl is None:
+            raise ValueError(
+                'A ttl is required for {0}'.format(obj._path))
+        with self._lock:
+            lease = (obj, ttl, next(self._counter))
+            self._leases[obj._path] = lease
+            self._push(obj._path, lease, self.clock())
+
+    def remove(self, obj):
+        """
+        Stops keeping an object alive. It expires once its TTL runs out.
+
+        :param obj: An instance that subclasses EtcdObj
+        :type obj: EtcdObj
+        """
+        with self._lock:
+            self._leases.pop(obj._path, None)
+
+    def _push(self, path, lease, since):
+        """
+        Schedules the next refresh of a lease.
+
+        :param path: The directory to refresh.
+        :type path: str
+        :param lease: The (obj, ttl, id) of the lease.
+        :type lease: tuple
+        :param since: When the TTL was last reset.
+        :type since: float
+        """
+        heapq.heappush(
+            self._schedule, (since + lease[1] * self.ratio, lease[2], path))
+
+    def _current(self, entry):
+        """
+        Returns the lease a schedule entry is for if it is still kept.
+
+        :param entry: The schedule entry.
+        :type entry: tuple
+        :returns: The lease or None if it was removed or added again
+        :rtype: tuple or None
+        """
+        lease = self._leases.get(entry[2])
+        if lease is not None and lease[2] == entry[1]:
+            return lease
+        return None
+
+    def next_due(self):
+        """
+        Returns when the next refresh is due.
+
+        :returns: The time of the next refresh or None if nothing is kept
+        :rtype: float or None
+        """
+        with self._lock:
+            while self._schedule:
+                if self._current(self._schedule[0]) is not None:
+                    return self._schedule[0][0]
+                heapq.heappop(self._schedule)
+            return None
+
+    def refresh_due(self):
+        """
+        Refreshes every object whose refresh is due.
+
+        Refreshes which fail are tried again on the next loop and the
+        first error is raised once all due objects were handled.
+
+        :returns: The paths which were refreshed
+        :rtype: list
+        """
+        now = self.clock()
+        due = []
+        with self._lock:
+            while self._schedule and self._schedule[0][0] <= now:
+                entry = heapq.heappop(self._schedule)
+                lease = self._current(entry)
+                if lease is not None:
+                    due.append((entry[2], lease))
+        refreshed = []
+        error = None
+        for path, lease in due:
+            try:
+                alive = refresh_ttl(self.client, path, lease[1])
+                if alive:
+                    for key in lease[0]._stored_index_keys():
+                        self.client.write(key, '', ttl=lease[1])
+            except Exception as err:
+                with self._lock:
+                    heapq.heappush(self._schedule, (now, lease[2], path))
+                if error is None:
+                    error = err
+                continue
+            with self._lock:
+                if self._leases.get(path) is not lease:
+                    continue
+                if alive:
+                    self._push(path, lease, now)
+                    refreshed.append(path)
+                else:
+                    del self._leases[path]
+                    self.lost.append(lease[0])
+        if error is not None:
+            raise error
+        return refreshed
+
+    def start(self, interval=1, retry_interval=1):
+        """
+        Starts a background thread which refreshes objects when due.
+
+        :param interval: The longest time in seconds between two loops.
+        :type interval: float
+        :param retry_interval: Seconds to wait after a failed refresh.
+        :type retry_interval: float
+        """
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+
+        def run():
+            while not self._stopped.is_set():
+                try:
+                    self.refresh_due()
+                except Exception:
+                    self._stopped.wait(retry_interval)
+                    continue
+                wait = interval
+                due = self.next_due()
+                if due is not None:
+                    wait = max(0, min(interval, due - self.clock()))
+                self._stopped.wait(wait)
+
+        self._thread = threading.Thread(target=run, name='etcdobj-keepalive')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops the background refresh thread.
+        """
+        self._stopped.set()
+        self._thread = None
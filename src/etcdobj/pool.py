@@ -0,0 +1,320 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     (1) Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#
+#     (2) Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#
+#     (3)The name of the author may not be used to
+#     endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+A client which spreads requests over the members of an etcd cluster.
+"""
+
+import itertools
+import threading
+import time
+
+
+#: Strategies for picking the member which serves a read.
+ROUND_ROBIN = 'round_robin'
+LEAST_LOADED = 'least_loaded'
+
+
+class _Member(object):
+    """
+    The state kept for one member of a ClientPool.
+    """
+
+    __slots__ = ('client', 'in_flight', 'failures', 'retry_at')
+
+    def __init__(self, client):
+        """
+        Creates a new instance of _Member.
+
+        :param client: The client connected to the member.
+        :type client: etcd.Client
+        """
+        self.client = client
+        self.in_flight = 0
+        self.failures = 0
+        self.retry_at = None
+
+
+class ClientPool(object):
+    """
+    Spreads requests over one client per etcd member.
+
+    Reads which do not ask for quorum are sent to the members in turn
+    (round_robin) or to the member with the fewest requests in flight
+    (least_loaded). Quorum reads, writes and deletes go to the leader.
+
+    A member whose connection fails is ejected and only tried again once
+    its backoff, doubling with every failure in a row, has passed. Reads
+    are retried on the next member. Writes and deletes are not retried
+    as the failed request may have been applied; the leader is looked up
+    again on the next one.
+
+    ClientPool has the read, write, delete and watch methods of
+    etcd.Client so it can be given to _Server as its client.
+    """
+
+    def __init__(self, clients, strategy=ROUND_ROBIN, backoff=1,
+                 max_backoff=60, leader_ttl=30, clock=time.time):
+        """
+        Creates a new instance of ClientPool.
+
+        :param clients: One client per member.
+        :type clients: list
+        :param strategy: ROUND_ROBIN or LEAST_LOADED.
+        :type strategy: str
+        :param backoff: Seconds an ejected member is skipped at first.
+        :type backoff: float
+        :param max_backoff: The longest time a member is skipped.
+        :type max_backoff: float
+        :param leader_ttl: Seconds a member used in place of a leader which
+                           could not be matched is kept before asking again.
+        :type leader_ttl: float
+        :param clock: Callable returning the current time in seconds.
+        :type clock: callable
+        :raises: ValueError
+        """
+        if not clients:
+            raise ValueError('At least one client is required')
+        if strategy not in (ROUND_ROBIN, LEAST_LOADED):
+            raise ValueError('Unknown strategy: {0}'.format(strategy))
+        self.strategy = strategy
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.leader_ttl = leader_ttl
+        self.clock = clock
+        self.members = [_Member(client) for client in clients]
+        self._leader = None
+        self._leader_expires = None
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+
+    def _available(self):
+        """
+        Returns the members which are not ejected, soonest retried first.
+
+        If every member is ejected the one to be retried first is used.
+
+        :returns: The members to choose from
+        :rtype: list
+        """
+        now = self.clock()
+        members = [m for m in self.members
+                   if m.retry_at is None or m.retry_at <= now]
+        if not members:
+            members = [min(self.members, key=lambda m: m.retry_at)]
+        return members
+
+    def _pick(self, exclude=()):
+        """
+        Picks the member to send a read to.
+
+        :param exclude: Members which already failed this request.
+        :type exclude: collection
+        :returns: The member or None if all were excluded
+        :rtype: _Member or None
+        """
+        with self._lock:
+            members = [m for m in self._available() if m not in exclude]
+            if not members:
+                members = [m for m in self.members if m not in exclude]
+            if not members:
+                return None
+            start = next(self._turn) % len(members)
+            members = members[start:] + members[:start]
+            if self.strategy == LEAST_LOADED:
+                return min(members, key=lambda m: m.in_flight)
+            return members[0]
+
+    def _find_leader(self):
+        """
+        Returns the member which is the leader of the cluster.
+
+        The leader is asked for through the leader property of the
+        clients and matched on their base_uri. If it can not be matched,
+        for instance when the cluster advertises IPs and the clients use
+        host names, the member which answered is used for leader_ttl
+        seconds; etcd forwards to the leader.
+
+        :returns: The leader
+        :rtype: _Member
+        """
+        leader = self._leader
+        expires = self._leader_expires
+        if leader is not None and leader in self._available():
+            if expires is None or self.clock() < expires:
+                return leader
+        self._leader = None
+        for member in self._available():
+            try:
+                urls = self._call(member, 'leader', None, None)['clientURLs']
+            except Exception:
+                continue
+            for candidate in self.members:
+                if getattr(candidate.client, 'base_uri', None) in urls:
+                    self._leader = candidate
+                    self._leader_expires = None
+                    return candidate
+            # Every member names the same leader, so stop asking
+            self._leader = member
+            self._leader_expires = self.clock() + self.leader_ttl
+            return member
+        return self._available()[0]
+
+    def _call(self, member, method, args, kwargs, eject=True):
+        """
+        Calls a client method on a member, tracking its health.
+
+        :param member: The member to call.
+        :type member: _Member
+        :param method: The name of the client method.
+        :type method: str
+        :param args: Non-keyword arguments for the method, or None to read
+                     method as an attribute such as the leader property.
+        :type args: tuple
+        :param kwargs: Keyword arguments for the method.
+        :type kwargs: dict
+        :param eject: If a failed connection ejects the member.
+        :type eject: bool
+        :returns: The result of the method
+        :rtype: mixed
+        :raises: etcd.EtcdConnectionFailed
+        """
+        import etcd
+        with self._lock:
+            member.in_flight += 1
+        healthy = True
+        try:
+            attr = getattr(member.client, method)
+            if args is None:
+                return attr
+            return attr(*args, **kwargs)
+        except etcd.EtcdConnectionFailed:
+            healthy = False if eject else None
+            raise
+        finally:
+            with self._lock:
+                member.in_flight -= 1
+                if healthy:
+                    # Errors like a missing key still come from a member
+                    member.failures = 0
+                    member.retry_at = None
+                elif healthy is False:
+                    member.failures += 1
+                    member.retry_at = self.clock() + min(
+                        self.max_backoff,
+                        self.backoff * 2 ** (member.failures - 1))
+                    if self._leader is member:
+                        self._leader = None
+
+    def _read(self, method, args, kwargs, eject=True):
+        """
+        Sends a read to a member, retrying failed connections on others.
+
+        :param method: The name of the client method.
+        :type method: str
+        :param args: Non-keyword arguments for the method.
+        :type args: tuple
+        :param kwargs: Keyword arguments for the method.
+        :type kwargs: dict
+        :param eject: If a failed connection ejects the member.
+        :type eject: bool
+        :returns: The result of the method
+        :rtype: mixed
+        :raises: etcd.EtcdConnectionFailed
+        """
+        import etcd
+        tried = []
+        while True:
+            member = self._pick(tried)
+            if member is None:
+                raise etcd.EtcdConnectionFailed(
+                    'No member of the cluster could be reached')
+            try:
+                return self._call(member, method, args, kwargs, eject)
+            except etcd.EtcdConnectionFailed:
+                if not eject:
+                    raise
+                tried.append(member)
+
+    def read(self, key, **kwargs):
+        """
+        Reads a key from a member, or the leader with quorum.
+
+        :param key: The key to read.
+        :type key: str
+        :param kwargs: Passed along to etcd.Client.read.
+        :type kwargs: dict
+        :returns: The result of the read
+        :rtype: etcd.EtcdResult
+        """
+        if kwargs.get('quorum'):
+            return self._call(self._find_leader(), 'read', (key,), kwargs)
+        return self._read('read', (key,), kwargs)
+
+    def watch(self, key, **kwargs):
+        """
+        Waits for a change of key on a member.
+
+        A watch which times out fails like a lost connection so watches
+        never eject a member and are not retried.
+
+        :param key: The key to watch.
+        :type key: str
+        :param kwargs: Passed along to etcd.Client.watch.
+        :type kwargs: dict
+        :returns: The change
+        :rtype: etcd.EtcdResult
+        """
+        return self._read('watch', (key,), kwargs, eject=False)
+
+    def write(self, key, value, **kwargs):
+        """
+        Writes a key through the leader.
+
+        :param key: The key to write.
+        :type key: str
+        :param value: The value to write.
+        :type value: str
+        :param kwargs: Passed along to etcd.Client.write.
+        :type kwargs: dict
+        :returns: The result of the write
+        :rtype: etcd.EtcdResult
+        """
+        return self._call(self._find_leader(), 'write', (key, value), kwargs)
+
+    def delete(self, key, **kwargs):
+        """
+        Deletes a key through the leader.
+
+        :param key: The key to delete.
+        :type key: str
+        :param kwargs: Passed along to etcd.Client.delete.
+        :type kwargs: dict
+        :returns: The result of the delete
+        :rtype: etcd.EtcdResult
+        """
+        return self._call(self._find_leader(), 'delete', (key,), kwargs)
@@ -0,0 +1,121 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     (1) Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#
+#     (2) Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#
+#     (3)The name of the author may not be used to
+#     endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+JSON encoding with optional fast encoders.
+
+The standard library encoder is used unless set_encoder picks another.
+orjson and ujson are faster when installed but their output differs:
+no spaces, escaped "/" with ujson, no integers beyond 64 bits and NaN
+written as null with orjson.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import ujson
+except ImportError:  # pragma: no cover
+    ujson = None
+
+
+def _orjson_dumps(data):
+    """
+    Encodes data with orjson.
+
+    :param data: The data to encode.
+    :type data: mixed
+    :returns: JSON representation.
+    :rtype: str
+    """
+    return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+
+#: Available encoders by name, each a callable returning a str.
+ENCODERS = {'json': json.dumps}
+if ujson is not None:
+    ENCODERS['ujson'] = ujson.dumps
+if orjson is not None:
+    ENCODERS['orjson'] = _orjson_dumps
+
+_encoder = None
+
+
+def set_encoder(encoder=None):
+    """
+    Sets the encoder used by dumps and dump.
+
+    :param encoder: An encoder name from ENCODERS, a callable returning a
+                    str, or None for the standard library encoder.
+    :type encoder: str or callable
+    :raises: ValueError
+    """
+    global _encoder
+    if encoder is None:
+        encoder = json.dumps
+    if not callable(encoder):
+        if encoder not in ENCODERS:
+            raise ValueError('Unknown encoder {0}. Available: {1}'.format(
+                encoder, ', '.join(sorted(ENCODERS))))
+        encoder = ENCODERS[encoder]
+    _encoder = encoder
+
+
+def dumps(data):
+    """
+    Encodes data as JSON with the current encoder.
+
+    :param data: The data to encode.
+    :type data: mixed
+    :returns: JSON representation.
+    :rtype: str
+    """
+    return _encoder(data)
+
+
+def dump(data, fp):
+    """
+    Writes data as JSON to a text file-like object.
+
+    The standard library encoder writes in chunks as it encodes.
+
+    :param data: The data to encode.
+    :type data: mixed
+    :param fp: The file-like object to write to.
+    :type fp: file
+    """
+    if _encoder is json.dumps:
+        json.dump(data, fp)
+    else:
+        fp.write(_encoder(data))
+
+
+set_encoder()
@@ -0,0 +1,90 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     (1) Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#
+#     (2) Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#
+#     (3)The name of the author may not be used to
+#     endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Snapshot files holding etcd keys and values.
+
+A snapshot is newline-delimited JSON with one [key, value] array per
+line so it can be written and read back one key at a time.
+"""
+
+import json
+import mmap
+
+from etcdobj import serialize
+
+
+def write_snapshot(items, fp):
+    """
+    Writes (key, value) tuples to a snapshot.
+
+    :param items: The (key, value) tuples to write.
+    :type items: iterable
+    :param fp: The text file-like object to write to.
+    :type fp: file
+    :returns: The number of keys written
+    :rtype: int
+    """
+    count = 0
+    for key, value in items:
+        fp.write(serialize.dumps([key, value]))
+        fp.write('\n')
+        count += 1
+    return count
+
+
+def read_snapshot(path, use_mmap=True):
+    """
+    Yields the (key, value) tuples stored in a snapshot file.
+
+    :param path: The path of the snapshot file.
+    :type path: str
+    :param use_mmap: If True the file is memory-mapped instead of read.
+    :type use_mmap: bool
+    :returns: A generator of (key, value) tuples
+    :rtype: generator
+    """
+    with open(path, 'rb') as fp:
+        if use_mmap:
+            try:
+                data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files can not be mapped
+                return
+            lines = iter(data.readline, b'')
+        else:
+            data = None
+            lines = fp
+        try:
+            for line in lines:
+                line = line.strip()
+                if line:
+                    key, value = json.loads(line.decode('utf-8'))
+                    yield key, value
+        finally:
+            if data is not None:
+                data.close()
@@ -29,8 +29,10 @@
 Unit tests for etcdobj.
 """
 
+import threading
 import unittest
 
+import etcd
 import etcdobj
 
 from etcdobj import fields
@@ -46,6 +48,15 @@ class TestingObj(etcdobj.EtcdObj):
     anint = fields.IntField('anint')
 
 
+class DictTestingObj(etcdobj.EtcdObj):
+    """
+    An EtcdObj with a DictField for testing.
+    """
+    __name__ = 'dicttesting'
+    anint = fields.IntField('anint')
+    adict = fields.DictField('adict', {'count': int})
+
+
 class TestCase(unittest.TestCase):
     """
     Parent class for all TestCases.
@@ -67,3 +78,246 @@ class TestCase(unittest.TestCase):
         Called after every test.
         """
         self.client = None
+
+
+class FakeClient(object):
+    """
+    A small in-memory stand in for etcd.Client which models the v2 key tree.
+    """
+
+    def __init__(self):
+        """
+        Creates a new, empty FakeClient.
+        """
+        self.data = {}
+        self.indexes = {}
+        self.events = []
+        self.index = 0
+        self.calls = []
+        self.fail_keys = set()
+        self.lock = threading.RLock()
+
+    def load(self, data):
+        """
+        Stores every key and value in data.
+
+        :param data: The keys and values to store.
+        :type data: dict
+        """
+        for key in sorted(data.keys()):
+            self._set(key, data[key])
+
+    def _node(self, key, recursive):
+        """
+        Builds an etcd v2 style node structure for key.
+
+        :param key: The key to build the node for.
+        :type key: str
+        :param recursive: If children should also be expanded.
+        :type recursive: bool
+        :returns: The node structure or None if it does not exist.
+        :rtype: dict or None
+        """
+        if key in self.data:
+            return self._leaf(key)
+        prefix = key.rstrip('/') + '/'
+        children = {}
+        for k in sorted(self.data.keys()):
+            if k.startswith(prefix):
+                name = k[len(prefix):].split('/')[0]
+                children.setdefault(name, prefix + name)
+        if not children:
+            return None
+        nodes = []
+        for name in sorted(children.keys()):
+            child = children[name]
+            if recursive:
+                nodes.append(self._node(child, recursive))
+            elif child in self.data:
+                nodes.append(self._leaf(child))
+            else:
+                nodes.append({'key': child, 'dir': True})
+        return {'key': key, 'dir': True, 'nodes': nodes}
+
+    def _leaf(self, key):
+        """
+        Builds an etcd v2 style node structure for a stored key.
+
+        :param key: The key to build the node for.
+        :type key: str
+        :returns: The node structure.
+        :rtype: dict
+        """
+        return {
+            'key': key,
+            'value': self.data[key],
+            'modifiedIndex': self.indexes[key],
+        }
+
+    def _set(self, key, value, action='set'):
+        """
+        Stores a value, bumping the index and recording a watch event.
+
+        :param key: The key to store.
+        :type key: str
+        :param value: The value to store.
+        :type value: str
+        :param action: The etcd action to record.
+        :type action: str
+        :returns: The result of the change.
+        :rtype: etcd.EtcdResult
+        """
+        with self.lock:
+            self.index += 1
+            self.data[key] = value
+            self.indexes[key] = self.index
+            result = etcd.EtcdResult(action, self._leaf(key))
+            self.events.append(result)
+            return result
+
+    def write(self, key, value, **kwargs):
+        """
+        Fake write.
+        """
+        self.calls.append(('write', key, kwargs))
+        if key in self.fail_keys:
+            raise etcd.EtcdException('Write failed for {0}'.format(key))
+        with self.lock:
+            self._compare(key, kwargs)
+            return self._set(key, value)
+
+    def _compare(self, key, conditions):
+        """
+        Checks prevIndex and prevExist conditions like etcd does.
+
+        :param key: The key being changed.
+        :type key: str
+        :param conditions: The keyword arguments given with the change.
+        :type conditions: dict
+        :raises: etcd.EtcdException
+        """
+        if conditions.get('prevExist') is False and key in self.data:
+            raise etcd.EtcdAlreadyExist('Key already exists : ' + key)
+        if 'prevIndex' in conditions:
+            if key not in self.data:
+                raise etcd.EtcdKeyNotFound('Key not found : ' + key)
+            if self.indexes[key] != conditions['prevIndex']:
+                raise etcd.EtcdCompareFailed('Compare failed : ' + key)
+
+    def watch(self, key, index=None, timeout=None, recursive=None):
+        """
+        Fake watch returning the first recorded event at or after index.
+        """
+        self.calls.append(('watch', key, dict(
+            index=index, timeout=timeout, recursive=recursive)))
+        if index is None:
+            index = self.index + 1
+        prefix = key.rstrip('/') + '/'
+        for event in self.events:
+            if event.modifiedIndex >= index and (
+                    event.key == key or
+                    (recursive and event.key.startswith(prefix))):
+                return event
+        raise etcd.EtcdConnectionFailed('Watch timed out')
+
+    def read(self, key, recursive=False, **kwargs):
+        """
+        Fake read.
+        """
+        self.calls.append(('read', key, dict(recursive=recursive, **kwargs)))
+        node = self._node(key, recursive)
+        if node is None:
+            raise etcd.EtcdKeyNotFound('Key not found : {0}'.format(key))
+        return etcd.EtcdResult('get', node)
+
+    def delete(self, key, recursive=False, **kwargs):
+        """
+        Fake delete.
+        """
+        self.calls.append(('delete', key, dict(recursive=recursive, **kwargs)))
+        if self._node(key, False) is None or (
+                not recursive and key not in self.data):
+            raise etcd.EtcdKeyNotFound('Key not found : ' + key)
+        self._compare(key, kwargs)
+        prefix = key.rstrip('/') + '/'
+        for k in sorted(self.data.keys()):
+            if k == key or (recursive and k.startswith(prefix)):
+                self.index += 1
+                del self.data[k]
+                del self.indexes[k]
+                self.events.append(etcd.EtcdResult(
+                    'delete', {'key': k, 'modifiedIndex': self.index}))
+        return etcd.EtcdResult('delete', {'key': key})
+
+
+class TxnFakeClient(FakeClient):
+    """
+    A FakeClient which also supports atomic transactions.
+    """
+
+    def txn(self, items):
+        """
+        Fake transaction. Nothing is applied if any key fails.
+        """
+        self.calls.append(('txn', [key for key, _ in items], {}))
+        for key, _ in items:
+            if key in self.fail_keys:
+                raise etcd.EtcdException('Txn failed for {0}'.format(key))
+        for key, value in items:
+            self._set(key, value)
+        return True
+
+
+class TtlFakeClient(FakeClient):
+    """
+    A FakeClient which also models directories and keys with a TTL.
+    """
+
+    def __init__(self):
+        """
+        Creates a new, empty TtlFakeClient. Time only moves through now.
+        """
+        super(TtlFakeClient, self).__init__()
+        self.now = 0
+        self.expires = {}
+
+    def _expire(self):
+        """
+        Removes keys and directories whose TTL ran out.
+        """
+        for path, expires in list(self.expires.items()):
+            if expires <= self.now:
+                del self.expires[path]
+                prefix = path + '/'
+                for key in list(self.data.keys()):
+                    if key == path or key.startswith(prefix):
+                        del self.data[key]
+                        del self.indexes[key]
+
+    def write(self, key, value, **kwargs):
+        """
+        Fake write which also handles directories.
+        """
+        self._expire()
+        if not kwargs.get('dir'):
+            result = super(TtlFakeClient, self).write(key, value, **kwargs)
+            if 'ttl' in kwargs:
+                self.expires[key] = self.now + kwargs['ttl']
+            else:
+                self.expires.pop(key, None)
+            return result
+        self.calls.append(('write', key, kwargs))
+        exists = key in self.expires or self._node(key, False) is not None
+        if kwargs.get('prevExist') is True and not exists:
+            raise etcd.EtcdKeyNotFound('Key not found : ' + key)
+        if kwargs.get('prevExist') is False and exists:
+            raise etcd.EtcdAlreadyExist('Key already exists : ' + key)
+        self.expires[key] = self.now + kwargs['ttl']
+        return etcd.EtcdResult('update', {'key': key, 'dir': True})
+
+    def read(self, key, recursive=False, **kwargs):
+        """
+        Fake read which skips expired keys.
+        """
+        self._expire()
+        return super(TtlFakeClient, self).read(key, recursive, **kwargs)
@@ -0,0 +1,132 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     (1) Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#
+#     (2) Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#
+#     (3)The name of the author may not be used to
+#     endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Unittests for the asyncio Server.
+"""
+
+import asyncio
+
+from mock import MagicMock
+
+from . import DictTestingObj, FakeClient, TestCase
+
+from etcdobj.aio import AsyncServer
+
+
+class AsyncFakeClient(object):
+    """
+    An asyncio wrapper around FakeClient which tracks concurrency.
+    """
+
+    def __init__(self):
+        """
+        Creates a new AsyncFakeClient.
+        """
+        self.fake = FakeClient()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def _call(self, method, *args, **kwargs):
+        """
+        Calls method on the FakeClient after yielding to the loop.
+        """
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.001)
+            return getattr(self.fake, method)(*args, **kwargs)
+        finally:
+            self.in_flight -= 1
+
+    async def write(self, *args, **kwargs):
+        return await self._call('write', *args, **kwargs)
+
+    async def read(self, *args, **kwargs):
+        return await self._call('read', *args, **kwargs)
+
+    async def delete(self, *args, **kwargs):
+        return await self._call('delete', *args, **kwargs)
+
+
+class TestAsyncServer(TestCase):
+    """
+    Tests for AsyncServer.
+    """
+
+    def setUp(self):
+        """
+        Executes before each test.
+        """
+        self.client = AsyncFakeClient()
+        self.server = AsyncServer(self.client, concurrency=3)
+        self.obj = DictTestingObj(
+            anint=1, adict=dict(('k{0}'.format(x), x) for x in range(9)))
+
+    def test_verify_client(self):
+        """
+        Verify the client must provide coroutine methods.
+        """
+        self.assertRaises(ValueError, AsyncServer, MagicMock())
+        self.assertRaises(ValueError, AsyncServer, self.client, concurrency=0)
+
+    def test_save_and_read(self):
+        """
+        Verify save and read run concurrently up to the limit.
+        """
+        asyncio.run(self.server.save(self.obj))
+        self.assertEquals(10, len(self.client.fake.data))
+        self.assertEquals(3, self.client.max_in_flight)
+
+        self.client.fake.write('/dicttesting/anint', '7')
+        self.client.max_in_flight = 0
+        obj = asyncio.run(self.server.read(DictTestingObj(
+            adict=dict(('k{0}'.format(x), None) for x in range(9)))))
+        self.assertEquals(7, obj.anint)
+        self.assertEquals(self.obj.adict, obj.adict)
+        self.assertEquals(3, self.client.max_in_flight)
+
+    def test_save_deletes_removed_entries(self):
+        """
+        Verify save deletes DictField entries which were removed.
+        """
+        asyncio.run(self.server.save(self.obj))
+        del self.obj.adict['k3']
+        asyncio.run(self.server.save(self.obj))
+        self.assertFalse('/dicttesting/adict/k3' in self.client.fake.data)
+        self.assertEquals(9, len(self.client.fake.data))
+
+    def test_delete(self):
+        """
+        Verify delete removes the whole object prefix in one call.
+        """
+        asyncio.run(self.server.save(self.obj))
+        asyncio.run(self.server.delete(self.obj))
+        self.assertEquals({}, self.client.fake.data)
+        self.assertEquals(
+            ('delete', '/dicttesting', {'recursive': True}),
+            self.client.fake.calls[-1])
@@ -0,0 +1,180 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     (1) Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#
+#     (2) Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#
+#     (3)The name of the author may not be used to
+#     endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Unittests for array fields.
+"""
+
+import array
+
+from . import FakeClient, TestCase
+
+import etcdobj
+
+from etcdobj import fields
+
+
+class SeriesObj(etcdobj.EtcdObj):
+    """
+    An EtcdObj with packed and chunked arrays.
+    """
+    __name__ = 'series'
+    ids = fields.IntArrayField('ids')
+    samples = fields.FloatArrayField('samples', chunk_size=4)
+
+
+class TestArrayFields(TestCase):
+    """
+    Tests for IntArrayField and FloatArrayField.
+    """
+
+    def setUp(self):
+        """
+        Executes before each test.
+        """
+        self.fake = FakeClient()
+        self.server = etcdobj._Server(self.fake)
+
+    def test_casting(self):
+        """
+        Verify values are cast to arrays of the field's typecode.
+        """
+        obj = SeriesObj(ids=[1, 2, 3])
+        self.assertEquals(array.array('q', [1, 2, 3]), obj.ids)
+        self.assertEquals(array.array('d'), obj.samples)
+        given = array.array('d', [0.5])
+        obj.samples = given
+        self.assertTrue(obj.samples is given)
+
+        # No copy is made to read the numbers
+        view = memoryview(obj.samples)
+        given[0] = 2.5
+        self.assertEquals(2.5, view[0])
+        view.release()
+
+        self.assertRaises(TypeError, setattr, obj, 'ids', [1.5])
+        self.assertRaises(
+            ValueError, fields.IntArrayField, 'x', typecode='d')
+        self.assertRaises(ValueError, fields.IntArrayField, 'x', indexed=True)
+        self.assertRaises(ValueError, fields.FloatArrayField, 'x', 0)
+        self.assertEquals(
+            array.array('i', [7]),
+            fields.IntArrayField('x', typecode='i')._cast([7]))
+        self.assertEquals({'ids': [1, 2, 3], 'samples': [2.5]}, obj._native())
+
+    def test_save_and_read(self):
+        """
+        Verify arrays are stored packed or chunked and read back.
+        """
+        obj = SeriesObj(
+            _id='s1', ids=range(100), samples=[x / 2.0 for x in range(10)])
+        self.server.save(obj)
+        self.assertEquals(
+            ['/series/s1/ids', '/series/s1/samples/0',
+             '/series/s1/samples/1', '/series/s1/samples/2'],
+            sorted(k for k in self.fake.data if k.count('/') > 2 and
+                   not k.endswith('/samples')))
+
+        for kwargs in ({}, {'recursive': True}, {'lazy': True}):
+            # A plain read only reads the chunks known locally
+            to = SeriesObj(_id='s1', samples=[0.0] * 10)
+            to = self.server.read(to, **kwargs)
+            self.assertEquals(obj.ids, to.ids)
+            self.assertEquals(obj.samples, to.samples)
+
+    def test_chunks_written(self):
+        """
+        Verify only changed chunks are written and extra ones removed.
+        """
+        obj = SeriesObj(_id='s1', samples=[0.0] * 10)
+        self.server.save(obj)
+        self.fake.calls = []
+        obj.samples[5] = 1.0
+        self.server.save(obj)
+        self.assertEquals(
+            [('write', '/series/s1/samples/1')],
+            [c[:2] for c in self.fake.calls if c[0] in ('write', 'delete')])
+
+        self.fake.calls = []
+        del obj.samples[4:]
+        self.server.save(obj)
+        self.assertEquals(
+            ['/series/s1/samples/1', '/series/s1/samples/2'],
+            sorted(c[1] for c in self.fake.calls if c[0] == 'delete'))
+        to = self.server.read(SeriesObj(_id='s1'), recursive=True)
+        self.assertEquals(array.array('d', [0.0] * 4), to.samples)
+
+    def test_smaller_than_dict(self):
+        """
+        Verify arrays need one key and fewer bytes than a DictField.
+        """
+        numbers = list(range(1000, 2000))
+        field = fields.IntArrayField('ids', typecode='h')
+        packed = field._render(field._cast(numbers))
+        entries = fields.DictField('ids')._render(
+            dict((str(x), x) for x in range(len(numbers))))
+        self.assertEquals(1000, len(entries))
+        self.assertEquals(False, packed['dir'])
+        self.assertTrue(
+            len(packed['value']) * 3 <
+            sum(len(i['key']) + len(str(i['value'])) for i in entries))
+
+    def test_compression(self):
+        """
+        Verify large arrays are compressed unless compression is None.
+        """
+        numbers = list(range(1000))
+        for kwargs in ({}, {'chunk_size': 100}):
+            field = fields.IntArrayField('ids', **kwargs)
+            plain = fields.IntArrayField('ids', compression=None, **kwargs)
+            self.assertTrue(
+                len(field._pack(field._cast(numbers))) * 4 <
+                len(plain._pack(plain._cast(numbers))))
+            self.assertEquals(
+                array.array('q', numbers),
+                field._unpack(field._pack(field._cast(numbers))))
+
+        # 64 bit numbers take a tenth of what a DictField sends
+        class Both(etcdobj.EtcdObj):
+            __name__ = 'both'
+            ids = fields.IntArrayField('ids')
+            adict = fields.DictField('adict', {})
+
+        numbers = list(range(10 ** 6, 10 ** 6 + 10000))
+        obj = Both(_id='b1', ids=numbers, adict=dict(
+            (str(x), n) for x, n in enumerate(numbers)))
+        sizes = {'ids': 0, 'adict': 0}
+        for attr, key, value, _ in obj._render_items():
+            sizes[attr] += len(key) + len(str(value))
+        self.assertTrue(sizes['ids'] * 10 < sizes['adict'])
+
+        # Small values are stored as they are, behind the header byte
+        field = fields.IntArrayField('ids')
+        self.assertEquals(array.array('q', [1]), field._unpack(
+            field._pack(array.array('q', [1]))))
+        self.assertRaises(
+            ValueError, fields.IntArrayField, 'x', compression='nope')
@@ -0,0 +1,190 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     (1) Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#
+#     (2) Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#
+#     (3)The name of the author may not be used to
+#     endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Unittests for the read cache.
+"""
+
+import etcd
+
+from mock import MagicMock
+
+from . import DictTestingObj, FakeClient, TestCase
+
+import etcdobj
+
+from etcdobj.cache import ReadCache
+
+
+class TestReadCache(TestCase):
+    """
+    Tests for ReadCache.
+    """
+
+    def setUp(self):
+        """
+        Executes before each test.
+        """
+        self.now = [0]
+        self.cache = ReadCache(maxsize=2, clock=lambda: self.now[0])
+        self.fake = FakeClient()
+        self.fake.load({
+            '/dicttesting/anint': '1',
+            '/dicttesting/adict/count': '2',
+        })
+        self.server = etcdobj._Server(
+            self.fake, cache=self.cache, watch=False)
+
+    def reads(self):
+        """
+        Returns the number of reads the fake client served.
+        """
+        return len([c for c in self.fake.calls if c[0] == 'read'])
+
+    def test_hits_and_misses(self):
+        """
+        Verify repeated reads are served locally.
+        """
+        for _ in range(3):
+            obj = self.server.read(DictTestingObj())
+        self.assertEquals(1, self.reads())
+        self.assertEquals((2, 1), (self.cache.hits, self.cache.misses))
+        self.assertEquals(1, obj.anint)
+        self.assertEquals({'count': 2}, obj.adict)
+
+    def test_watch_updates_entries(self):
+        """
+        Verify watch events update and remove cached keys.
+        """
+        self.server.read(DictTestingObj())
+        self.fake.write('/dicttesting/anint', '5')
+        self.fake.write('/dicttesting/adict/new', 'x')
+        self.fake.delete('/dicttesting/adict/count')
+        for _ in range(3):
+            self.cache.watch_once(self.fake)
+
+        obj = self.server.read(DictTestingObj())
+        self.assertEquals(1, self.reads())
+        self.assertEquals(5, obj.anint)
+        self.assertEquals({'new': 'x'}, obj.adict)
+        self.assertEquals(self.fake.index, self.cache.index)
+
+    def test_watch_ignores_older_events(self):
+        """
+        Verify events older than a cached read do not overwrite it.
+        """
+        event = self.fake.write('/dicttesting/anint', '7')
+        self.fake.write('/dicttesting/anint', '8')
+        self.server.read(DictTestingObj())
+        self.cache.apply(event)
+        self.assertEquals(8, self.server.read(DictTestingObj()).anint)
+
+    def test_dir_events_invalidate(self):
+        """
+        Verify removing a directory drops the entries under it.
+        """
+        self.server.read(DictTestingObj())
+        self.cache.apply(etcd.EtcdResult('delete', {
+            'key': '/dicttesting', 'dir': True, 'modifiedIndex': 100}))
+        self.assertEquals(0, len(self.cache))
+
+    def test_index_cleared(self):
+        """
+        Verify the cache is dropped when the watch index was cleared.
+        """
+        self.server.read(DictTestingObj())
+        client = MagicMock()
+        client.watch.side_effect = etcd.EtcdEventIndexCleared()
+        self.assertEquals(None, self.cache.watch_once(client))
+        self.assertEquals(0, len(self.cache))
+        self.assertEquals(None, self.cache.index)
+
+    def test_lru_eviction(self):
+        """
+        Verify the least recently used prefix is evicted.
+        """
+        self.cache.set('/a', {}, 1)
+        self.cache.set('/b', {}, 1)
+        self.cache.get('/a')
+        self.cache.set('/c', {}, 1)
+        self.assertEquals(1, self.cache.evictions)
+        self.assertEquals(None, self.cache.get('/b'))
+        self.assertEquals({}, self.cache.get('/a'))
+        self.assertRaises(ValueError, ReadCache, maxsize=0)
+
+    def test_max_age(self):
+        """
+        Verify entries older than max_age are read again.
+        """
+        self.cache.max_age = 10
+        self.server.read(DictTestingObj())
+        self.now[0] = 11
+        self.server.read(DictTestingObj())
+        self.assertEquals(2, self.reads())
+
+    def test_save_invalidates(self):
+        """
+        Verify saving an object drops its cached values.
+        """
+        self.server.read(DictTestingObj())
+        self.server.save(DictTestingObj(anint=3))
+        self.assertEquals(3, self.server.read(DictTestingObj()).anint)
+        self.assertEquals(2, self.reads())
+
+    def test_stale_reads_not_stored(self):
+        """
+        Verify values read before the last applied change are not cached.
+        """
+        event = self.fake.write('/dicttesting/anint', '2')
+        # The read happened before the event but is stored after it
+        self.cache.apply(event)
+        self.cache.set(
+            '/dicttesting', {'/dicttesting/anint': ('1', 1)},
+            event.modifiedIndex - 1)
+        self.assertEquals(None, self.cache.get('/dicttesting'))
+
+    def test_get_returns_copy(self):
+        """
+        Verify callers can not see later watch changes mid iteration.
+        """
+        self.server.read(DictTestingObj())
+        values = self.cache.get('/dicttesting')
+        self.cache.apply(self.fake.write('/dicttesting/adict/new', 'x'))
+        self.assertFalse('/dicttesting/adict/new' in values)
+        self.assertTrue(
+            '/dicttesting/adict/new' in self.cache.get('/dicttesting'))
+
+    def test_server_starts_watch(self):
+        """
+        Verify a Server starts the watch of its cache.
+        """
+        cache = ReadCache()
+        etcdobj._Server(self.fake, cache=cache)
+        try:
+            self.assertTrue(cache._thread is not None)
+        finally:
+            cache.stop()
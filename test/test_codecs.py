@@ -0,0 +1,169 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     (1) Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#
+#     (2) Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#
+#     (3)The name of the author may not be used to
+#     endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Unittests for value codecs.
+"""
+
+import datetime
+import unittest
+
+from . import FakeClient, TestCase
+
+import etcdobj
+
+from etcdobj import codecs, fields
+
+FMT = '%Y-%m-%d %H:%M:%S'
+
+
+class PackedObj(etcdobj.EtcdObj):
+    """
+    An EtcdObj whose fields are stored with codecs.
+    """
+    __name__ = 'packed'
+    count = fields.IntField('count', codec=codecs.StructCodec())
+    seen = fields.DateTimeField('seen', FMT, codec=codecs.EpochCodec())
+    labels = fields.DictField(
+        'labels', codec=codecs.Compressed(codecs.JsonCodec(), threshold=64))
+
+
+class TestCodecs(TestCase):
+    """
+    Tests for codecs and fields using them.
+    """
+
+    def test_round_trip(self):
+        """
+        Verify every codec reads back what it wrote.
+        """
+        when = datetime.datetime(2016, 5, 4, 3, 2, 1, 123456)
+        for codec, value in (
+                (codecs.StructCodec(), -42),
+                (codecs.StructCodec('>d'), 1.5),
+                (codecs.EpochCodec(), when),
+                (codecs.JsonCodec(), {'a': [1, 2], 'b': None}),
+                (codecs.Compressed(codecs.JsonCodec()), {'a': 'x' * 500})):
+            text = codec.encode(value)
+            self.assertEquals(str, type(text))
+            self.assertEquals(value, codec.decode(text))
+
+        aware = when.replace(
+            tzinfo=datetime.timezone(datetime.timedelta(hours=2)))
+        codec = codecs.EpochCodec()
+        self.assertEquals(
+            when - datetime.timedelta(hours=2),
+            codec.decode(codec.encode(aware)))
+
+    def test_incomplete_codec(self):
+        """
+        Verify codecs without dumps or loads can not be created.
+        """
+        class DumpsOnly(codecs.Codec):
+            def dumps(self, value):
+                return b''
+
+        self.assertRaises(TypeError, codecs.Codec)
+        self.assertRaises(TypeError, DumpsOnly)
+        self.assertEquals(b'x', codecs.BytesCodec().loads(b'x'))
+
+    def test_compressed_threshold(self):
+        """
+        Verify only values at or above the threshold are compressed.
+        """
+        codec = codecs.Compressed(codecs.JsonCodec(), threshold=64)
+        self.assertEquals(b'\x00', codec.dumps({'a': 1})[:1])
+        big = codec.dumps({'a': 'x' * 200})
+        self.assertEquals(b'\x01', big[:1])
+        self.assertTrue(len(big) < 200)
+        self.assertRaises(ValueError, codec.loads, b'\x09data')
+        self.assertRaises(
+            ValueError, codecs.Compressed, codecs.JsonCodec(),
+            algorithm='lz4')
+
+    @unittest.skipIf(codecs.msgpack is not None, 'msgpack is installed')
+    def test_msgpack_missing(self):
+        """
+        Verify MsgpackCodec needs msgpack.
+        """
+        self.assertRaises(ImportError, codecs.MsgpackCodec)
+
+    @unittest.skipIf(codecs.zstandard is not None, 'zstandard is installed')
+    def test_zstd_missing(self):
+        """
+        Verify zstd compression needs zstandard.
+        """
+        self.assertRaises(
+            ImportError, codecs.Compressed, codecs.JsonCodec(),
+            algorithm='zstd')
+        codec = codecs.Compressed(codecs.JsonCodec())
+        self.assertRaises(ImportError, codec.loads, b'\x02data')
+
+    def test_save_and_read(self):
+        """
+        Verify fields with codecs are written as one key and read back.
+        """
+        client = FakeClient()
+        server = etcdobj._Server(client)
+        seen = datetime.datetime(2016, 5, 4, 3, 2, 1)
+        labels = {'zone': 'a', 'rack': 'r' * 100}
+        obj = PackedObj(_id='n1', count=7, seen=seen, labels=labels)
+        server.save(obj)
+        self.assertEquals(
+            ['/packed/n1/count', '/packed/n1/labels', '/packed/n1/seen'],
+            sorted(k for k in client.data if not k.endswith('/n1')))
+        self.assertEquals(
+            codecs.StructCodec().encode(7), client.data['/packed/n1/count'])
+
+        for kwargs in ({}, {'recursive': True}, {'lazy': True}):
+            to = server.read(PackedObj(_id='n1'), **kwargs)
+            self.assertEquals(7, to.count)
+            self.assertEquals(seen, to.seen)
+            self.assertEquals(labels, to.labels)
+
+        # Unchanged values are not written again
+        client.calls = []
+        obj.count = 8
+        server.save(obj)
+        self.assertEquals(
+            [('write', '/packed/n1/count')],
+            [c[:2] for c in client.calls if c[0] == 'write'])
+
+    def test_render(self):
+        """
+        Verify render and find use the codec.
+        """
+        obj = PackedObj(_id='n1', count=1, labels={'a': 'b'})
+        rendered = dict((i['key'], i['value']) for i in obj.render())
+        self.assertEquals(
+            {'a': 'b'},
+            PackedObj.labels.codec.decode(rendered['/packed/n1/labels']))
+        self.assertEquals(
+            [{'name': 'labels', 'key': 'labels', 'dir': False,
+              'value': rendered['/packed/n1/labels']}],
+            PackedObj.labels._render({'a': 'b'}))
+        self.assertEquals(None, rendered['/packed/n1/seen'])
@@ -0,0 +1,186 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     (1) Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#
+#     (2) Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#
+#     (3)The name of the author may not be used to
+#     endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Unittests for read consistency levels and write quorum.
+"""
+
+import asyncio
+import os
+import tempfile
+
+from . import DictTestingObj, FakeClient, TestCase
+from .test_aio import AsyncFakeClient
+from .test_index import IndexedObj
+
+import etcdobj
+
+from etcdobj.aio import AsyncServer
+from etcdobj.cache import ReadCache
+
+
+class FollowerObj(DictTestingObj):
+    """
+    A model whose reads may be served by any member.
+    """
+    __consistency__ = etcdobj.SERIALIZABLE
+    __write_quorum__ = False
+
+
+class TestConsistency(TestCase):
+    """
+    Tests for consistency levels and write quorum.
+    """
+
+    def setUp(self):
+        """
+        Executes before each test.
+        """
+        self.fake = FakeClient()
+        self.fake.load({
+            '/dicttesting/anint': '1',
+            '/dicttesting/adict/count': '2',
+        })
+        self.server = etcdobj._Server(self.fake)
+
+    def modes(self, op='read'):
+        """
+        Returns the quorum flag of every recorded call of op and resets.
+        """
+        modes = [c[2].get('quorum') for c in self.fake.calls if c[0] == op]
+        self.fake.calls = []
+        return modes
+
+    def test_levels(self):
+        """
+        Verify the call wins over the model which wins over the Server.
+        """
+        self.server.read(DictTestingObj())
+        self.assertEquals([True], self.modes())
+        self.server.read(FollowerObj())
+        self.assertEquals([False], self.modes())
+        self.server.read(FollowerObj(), consistency=etcdobj.LINEARIZABLE)
+        self.assertEquals([True], self.modes())
+
+        server = etcdobj._Server(
+            self.fake, consistency=etcdobj.SERIALIZABLE)
+        server.read(DictTestingObj(), recursive=True)
+        self.assertEquals([False], self.modes())
+        # CACHED without a cache is served by any member
+        obj = server.read(DictTestingObj(), consistency=etcdobj.CACHED)
+        self.assertEquals([False], self.modes())
+        self.assertEquals((1, {}), (obj.anint, obj.adict))
+
+        self.assertRaises(
+            ValueError, etcdobj._Server, self.fake, consistency='eventual')
+        self.assertRaises(
+            ValueError, self.server.read, DictTestingObj(), False, 'stale')
+
+    def test_cached(self):
+        """
+        Verify only CACHED reads are served from the cache.
+        """
+        server = etcdobj._Server(
+            self.fake, cache=ReadCache(), watch=False)
+        server.read(DictTestingObj())
+        server.read(DictTestingObj())
+        self.assertEquals([True], self.modes())
+        self.assertEquals(1, server.cache.hits)
+
+        obj = server.read(
+            DictTestingObj(), True, consistency=etcdobj.LINEARIZABLE)
+        server.read(FollowerObj(), recursive=True)
+        self.assertEquals([True, False], self.modes())
+        self.assertEquals((1, {'count': 2}), (obj.anint, obj.adict))
+        self.assertEquals(1, server.cache.hits)
+
+    def test_bulk_and_iterate(self):
+        """
+        Verify read_many, query, find and export use the level.
+        """
+        results = self.server.read_many(
+            [DictTestingObj(), FollowerObj()], workers=2)
+        self.assertEquals([None, None], [r.error for r in results])
+        self.assertEquals([False, True], sorted(self.modes()))
+        self.server.read_many(
+            [DictTestingObj()], recursive=True,
+            consistency=etcdobj.SERIALIZABLE)
+        self.assertEquals([False], self.modes())
+
+        self.server.save(IndexedObj(_id='a', status='new', size=1))
+        self.fake.calls = []
+        self.assertEquals(['a'], [o._id for o in self.server.query(
+            IndexedObj, consistency=etcdobj.SERIALIZABLE)])
+        self.assertEquals([False, False], self.modes())
+        self.assertEquals(['a'], [o._id for o in self.server.query(
+            IndexedObj, fields=['size'], consistency=etcdobj.SERIALIZABLE)])
+        self.assertEquals([False, False], self.modes())
+        self.assertEquals(['a'], [o._id for o in self.server.find(
+            IndexedObj, status='new', consistency=etcdobj.SERIALIZABLE)])
+        self.assertEquals([False, False], self.modes())
+
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            self.server.export(
+                IndexedObj, path, consistency=etcdobj.SERIALIZABLE)
+        finally:
+            os.remove(path)
+        self.assertEquals(set([False]), set(self.modes()))
+
+    def test_write_quorum(self):
+        """
+        Verify writes carry the quorum flag of the call, model or Server.
+        """
+        self.server.save(DictTestingObj(anint=3), full=True)
+        self.assertEquals([True], self.modes('write'))
+        self.server.save(FollowerObj(anint=4), full=True)
+        self.assertEquals([False], self.modes('write'))
+        self.server.save(
+            FollowerObj(anint=5), full=True, write_quorum=True)
+        self.assertEquals([True], self.modes('write'))
+
+        server = etcdobj._Server(self.fake, write_quorum=False)
+        server.save_many([DictTestingObj(anint=6)], workers=1)
+        self.assertEquals([False], self.modes('write'))
+        server.save_batch(DictTestingObj(anint=7), write_quorum=True)
+        self.assertEquals([True], self.modes('write'))
+
+    def test_aio(self):
+        """
+        Verify AsyncServer uses the level and write quorum as well.
+        """
+        client = AsyncFakeClient()
+        client.fake = self.fake
+        server = AsyncServer(client)
+        asyncio.run(server.read(FollowerObj()))
+        asyncio.run(server.read(DictTestingObj()))
+        self.assertEquals([False, True], self.modes())
+        asyncio.run(server.save(FollowerObj(anint=1)))
+        asyncio.run(server.save(DictTestingObj(anint=1), write_quorum=False))
+        self.assertEquals([False, False], self.modes('write'))
+        self.assertRaises(ValueError, AsyncServer, client, consistency='x')
@@ -29,12 +29,23 @@
 Unittests for the main etcdobj module.
 """
 
+import datetime
+import io
+import json
+import operator
+import threading
+
+import etcd
+
 from mock import MagicMock
 
-from . import TestCase, TestingObj
+from . import (
+    DictTestingObj, FakeClient, TestCase, TestingObj, TxnFakeClient)
 
 import etcdobj
 
+from etcdobj import fields, serialize
+
 
 class Test_Server(TestCase):
     """
@@ -62,6 +73,308 @@ class Test_Server(TestCase):
         self.client.write.assert_called_once_with(
             '/testing/anint', 10, quorum=True)
 
+    def test_save_only_changes(self):
+        """
+        Verify save only writes changed keys and deletes removed entries.
+        """
+        client = FakeClient()
+        server = etcdobj._Server(client)
+        obj = DictTestingObj(anint=1, adict={'a': 1, 'b': 2, 'count': 3})
+        server.save(obj)
+        self.assertEquals(4, len(client.calls))
+
+        # Nothing changed so nothing is written
+        del client.calls[:]
+        server.save(obj)
+        self.assertEquals([], client.calls)
+
+        # Only the changed entries are written and removed ones deleted
+        obj.adict['a'] = 10
+        del obj.adict['b']
+        server.save(obj)
+        self.assertEquals([
+            ('write', '/dicttesting/adict/a', {'quorum': True}),
+            ('delete', '/dicttesting/adict/b', {'recursive': False}),
+        ], client.calls)
+        self.assertEquals(
+            ['/dicttesting/adict/a', '/dicttesting/adict/count',
+             '/dicttesting/anint'], sorted(client.data.keys()))
+
+        # full=True writes everything again
+        del client.calls[:]
+        server.save(obj, full=True)
+        self.assertEquals(3, len(client.calls))
+
+    def test_read_resets_changes(self):
+        """
+        Verify a read object only writes what changed afterwards.
+        """
+        client = FakeClient()
+        client.load({
+            '/dicttesting/anint': '1',
+            '/dicttesting/adict/count': '2',
+        })
+        server = etcdobj._Server(client)
+        obj = server.read(DictTestingObj(), recursive=True)
+        obj.anint = 5
+        del client.calls[:]
+        server.save(obj)
+        self.assertEquals(
+            [('write', '/dicttesting/anint', {'quorum': True})],
+            client.calls)
+
+    def test_save_cas(self):
+        """
+        Verify cas saves fail only for keys changed by someone else.
+        """
+        client = FakeClient()
+        client.load({
+            '/dicttesting/anint': '1',
+            '/dicttesting/adict/count': '2',
+            '/dicttesting/adict/gone': 'x',
+        })
+        server = etcdobj._Server(client)
+        obj = server.read(DictTestingObj(), recursive=True)
+        self.assertEquals(
+            client.indexes['/dicttesting/anint'],
+            obj._indexes['/dicttesting/anint'])
+
+        # Another writer changes a key after we read it
+        client.write('/dicttesting/adict/count', '5')
+        client.write('/dicttesting/adict/new', 'theirs')
+        obj.anint = 7
+        obj.adict['count'] = 9
+        obj.adict['new'] = 'ours'
+        del obj.adict['gone']
+
+        try:
+            server.save(obj, cas=True)
+            self.fail('ConflictError was not raised')
+        except etcdobj.ConflictError as error:
+            self.assertEquals(
+                ['/dicttesting/adict/count', '/dicttesting/adict/new'],
+                sorted(error.keys))
+        # Nothing was written
+        self.assertEquals('1', client.data['/dicttesting/anint'])
+        self.assertTrue('/dicttesting/adict/gone' in client.data)
+        self.assertEquals('5', client.data['/dicttesting/adict/count'])
+
+        # A key changed after the check stops the save at that key
+        server._stale_keys = lambda obj, writes, deletes: []
+        try:
+            server.save(obj, cas=True)
+            self.fail('ConflictError was not raised')
+        except etcdobj.ConflictError as error:
+            self.assertEquals(['/dicttesting/adict/count'], error.keys)
+        self.assertEquals('1', client.data['/dicttesting/anint'])
+        self.assertEquals('theirs', client.data['/dicttesting/adict/new'])
+        self.assertTrue('/dicttesting/adict/gone' in client.data)
+        del server._stale_keys
+
+        # After reading again the save goes through
+        obj = server.read(DictTestingObj(), recursive=True)
+        obj.adict['count'] = 9
+        server.save(obj, cas=True)
+        self.assertEquals(9, client.data['/dicttesting/adict/count'])
+
+        # A second save uses the indexes recorded by the first one
+        obj.adict['count'] = 10
+        server.save(obj, cas=True)
+        self.assertEquals(10, client.data['/dicttesting/adict/count'])
+
+    def test_save_batch_txn(self):
+        """
+        Verify save_batch sends batches as transactions when possible.
+        """
+        client = TxnFakeClient()
+        server = etcdobj._Server(client)
+        obj = DictTestingObj()
+        obj.anint = 1
+        obj.adict = {'a': '1', 'b': '2', 'c': '3'}
+
+        committed = server.save_batch(obj, batch_size=2)
+        self.assertEquals(4, len(committed))
+        txns = [call for call in client.calls if call[0] == 'txn']
+        self.assertEquals([2, 2], [len(call[1]) for call in txns])
+        self.assertEquals(sorted(committed), sorted(client.data.keys()))
+
+    def test_save_batch_txn_failure(self):
+        """
+        Verify a failing transaction commits nothing from its batch.
+        """
+        client = TxnFakeClient()
+        client.fail_keys.add('/dicttesting/anint')
+        server = etcdobj._Server(client)
+        obj = DictTestingObj()
+        obj.anint = 1
+        obj.adict = {'a': '1'}
+
+        try:
+            server.save_batch(obj)
+            self.fail('BatchSaveError was not raised')
+        except etcdobj.BatchSaveError as error:
+            self.assertEquals([], error.committed)
+        self.assertEquals({}, client.data)
+
+    def test_save_batch_without_txn(self):
+        """
+        Verify save_batch falls back to writes and reports committed keys.
+        """
+        client = FakeClient()
+        server = etcdobj._Server(client)
+        obj = DictTestingObj()
+        obj.anint = 1
+        obj.adict = {'a': '1'}
+        keys = [item['key'] for item in obj.render()]
+        client.fail_keys.add(keys[-1])
+
+        try:
+            server.save_batch(obj, batch_size=1)
+            self.fail('BatchSaveError was not raised')
+        except etcdobj.BatchSaveError as error:
+            self.assertEquals(keys[:-1], error.committed)
+        self.assertRaises(ValueError, server.save_batch, obj, batch_size=0)
+
+        # The keys of one batch are written concurrently
+        threads = set()
+        write = client.write
+
+        def recording_write(key, value, **kwargs):
+            threads.add(threading.current_thread())
+            return write(key, value, **kwargs)
+
+        client.write = recording_write
+        client.fail_keys.clear()
+        obj.adict = dict((str(i), str(i)) for i in range(20))
+        self.assertEquals(21, len(server.save_batch(obj)))
+        self.assertFalse(threading.current_thread() in threads)
+
+    def test_save_in_place_change(self):
+        """
+        Verify values changed in place are written by the next save.
+        """
+        class Listed(etcdobj.EtcdObj):
+            __name__ = 'listed'
+            items = fields.Field('items')
+
+        client = FakeClient()
+        server = etcdobj._Server(client)
+        obj = Listed(items=[1])
+        server.save(obj)
+        obj.items.append(2)
+        server.save(obj)
+        self.assertEquals(
+            ['/listed/items', '/listed/items'],
+            [call[1] for call in client.calls if call[0] == 'write'])
+
+    def test_save_batch_deletes_removed_entries(self):
+        """
+        Verify save_batch deletes DictField entries which were removed.
+        """
+        client = FakeClient()
+        server = etcdobj._Server(client)
+        obj = DictTestingObj(anint=1, adict={'a': '1', 'b': '2'})
+        server.save_batch(obj)
+        del obj.adict['b']
+        server.save_batch(obj)
+        self.assertFalse('/dicttesting/adict/b' in client.data)
+        to = server.read(DictTestingObj(), recursive=True)
+        self.assertEquals({'a': '1'}, to.adict)
+
+    def test_save_many(self):
+        """
+        Verify save_many writes every object and reports errors per object.
+        """
+        client = FakeClient()
+        client.fail_keys.add('/testing/anint')
+        server = etcdobj._Server(client)
+        objs = [
+            DictTestingObj(anint=x, adict={'a': x}) for x in range(5)]
+        objs.append(TestingObj(anint=1))
+
+        results = server.save_many(objs, workers=4)
+        self.assertEquals(objs, [result.obj for result in results])
+        self.assertEquals([None] * 5, [r.error for r in results[:5]])
+        self.assertTrue(isinstance(results[5].error, etcd.EtcdException))
+        self.assertEquals(2, len(client.data))
+        self.assertEquals(11, len(client.calls))
+
+    def test_read_many(self):
+        """
+        Verify read_many reads every object per key or recursively.
+        """
+        client = FakeClient()
+        client.load({
+            '/dicttesting/anint': '3',
+            '/dicttesting/adict/a': '1',
+        })
+        server = etcdobj._Server(client)
+
+        results = server.read_many(
+            [DictTestingObj(adict={'a': None}), TestingObj()])
+        self.assertEquals(3, results[0].obj.anint)
+        self.assertEquals({'a': '1'}, results[0].obj.adict)
+        self.assertEquals(None, results[0].error)
+        self.assertTrue(isinstance(results[1].error, etcd.EtcdKeyNotFound))
+
+        results = server.read_many([DictTestingObj()], recursive=True)
+        self.assertEquals({'a': '1'}, results[0].obj.adict)
+        self.assertEquals(
+            {'recursive': True, 'quorum': True}, client.calls[-1][2])
+
+    def test_delete(self):
+        """
+        Verify delete removes the whole object with one recursive delete.
+        """
+        client = FakeClient()
+        server = etcdobj._Server(client)
+        obj = DictTestingObj(_id='one', anint=1, adict={'a': 1, 'b': 2})
+        server.save(obj)
+        server.save(DictTestingObj(_id='two', anint=2))
+        del client.calls[:]
+
+        server.delete(obj)
+        self.assertEquals(
+            [('delete', '/dicttesting/one', {'recursive': True})],
+            client.calls)
+        self.assertEquals(['/dicttesting/two/anint'], list(client.data))
+        self.assertEquals(None, obj._synced)
+
+    def test_delete_unchanged(self):
+        """
+        Verify delete with unchanged refuses objects changed by others.
+        """
+        client = FakeClient()
+        server = etcdobj._Server(client)
+        obj = DictTestingObj(_id='one', anint=1, adict={'a': 1})
+        self.assertRaises(ValueError, server.delete, obj, unchanged=True)
+        server.save(obj)
+
+        client.write('/dicttesting/one/adict/new', 'x')
+        try:
+            server.delete(obj, unchanged=True)
+            self.fail('ConflictError was not raised')
+        except etcdobj.ConflictError as error:
+            self.assertEquals(['/dicttesting/one/adict/new'], error.keys)
+        self.assertEquals(3, len(client.data))
+
+        server.read(obj, recursive=True)
+        server.delete(obj, unchanged=True)
+        self.assertEquals({}, client.data)
+
+    def test_delete_many(self):
+        """
+        Verify delete_many reports results per object.
+        """
+        client = FakeClient()
+        server = etcdobj._Server(client)
+        objs = [DictTestingObj(_id=str(x), anint=x) for x in range(4)]
+        server.save_many(objs[:3])
+        results = server.delete_many(objs, workers=2)
+        self.assertEquals([None] * 3, [r.error for r in results[:3]])
+        self.assertTrue(isinstance(results[3].error, etcd.EtcdKeyNotFound))
+        self.assertEquals({}, client.data)
+
     def test_read(self):
         """
         Verify read works as expected.
@@ -76,3 +389,269 @@ class Test_Server(TestCase):
             '/testing/anint', quorum=True)
         # And it should have set the data to 10
         self.assertEquals(10, to.anint)
+
+    def test_read_recursive(self):
+        """
+        Verify read with recursive=True uses a single read.
+        """
+        client = FakeClient()
+        client.load({
+            '/dicttesting/anint': '5',
+            '/dicttesting/adict/count': '3',
+            '/dicttesting/adict/remote': 'only in etcd',
+            '/dicttesting/unknown': 'ignored',
+        })
+        server = etcdobj._Server(client)
+
+        to = server.read(DictTestingObj(), recursive=True)
+        # We should have a single recursive read of the prefix
+        self.assertEquals(
+            [('read', '/dicttesting', {'recursive': True, 'quorum': True})],
+            client.calls)
+        # And every field should be filled out, including new dict keys
+        self.assertEquals(5, to.anint)
+        self.assertEquals(
+            {'count': 3, 'remote': 'only in etcd'}, to.adict)
+
+    def test_read_recursive_missing(self):
+        """
+        Verify read with recursive=True raises when nothing is stored.
+        """
+        server = etcdobj._Server(FakeClient())
+        self.assertRaises(
+            etcd.EtcdKeyNotFound, server.read, DictTestingObj(),
+            recursive=True)
+
+    def test_read_lazy(self):
+        """
+        Verify read with lazy=True only reads the fields which are used.
+        """
+        client = FakeClient()
+        client.load({
+            '/dicttesting/anint': '5',
+            '/dicttesting/adict/count': '3',
+            '/dicttesting/adict/remote': 'x',
+        })
+        server = etcdobj._Server(client)
+
+        to = server.read(DictTestingObj(), lazy=True)
+        self.assertEquals([], client.calls)
+        self.assertEquals(5, to.anint)
+        self.assertEquals(5, to.anint)
+        self.assertEquals(
+            [('read', '/dicttesting/anint', {
+                'recursive': False, 'quorum': True})], client.calls)
+        self.assertEquals({'count': 3, 'remote': 'x'}, to.adict)
+        self.assertEquals(
+            ('read', '/dicttesting/adict', {
+                'recursive': True, 'quorum': True}), client.calls[1])
+        self.assertEquals(
+            {'/dicttesting/anint': 5, '/dicttesting/adict/count': 3,
+             '/dicttesting/adict/remote': 'x'}, to._synced)
+
+        # Fields set before use are never read; save reads the others
+        client.calls = []
+        to = server.read(
+            DictTestingObj(), lazy=True, consistency=etcdobj.SERIALIZABLE)
+        to.anint = 9
+        server.save(to)
+        self.assertEquals(
+            [('read', '/dicttesting/adict', {
+                'recursive': True, 'quorum': False}),
+             ('write', '/dicttesting/anint', {'quorum': True})],
+            client.calls)
+        self.assertEquals(list, type(to._values))
+
+        # Keys missing in etcd keep the current value
+        to = server.read(DictTestingObj(_id='a', anint=1), lazy=True)
+        self.assertEquals((1, {}), (to.anint, to.adict))
+
+        # Other reads replace pending values without fetching them first
+        for read in (lambda obj: server.read(obj, recursive=True),
+                     lambda obj: server.read_many([obj])[0].obj,
+                     lambda obj: server.read_many(
+                         [obj], recursive=True)[0].obj):
+            to = server.read(DictTestingObj(), lazy=True)
+            client.calls = []
+            self.assertEquals(9, read(to).anint)
+            self.assertEquals(1, len(client.calls))
+            self.assertEquals(list, type(to._values))
+
+    def test_read_lazy_cas(self):
+        """
+        Verify cas and unchanged work on fields set before they loaded.
+        """
+        client = FakeClient()
+        server = etcdobj._Server(client)
+        server.save(DictTestingObj(_id='x', anint=1, adict={'count': 2}))
+
+        to = server.read(DictTestingObj(_id='x'), lazy=True)
+        to.anint = 5
+        server.save(to, cas=True)
+        self.assertEquals(5, client.data['/dicttesting/x/anint'])
+        to.anint = 6
+        server.save(to, cas=True)
+        self.assertEquals(6, client.data['/dicttesting/x/anint'])
+
+        # A change made by someone else after the save is still caught
+        client.write('/dicttesting/x/anint', 7)
+        to.anint = 8
+        self.assertRaises(
+            etcdobj.ConflictError, server.save, to, cas=True)
+
+        to = server.read(DictTestingObj(_id='x'), lazy=True)
+        to.anint = 5
+        server.delete(to, unchanged=True)
+        self.assertEquals({}, client.data)
+
+        # Fields which were loaded are still checked
+        server.save(DictTestingObj(_id='x', anint=1, adict={'count': 2}))
+        to = server.read(DictTestingObj(_id='x'), lazy=True)
+        self.assertEquals(1, to.anint)
+        client.write('/dicttesting/x/anint', 3)
+        self.assertRaises(
+            etcdobj.ConflictError, server.delete, to, unchanged=True)
+
+
+class TestEtcdObj(TestCase):
+    """
+    Tests for EtcdObj.
+    """
+
+    def test_values_are_per_instance(self):
+        """
+        Verify instances do not share field values.
+        """
+        first = DictTestingObj(anint=1, adict={'a': '1'})
+        second = DictTestingObj(anint=2)
+        self.assertEquals(1, first.anint)
+        self.assertEquals(2, second.anint)
+        self.assertEquals({'a': '1'}, first.adict)
+        self.assertEquals({}, second.adict)
+
+        second.anint = '3'
+        self.assertEquals(1, first.anint)
+        self.assertEquals(3, second.anint)
+
+    def test_field_registry(self):
+        """
+        Verify the field registry is computed once per class and frozen.
+        """
+        self.assertEquals(['adict', 'anint'], list(DictTestingObj._fields))
+        self.assertEquals(['anint'], list(TestingObj._fields))
+        for _ in range(10):
+            DictTestingObj()
+        self.assertEquals(['adict', 'anint'], list(DictTestingObj._fields))
+        self.assertRaises(
+            TypeError, operator.setitem, DictTestingObj._fields, 'x', None)
+
+        class SubTestingObj(TestingObj):
+            aaa = fields.StrField('aaa')
+
+        # Inherited fields keep their position ahead of new ones
+        self.assertEquals(['anint', 'aaa'], list(SubTestingObj._fields))
+        sub = SubTestingObj(anint=1, aaa=2)
+        self.assertEquals((1, '2'), (sub.anint, sub.aaa))
+        self.assertEquals(10, self.testing_obj.anint)
+
+    def test_fields_are_descriptors(self):
+        """
+        Verify fields are reached through the descriptor protocol.
+        """
+        self.assertTrue(isinstance(TestingObj.anint, fields.IntField))
+        self.testing_obj.anint = '5'
+        self.assertEquals(5, self.testing_obj.anint)
+        self.assertEquals([5], self.testing_obj._values)
+
+        class Combined(DictTestingObj):
+            other = TestingObj.anint
+
+        # A Field reused at a different position is copied
+        self.assertFalse(Combined.other is TestingObj.anint)
+        combined = Combined(anint=1, other=2)
+        self.assertEquals((1, 2), (combined.anint, combined.other))
+
+    def test_json(self):
+        """
+        Verify json encodes every field once with any encoder.
+        """
+        obj = DictTestingObj(anint=1, adict={'adict': 'x', 'count': '2'})
+        expected = {'anint': 1, 'adict': {'adict': 'x', 'count': 2}}
+        try:
+            for encoder in serialize.ENCODERS:
+                serialize.set_encoder(encoder)
+                self.assertEquals(expected, json.loads(obj.json))
+                fp = io.StringIO()
+                obj.dump_json(fp)
+                self.assertEquals(expected, json.loads(fp.getvalue()))
+        finally:
+            serialize.set_encoder()
+        self.assertRaises(ValueError, serialize.set_encoder, 'nope')
+
+        # The standard library encoder is the default
+        self.assertEquals(
+            '{"adict": {}, "anint": 1180591620717411303424}',
+            DictTestingObj(anint=2 ** 70).json)
+
+    def test_render_plan(self):
+        """
+        Verify the render plan matches Field.render for every field kind.
+        """
+        class Plan(DictTestingObj):
+            when = fields.DateTimeField('when', '%Y-%m-%dT%H:%M:%S')
+
+        when = datetime.datetime(2016, 1, 2, 3, 4, 5)
+        for _id in (None, 'one'):
+            obj = Plan(_id=_id, anint=1, adict={'a': 'x'}, when=when)
+            expected = []
+            for attr, field in Plan._fields.items():
+                field.value = getattr(obj, attr)
+                rendered = field.render()
+                if not isinstance(rendered, list):
+                    rendered = [rendered]
+                for item in rendered:
+                    item['key'] = '{0}/{1}'.format(obj._path, item['key'])
+                    expected.append(item)
+            self.assertEquals(expected, obj.render())
+        self.assertEquals(
+            '/dicttesting/when', Plan._render_plan[2][4])
+
+    def test_no_instance_dict(self):
+        """
+        Verify models declaring __slots__ store values without a __dict__.
+        """
+        class Slotted(etcdobj.EtcdObj):
+            __slots__ = ()
+            __name__ = 'slotted'
+            anint = fields.IntField('anint')
+
+        obj = Slotted(anint=1)
+        self.assertFalse(hasattr(obj, '__dict__'))
+        self.assertRaises(AttributeError, setattr, obj, 'notafield', 1)
+
+        # Other models keep instance attributes
+        self.testing_obj.notafield = 1
+        self.assertEquals(1, self.testing_obj.notafield)
+        self.assertEquals(['/testing/anint'], [
+            item['key'] for item in self.testing_obj.render()])
+
+    def test_concurrent_creation(self):
+        """
+        Verify instances can be created from many threads at once.
+        """
+        results = {}
+
+        def create(number):
+            for _ in range(200):
+                obj = TestingObj(anint=number)
+                if obj.anint != number:
+                    results[number] = obj.anint
+                    return
+
+        threads = [
+            threading.Thread(target=create, args=(x,)) for x in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEquals({}, results)
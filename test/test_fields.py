@@ -32,11 +32,36 @@ import datetime
 
 from mock import MagicMock
 
-from . import TestCase, TestingObj
+from . import FakeClient, TestCase, TestingObj
+
+import etcdobj
 
 from etcdobj import fields
 
 
+class UpperField(fields.Field):
+    """
+    A Field written against the per-field _value storage.
+    """
+
+    def _set_value(self, value):
+        """
+        Stores value upper cased.
+        """
+        self._value = value.upper()
+
+    def render(self):
+        """
+        Renders the value with a marker.
+        """
+        return {
+            'name': self.name,
+            'key': self.name,
+            'value': '!' + self._value,
+            'dir': False,
+        }
+
+
 class TestField(TestCase):
     """
     Tests for base Field class.
@@ -77,6 +102,30 @@ class TestField(TestCase):
         }
         self.assertEquals(expected, rendered)
 
+    def test_overrides(self):
+        """
+        Verify models honor Fields overriding _set_value and render.
+        """
+        class Upper(etcdobj.EtcdObj):
+            __name__ = 'upper'
+            text = UpperField('text')
+
+        obj = Upper(text='abc')
+        self.assertEquals('ABC', obj.text)
+        obj.text = 'def'
+        self.assertEquals('DEF', obj.text)
+        self.assertEquals(None, Upper.text.value)
+        self.assertEquals(
+            [{'name': 'text', 'key': '/upper/text', 'value': '!DEF',
+              'dir': False}], obj.render())
+
+        client = FakeClient()
+        server = etcdobj._Server(client)
+        server.save(obj)
+        self.assertEquals({'/upper/text': '!DEF'}, client.data)
+        client.write('/upper/text', 'ghi')
+        self.assertEquals('GHI', server.read(Upper(), recursive=True).text)
+
 
 class TestIntField(TestCase):
     """
@@ -148,6 +197,30 @@ class TestDictField(TestCase):
         self.instance.value = {'a': '10', 'b': 10}
         self.assertEquals({'a': 10, 'b': '10'}, self.instance.value)
 
+    def test_casting_copies(self):
+        """
+        Verify casting builds a new dict and leaves the given one alone.
+        """
+        field = fields.DictField(
+            'test', {'a': int, 'b': int, 'c': float, 'd': 'not callable'})
+        given = {'a': '1', 'c': '1.5', 'd': '2', 'e': '3'}
+        cast = field._cast(given)
+        self.assertEquals({'a': 1, 'c': 1.5, 'd': '2', 'e': '3'}, cast)
+        self.assertEquals(
+            {'a': '1', 'c': '1.5', 'd': '2', 'e': '3'}, given)
+
+        # Large dicts only look up the keys with casters
+        given = dict(('k{0}'.format(x), str(x)) for x in range(1000))
+        given['a'] = '7'
+        cast = field._cast(given)
+        self.assertEquals(7, cast['a'])
+        self.assertEquals('999', cast['k999'])
+
+        # Nothing to cast keeps the same dict
+        given = {'x': '1'}
+        self.assertTrue(field._cast(given) is given)
+        self.assertRaises(ValueError, field._cast, {'a': 'x'})
+
 
 class TestDateTimeField(TestCase):
     """
@@ -174,3 +247,37 @@ class TestDateTimeField(TestCase):
         # Test internal casting when a caster is provided
         self.instance.value = '2016-01-01'
         self.assertEquals(datetime.datetime(2016, 1, 1), self.instance.value)
+
+    def test_parsing_matches_strptime(self):
+        """
+        Verify the fast parsers return what strptime does, or raise.
+        """
+        cases = {
+            '%Y-%m-%dT%H:%M:%S': [
+                '2016-02-29T23:59:58', '2016-01-01T00:00:00+01',
+                '2016-01-01T24:00:00', '2016-1-1T00:00:00',
+                '2016-01-01 00:00:00', '2016-01-01T00:00:0Z'],
+            '%Y-%m-%d %H:%M:%S.%f': [
+                '2016-01-01 00:00:00.123456', '2016-01-01 00:00:00.1',
+                '2016-01-01 00:00:00.12345Z'],
+            '%d/%m/%Y %H:%M': [
+                '29/02/2016 23:59', '30/02/2016 23:59', '1/2/2016 3:04',
+                '01/02/2016  03:04', '01/02/2016 03:04 '],
+            '%H:%M:%S %z': ['10:00:00 +0100'],
+        }
+        for datefmt, values in cases.items():
+            field = fields.DateTimeField('test', datefmt)
+            for value in values:
+                try:
+                    expected = datetime.datetime.strptime(value, datefmt)
+                except ValueError:
+                    self.assertRaises(ValueError, field._cast, value)
+                else:
+                    self.assertEquals(expected, field._cast(value))
+                    self.assertEquals(
+                        expected.tzinfo, field._cast(value).tzinfo)
+
+        # Parsers are compiled once per format
+        self.assertTrue(
+            fields.DateTimeField('a', '%d/%m/%Y')._parse is
+            fields.DateTimeField('b', '%d/%m/%Y')._parse)
@@ -0,0 +1,231 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     (1) Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#
+#     (2) Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#
+#     (3)The name of the author may not be used to
+#     endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Unittests for secondary indexes.
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+
+from . import FakeClient, TestCase, TxnFakeClient
+from .test_aio import AsyncFakeClient
+
+import etcdobj
+
+from etcdobj import fields
+from etcdobj.aio import AsyncServer
+
+
+class IndexedObj(etcdobj.EtcdObj):
+    """
+    An EtcdObj with indexed fields for testing.
+    """
+    __name__ = 'indexed'
+    status = fields.StrField('status', indexed=True)
+    size = fields.IntField('size', indexed=True)
+    note = fields.StrField('note')
+
+
+class TestIndex(TestCase):
+    """
+    Tests for index maintenance and Server.find.
+    """
+
+    def setUp(self):
+        """
+        Executes before each test.
+        """
+        self.fake = FakeClient()
+        self.server = etcdobj._Server(self.fake)
+
+    def index_keys(self):
+        """
+        Returns the index keys stored in the fake client.
+        """
+        return sorted(
+            key for key in self.fake.data if key.startswith('/_idx/'))
+
+    def test_save_maintains_index(self):
+        """
+        Verify index keys follow value changes.
+        """
+        obj = IndexedObj(_id='a', status='new state', size=1, note='x')
+        self.server.save(obj)
+        self.assertEquals([
+            '/_idx/indexed/size/1/a',
+            '/_idx/indexed/status/new%20state/a',
+        ], self.index_keys())
+
+        # Unchanged values do not touch the index
+        del self.fake.calls[:]
+        obj.note = 'y'
+        self.server.save(obj)
+        self.assertEquals(1, len(self.fake.calls))
+
+        obj.status = 'ready'
+        self.server.save(obj)
+        self.assertEquals([
+            '/_idx/indexed/size/1/a',
+            '/_idx/indexed/status/ready/a',
+        ], self.index_keys())
+
+        # A fresh instance looks up the stored value to clean up
+        self.server.save(IndexedObj(_id='a', status='done', size=1))
+        self.assertEquals([
+            '/_idx/indexed/size/1/a',
+            '/_idx/indexed/status/done/a',
+        ], self.index_keys())
+
+        # Objects without an id are not indexed
+        self.server.save(IndexedObj(status='done'))
+        self.assertEquals(2, len(self.index_keys()))
+
+    def test_delete_removes_index(self):
+        """
+        Verify deleting an object removes its index keys.
+        """
+        obj = IndexedObj(_id='a', status='ready', size=1)
+        self.server.save(obj)
+        self.server.save(IndexedObj(_id='b', status='ready', size=2))
+        self.server.delete(obj)
+        self.assertEquals([
+            '/_idx/indexed/size/2/b',
+            '/_idx/indexed/status/ready/b',
+        ], self.index_keys())
+
+        # Without a known state the stored values are looked up
+        self.server.delete(IndexedObj(_id='b'))
+        self.assertEquals([], self.index_keys())
+
+    def test_cas_conflict_keeps_index(self):
+        """
+        Verify index keys follow the keys written before a conflict.
+        """
+        obj = IndexedObj(_id='a', status='new', size=1)
+        self.server.save(obj)
+        self.fake.write('/indexed/a/status', 'theirs')
+        obj.size = 2
+        obj.status = 'ours'
+        # Changed after the check, so size is written and status is not
+        self.server._stale_keys = lambda obj, writes, deletes: []
+        self.assertRaises(
+            etcdobj.ConflictError, self.server.save, obj, cas=True)
+        self.assertEquals(2, self.fake.data['/indexed/a/size'])
+        self.assertEquals([
+            '/_idx/indexed/size/2/a',
+            '/_idx/indexed/status/new/a',
+        ], self.index_keys())
+        self.assertEquals(
+            ['a'], [o._id for o in self.server.find(IndexedObj, size=2)])
+
+    def test_async_server_maintains_index(self):
+        """
+        Verify AsyncServer keeps index keys up to date.
+        """
+        client = AsyncFakeClient()
+        self.fake = client.fake
+        server = AsyncServer(client)
+        obj = IndexedObj(_id='a', status='new', size=1)
+        asyncio.run(server.save(obj))
+        obj.status = 'ready'
+        asyncio.run(server.save(obj))
+        self.assertEquals([
+            '/_idx/indexed/size/1/a',
+            '/_idx/indexed/status/ready/a',
+        ], self.index_keys())
+        found = etcdobj._Server(self.fake).find(IndexedObj, status='ready')
+        self.assertEquals(['a'], [o._id for o in found])
+
+        asyncio.run(server.delete(IndexedObj(_id='a')))
+        self.assertEquals([], self.index_keys())
+
+    def test_snapshot_includes_index(self):
+        """
+        Verify imported objects can be found.
+        """
+        self.server.save(IndexedObj(_id='a', status='ready', size=1))
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'snapshot.ndjson')
+            self.assertEquals(5, self.server.export(IndexedObj, path))
+            target = etcdobj._Server(FakeClient())
+            target.import_(path)
+        finally:
+            shutil.rmtree(tmpdir)
+        found = target.find(IndexedObj, status='ready')
+        self.assertEquals(['a'], [o._id for o in found])
+
+    def test_save_batch_includes_index(self):
+        """
+        Verify index keys are sent in the same transaction.
+        """
+        fake = TxnFakeClient()
+        server = etcdobj._Server(fake)
+        server.save_batch(IndexedObj(_id='a', status='ready', size=2))
+        txns = [call[1] for call in fake.calls if call[0] == 'txn']
+        self.assertEquals(1, len(txns))
+        self.assertTrue('/_idx/indexed/status/ready/a' in txns[0])
+
+    def test_find(self):
+        """
+        Verify find resolves objects through the index.
+        """
+        for x in range(6):
+            self.server.save(IndexedObj(
+                _id='obj{0}'.format(x),
+                status='ready' if x % 2 else 'new', size=x % 3))
+        ready = list(self.server.find(IndexedObj, status='ready'))
+        self.assertEquals(
+            ['obj1', 'obj3', 'obj5'], [obj._id for obj in ready])
+        both = list(self.server.find(IndexedObj, status='ready', size=0))
+        self.assertEquals(['obj3'], [obj._id for obj in both])
+        self.assertEquals(
+            [], list(self.server.find(IndexedObj, status='missing')))
+
+        # Entries which no longer match the stored value are skipped
+        self.fake.write('/indexed/obj1/status', 'new')
+        ready = list(self.server.find(IndexedObj, status='ready'))
+        self.assertEquals(['obj3', 'obj5'], [obj._id for obj in ready])
+
+        # Ids which look quoted are found as they are
+        self.server.save(IndexedObj(_id='a%20b', status='odd', size=0))
+        self.assertEquals(
+            ['a%20b'],
+            [obj._id for obj in self.server.find(IndexedObj, status='odd')])
+
+    def test_find_requires_indexed_fields(self):
+        """
+        Verify find only accepts indexed fields.
+        """
+        self.assertRaises(
+            ValueError, list, self.server.find(IndexedObj, note='x'))
+        self.assertRaises(ValueError, list, self.server.find(IndexedObj))
+        self.assertRaises(
+            ValueError, fields.DictField, 'adict', indexed=True)
@@ -0,0 +1,159 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     (1) Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#
+#     (2) Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#
+#     (3)The name of the author may not be used to
+#     endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Unittests for instrumentation.
+"""
+
+import etcd
+
+from . import DictTestingObj, FakeClient, TestCase, TestingObj
+
+import etcdobj
+
+from etcdobj import instrument
+
+
+class TestInstrumentation(TestCase):
+    """
+    Tests for Instrumentation and the instrumented methods.
+    """
+
+    def setUp(self):
+        """
+        Executes before each test.
+        """
+        self.fake = FakeClient()
+        self.server = etcdobj._Server(self.fake)
+        self.now = [0]
+
+        def clock():
+            self.now[0] += 0.002
+            return self.now[0]
+
+        self.stats = instrument.Instrumentation(clock=clock)
+
+    def tearDown(self):
+        """
+        Executes after each test.
+        """
+        instrument.disable()
+
+    def test_off_by_default(self):
+        """
+        Verify the plain methods are only swapped while enabled.
+        """
+        plain = etcdobj.EtcdObj._render_items
+        self.assertIsNone(instrument.active())
+        self.assertFalse(hasattr(plain, '__wrapped__'))
+        self.assertFalse(hasattr(etcdobj._Server.save, '__wrapped__'))
+
+        self.assertIs(self.stats, instrument.enable(self.stats))
+        self.assertIs(self.stats, instrument.active())
+        self.assertIs(plain, etcdobj.EtcdObj._render_items.__wrapped__)
+        self.assertEquals(
+            'json', etcdobj.EtcdObj.json.fget.__wrapped__.__name__)
+
+        instrument.disable()
+        self.assertIs(plain, etcdobj.EtcdObj._render_items)
+        self.server.save(DictTestingObj(anint=1))
+        self.assertEquals({}, self.stats.stats)
+
+    def test_stats(self):
+        """
+        Verify counts, bytes and latencies per operation and model.
+        """
+        self.fake.load({'/testing/anint': '3'})
+        instrument.enable(self.stats)
+        obj = DictTestingObj(anint=12, adict={'count': 345})
+        self.server.save(obj)
+        self.server.read(DictTestingObj(), recursive=True)
+        self.server.read(TestingObj())
+        self.assertRaises(
+            etcd.EtcdKeyNotFound, self.server.read, TestingObj(_id='x'))
+        encoded = obj.json
+        obj.render()
+
+        stats = self.stats.stats
+        self.assertEquals(
+            set([('save', DictTestingObj), ('read', DictTestingObj),
+                 ('read', TestingObj), ('render', DictTestingObj),
+                 ('render', TestingObj), ('cast', DictTestingObj),
+                 ('cast', TestingObj), ('json', DictTestingObj)]),
+            set(stats.keys()))
+        save = stats[('save', DictTestingObj)]
+        self.assertEquals((1, 0, 5), (save.count, save.errors, save.bytes))
+        self.assertEquals(5, stats[('read', DictTestingObj)].bytes)
+        read = stats[('read', TestingObj)]
+        self.assertEquals((2, 1), (read.count, read.errors))
+        # save, read and render() each render once
+        self.assertEquals(3, stats[('render', DictTestingObj)].count)
+        self.assertEquals(
+            len(encoded), stats[('json', DictTestingObj)].bytes)
+        self.assertEquals(1, save.histogram.count)
+        # The clock is also read twice by the render within the save
+        self.assertAlmostEqual(0.006, save.histogram.total)
+
+        self.stats.reset()
+        self.assertEquals({}, self.stats.stats)
+
+    def test_hooks(self):
+        """
+        Verify hooks are called around every operation.
+        """
+        calls = []
+        self.stats.add_hook(
+            before=lambda *args: calls.append(('before',) + args),
+            after=lambda *args: calls.append(('after',) + args))
+        instrument.enable(self.stats)
+        encoded = TestingObj(anint=7).json
+        self.assertRaises(
+            etcd.EtcdKeyNotFound, self.server.read, TestingObj(_id='x'))
+
+        self.assertEquals(('before', 'json', TestingObj), calls[0])
+        self.assertEquals(('after', 'json', TestingObj), calls[1][:3])
+        self.assertAlmostEqual(0.002, calls[1][3])
+        self.assertEquals((len(encoded), None), calls[1][4:])
+        self.assertEquals(
+            ['read', 'render', 'render', 'read'],
+            [call[1] for call in calls[2:]])
+        self.assertEquals((None, etcd.EtcdKeyNotFound), (
+            calls[-1][4], type(calls[-1][5])))
+
+    def test_histogram(self):
+        """
+        Verify observations land in the right buckets.
+        """
+        histogram = instrument.Histogram((0.01, 0.1, 1))
+        self.assertIsNone(histogram.quantile(0.5))
+        for value in (0.001, 0.005, 0.05, 0.5, 5):
+            histogram.observe(value)
+        self.assertEquals([2, 1, 1, 1], histogram.counts)
+        self.assertEquals(5, histogram.count)
+        self.assertEquals(0.01, histogram.quantile(0.4))
+        self.assertEquals(0.1, histogram.quantile(0.5))
+        self.assertEquals(float('inf'), histogram.quantile(1))
@@ -0,0 +1,274 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     (1) Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#
+#     (2) Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#
+#     (3)The name of the author may not be used to
+#     endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Unittests for TTLs and KeepAlive.
+"""
+
+import asyncio
+import threading
+
+import etcd
+
+from . import DictTestingObj, TestCase, TtlFakeClient
+from .test_aio import AsyncFakeClient
+
+import etcdobj
+
+from etcdobj import fields
+from etcdobj.aio import AsyncServer
+
+from etcdobj.lease import KeepAlive
+
+
+class EphemeralObj(DictTestingObj):
+    """
+    A keyed model whose instances expire after 30 seconds.
+    """
+    __name__ = 'ephemeral'
+    __ttl__ = 30
+
+
+class IndexedEphemeralObj(etcdobj.EtcdObj):
+    """
+    A model with an indexed field whose instances expire after 30 seconds.
+    """
+    __name__ = 'beat'
+    __ttl__ = 30
+    status = fields.StrField('status', indexed=True)
+    anint = fields.IntField('anint')
+
+
+class TestLease(TestCase):
+    """
+    Tests for saving with a TTL and KeepAlive.
+    """
+
+    def setUp(self):
+        """
+        Executes before each test.
+        """
+        self.fake = TtlFakeClient()
+        self.server = etcdobj._Server(self.fake)
+        self.keepalive = KeepAlive(self.fake, clock=lambda: self.fake.now)
+
+    def writes(self, dirs=False):
+        """
+        Returns the keys written, either values or directories.
+        """
+        return [c[1] for c in self.fake.calls
+                if c[0] == 'write' and bool(c[2].get('dir')) == dirs]
+
+    def test_save_with_ttl(self):
+        """
+        Verify saving sets the TTL of the object directory first.
+        """
+        obj = EphemeralObj(_id='a', anint=1, adict={'x': 'y'})
+        self.server.save(obj)
+        self.assertEquals(['/ephemeral/a', '/ephemeral/a'], self.writes(True))
+        self.assertEquals({'/ephemeral/a': 30}, self.fake.expires)
+        self.assertEquals(
+            ['/ephemeral/a/adict/x', '/ephemeral/a/anint'],
+            sorted(self.writes()))
+
+        # A per call ttl wins over the model
+        obj.anint = 2
+        self.server.save(obj, ttl=5)
+        self.assertEquals({'/ephemeral/a': 5}, self.fake.expires)
+        self.assertEquals(['/ephemeral/a/anint'], self.writes()[2:])
+
+        # Models without a TTL never write the directory
+        self.server.save(DictTestingObj(_id='b', anint=1))
+        self.assertEquals(3, len(self.writes(True)))
+
+    def test_save_after_expiry(self):
+        """
+        Verify every key is written again once the object expired.
+        """
+        obj = EphemeralObj(_id='a', anint=1, adict={'x': 'y'})
+        self.server.save(obj)
+        self.fake.now = 31
+        self.assertRaises(
+            etcd.EtcdKeyNotFound, self.fake.read, '/ephemeral/a/anint')
+        self.server.save(obj)
+        self.assertEquals(
+            {'/ephemeral/a/anint': 1, '/ephemeral/a/adict/x': 'y'},
+            self.fake.data)
+        self.assertEquals({'/ephemeral/a': 61}, self.fake.expires)
+
+    def test_save_many_with_ttl(self):
+        """
+        Verify save_many gives every object the TTL.
+        """
+        objs = [EphemeralObj(_id=str(i), anint=i) for i in range(3)]
+        results = self.server.save_many(objs, workers=2, ttl=10)
+        self.assertEquals([None] * 3, [r.error for r in results])
+        self.assertEquals(
+            dict(('/ephemeral/{0}'.format(i), 10) for i in range(3)),
+            self.fake.expires)
+
+    def test_save_many_ttl_on_pool(self):
+        """
+        Verify save_many sets TTLs from the pool, not the caller thread.
+        """
+        threads = []
+        write = self.fake.write
+
+        def recording_write(key, value=None, **kwargs):
+            if kwargs.get('dir'):
+                threads.append(threading.current_thread())
+            return write(key, value, **kwargs)
+
+        self.fake.write = recording_write
+        objs = [EphemeralObj(_id=str(i), anint=i) for i in range(3)]
+        self.server.save_many(objs, workers=2)
+        self.assertEquals(6, len(threads))
+        self.assertFalse(threading.current_thread() in threads)
+
+    def test_index_keys_expire(self):
+        """
+        Verify index keys share the TTL of their object in every save path.
+        """
+        index_key = '/_idx/beat/status/up/a'
+        saves = (
+            lambda obj: self.server.save(obj),
+            lambda obj: self.server.save_batch(obj),
+            lambda obj: self.server.save_many([obj]),
+        )
+        for save in saves:
+            obj = IndexedEphemeralObj(_id='a', status='up', anint=1)
+            save(obj)
+            self.assertEquals(self.fake.now + 30, self.fake.expires[index_key])
+
+            # Saves which do not change the field still refresh it
+            self.fake.now += 20
+            obj.anint += 1
+            save(obj)
+            self.assertEquals(self.fake.now + 30, self.fake.expires[index_key])
+            self.fake.now += 31
+            self.assertEquals(
+                [], list(self.server.find(IndexedEphemeralObj, status='up')))
+            self.assertFalse(index_key in self.fake.data)
+
+    def test_async_save_with_ttl(self):
+        """
+        Verify AsyncServer.save honors __ttl__ for the object and index.
+        """
+        client = AsyncFakeClient()
+        client.fake = self.fake
+        obj = IndexedEphemeralObj(_id='a', status='up', anint=1)
+        asyncio.run(AsyncServer(client).save(obj))
+        self.assertEquals(
+            {'/beat/a': 30, '/_idx/beat/status/up/a': 30}, self.fake.expires)
+        asyncio.run(AsyncServer(client).save(obj, ttl=5))
+        self.assertEquals(
+            {'/beat/a': 5, '/_idx/beat/status/up/a': 5}, self.fake.expires)
+
+    def test_keepalive_refreshes_index(self):
+        """
+        Verify KeepAlive keeps the index keys of an object alive.
+        """
+        obj = IndexedEphemeralObj(_id='a', status='up', anint=1)
+        self.server.save(obj)
+        self.keepalive.add(obj)
+        for now in (10, 20, 30, 40):
+            self.fake.now = now
+            self.keepalive.refresh_due()
+        self.assertEquals(
+            ['a'], [o._id for o in self.server.find(
+                IndexedEphemeralObj, status='up')])
+
+    def test_keepalive(self):
+        """
+        Verify due objects are refreshed in one loop without rewrites.
+        """
+        objs = [EphemeralObj(_id=str(i), anint=i) for i in range(3)]
+        for obj in objs:
+            self.server.save(obj)
+            self.keepalive.add(obj)
+        self.assertEquals(3, len(self.keepalive))
+        self.assertEquals(10, self.keepalive.next_due())
+        written = len(self.writes())
+
+        self.fake.now = 5
+        self.assertEquals([], self.keepalive.refresh_due())
+        for now in (10, 20, 30, 40):
+            self.fake.now = now
+            self.assertEquals(
+                ['/ephemeral/0', '/ephemeral/1', '/ephemeral/2'],
+                sorted(self.keepalive.refresh_due()))
+        self.assertEquals(written, len(self.writes()))
+        self.assertEquals(
+            {'/ephemeral/0': 0, '/ephemeral/1': 1, '/ephemeral/2': 2},
+            dict((k.rsplit('/', 1)[0], v) for k, v in self.fake.data.items()))
+
+        # Removed objects expire, expired objects end up in lost
+        self.keepalive.remove(objs[0])
+        self.fake.now = 50
+        self.fake.expires['/ephemeral/1'] = 45
+        self.assertEquals(['/ephemeral/2'], self.keepalive.refresh_due())
+        self.assertEquals([objs[1]], self.keepalive.lost)
+        self.assertEquals(1, len(self.keepalive))
+        self.fake.now = 71
+        self.assertEquals(['/ephemeral/2'], self.keepalive.refresh_due())
+        self.assertEquals(
+            ['/ephemeral/2/anint'], list(self.fake.data.keys()))
+
+    def test_keepalive_retries_failures(self):
+        """
+        Verify a failed refresh is retried and does not stop the others.
+        """
+        objs = [EphemeralObj(_id=str(i), anint=i) for i in range(2)]
+        for obj in objs:
+            self.server.save(obj)
+            self.keepalive.add(obj, ttl=3)
+        self.fake.fail_keys.add('/ephemeral/0')
+        self.fake.now = 1
+        original = self.fake.write
+
+        def write(key, value, **kwargs):
+            if key in self.fake.fail_keys:
+                raise etcd.EtcdConnectionFailed('down')
+            return original(key, value, **kwargs)
+
+        self.fake.write = write
+        self.assertRaises(
+            etcd.EtcdConnectionFailed, self.keepalive.refresh_due)
+        self.assertEquals({'/ephemeral/0': 30, '/ephemeral/1': 4},
+                          self.fake.expires)
+        self.fake.fail_keys.clear()
+        self.assertEquals(['/ephemeral/0'], self.keepalive.refresh_due())
+        self.assertEquals({'/ephemeral/0': 4, '/ephemeral/1': 4},
+                          self.fake.expires)
+
+    def test_add_requires_ttl(self):
+        """
+        Verify objects without a TTL can not be kept alive.
+        """
+        self.assertRaises(
+            ValueError, self.keepalive.add, DictTestingObj(_id='a'))
+        self.assertRaises(ValueError, KeepAlive, self.fake, ratio=1)
@@ -0,0 +1,282 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     (1) Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#
+#     (2) Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#
+#     (3)The name of the author may not be used to
+#     endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Unittests for the client pool.
+"""
+
+import threading
+import time
+
+import etcd
+
+from . import DictTestingObj, FakeClient, TestCase
+
+import etcdobj
+
+from etcdobj.pool import ClientPool, LEAST_LOADED
+
+
+class MemberClient(object):
+    """
+    A client for one member of a fake cluster sharing a FakeClient.
+    """
+
+    def __init__(self, cluster, name, latency=0):
+        """
+        Creates a new MemberClient.
+        """
+        self.cluster = cluster
+        self.base_uri = 'http://{0}:2379'.format(name)
+        self.latency = latency
+        self.down = False
+        self.calls = []
+
+    @property
+    def leader(self):
+        """
+        Fake leader lookup.
+        """
+        self._serve('leader')
+        return {'clientURLs': [self.cluster.leader]}
+
+    def _serve(self, method):
+        """
+        Records a call, failing if the member is down.
+        """
+        if self.down:
+            raise etcd.EtcdConnectionFailed('Connection refused')
+        self.calls.append(method)
+        time.sleep(self.latency)
+
+    def read(self, key, **kwargs):
+        """
+        Fake read.
+        """
+        self._serve('read')
+        return self.cluster.read(key, **kwargs)
+
+    def write(self, key, value, **kwargs):
+        """
+        Fake write.
+        """
+        self._serve('write')
+        return self.cluster.write(key, value, **kwargs)
+
+    def delete(self, key, **kwargs):
+        """
+        Fake delete.
+        """
+        self._serve('delete')
+        return self.cluster.delete(key, **kwargs)
+
+    def watch(self, key, **kwargs):
+        """
+        Fake watch.
+        """
+        self._serve('watch')
+        return self.cluster.watch(key, **kwargs)
+
+
+class TestClientPool(TestCase):
+    """
+    Tests for ClientPool.
+    """
+
+    def setUp(self):
+        """
+        Executes before each test.
+        """
+        self.now = 0
+        self.cluster = FakeClient()
+        self.cluster.load({'/dicttesting/anint': '1'})
+        self.cluster.leader = 'http://b:2379'
+        self.members = [MemberClient(self.cluster, name) for name in 'abc']
+        self.pool = ClientPool(self.members, clock=lambda: self.now)
+
+    def counts(self, method='read'):
+        """
+        Returns how often each member served method.
+        """
+        return [m.calls.count(method) for m in self.members]
+
+    def test_round_robin(self):
+        """
+        Verify plain reads are spread and quorum reads and writes are not.
+        """
+        for _ in range(6):
+            self.pool.read('/dicttesting/anint')
+        self.assertEquals([2, 2, 2], self.counts())
+
+        self.pool.read('/dicttesting/anint', quorum=True)
+        self.pool.write('/dicttesting/anint', '2')
+        self.pool.delete('/dicttesting/anint')
+        self.assertEquals([2, 3, 2], self.counts())
+        self.assertEquals([0, 1, 0], self.counts('write'))
+        self.assertEquals([0, 1, 0], self.counts('delete'))
+        # The leader is looked up once
+        self.assertEquals(1, sum(self.counts('leader')))
+
+    def test_least_loaded(self):
+        """
+        Verify a slow member gets fewer reads than the others.
+        """
+        self.members[0].latency = 0.02
+        pool = ClientPool(self.members, strategy=LEAST_LOADED)
+
+        def reader():
+            for _ in range(10):
+                pool.read('/dicttesting/anint')
+
+        threads = [threading.Thread(target=reader) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        counts = self.counts()
+        self.assertEquals(40, sum(counts))
+        self.assertTrue(counts[0] < min(counts[1:]), counts)
+        self.assertEquals([0, 0, 0], [m.in_flight for m in pool.members])
+
+    def test_ejection_and_backoff(self):
+        """
+        Verify failed members are skipped until their backoff passed.
+        """
+        self.members[0].down = True
+        for _ in range(4):
+            self.assertEquals(
+                '1', self.pool.read('/dicttesting/anint').value)
+        self.assertEquals([0, 2, 2], self.counts())
+        self.assertEquals(1, self.pool.members[0].failures)
+        self.assertEquals(1, self.pool.members[0].retry_at)
+
+        # Tried again after the backoff which then doubles
+        self.now = 1
+        for _ in range(3):
+            self.pool.read('/dicttesting/anint')
+        self.assertEquals(2, self.pool.members[0].failures)
+        self.assertEquals(3, self.pool.members[0].retry_at)
+
+        # A member which answers again is healthy
+        self.members[0].down = False
+        self.now = 3
+        for _ in range(3):
+            self.pool.read('/dicttesting/anint')
+        self.assertEquals(1, self.counts()[0])
+        self.assertEquals(
+            (0, None),
+            (self.pool.members[0].failures, self.pool.members[0].retry_at))
+
+        # Errors from a member do not eject it
+        self.assertRaises(
+            etcd.EtcdKeyNotFound, self.pool.read, '/missing')
+        self.assertEquals([0, 0, 0], [m.failures for m in self.pool.members])
+
+        for member in self.members:
+            member.down = True
+        self.assertRaises(
+            etcd.EtcdConnectionFailed, self.pool.read, '/dicttesting/anint')
+
+    def test_leader_failover(self):
+        """
+        Verify writes are not retried but go to the new leader afterwards.
+        """
+        self.pool.write('/dicttesting/anint', '2')
+        self.members[1].down = True
+        self.assertRaises(
+            etcd.EtcdConnectionFailed,
+            self.pool.write, '/dicttesting/anint', '3')
+        self.assertEquals('2', self.cluster.data['/dicttesting/anint'])
+
+        self.cluster.leader = 'http://c:2379'
+        self.pool.write('/dicttesting/anint', '4')
+        self.assertEquals([0, 1, 1], self.counts('write'))
+
+        # Without a known leader any available member takes the write
+        self.cluster.leader = 'http://unknown:2379'
+        self.members[2].down = True
+        self.assertRaises(
+            etcd.EtcdConnectionFailed,
+            self.pool.write, '/dicttesting/anint', '5')
+        self.pool.write('/dicttesting/anint', '5')
+        self.assertEquals([1, 1, 1], self.counts('write'))
+
+    def test_watch_does_not_eject(self):
+        """
+        Verify watches which time out leave the member in the pool.
+        """
+        self.assertRaises(
+            etcd.EtcdConnectionFailed, self.pool.watch, '/dicttesting',
+            index=100, recursive=True)
+        self.assertEquals([0, 0, 0], [m.failures for m in self.pool.members])
+
+    def test_server(self):
+        """
+        Verify a Server can use the pool and builds one for endpoints.
+        """
+        server = etcdobj._Server(self.pool)
+        obj = DictTestingObj(anint=5, adict={'a': 'b'})
+        server.save(obj)
+        self.assertEquals([0, 2, 0], self.counts('write'))
+        result = server.read(DictTestingObj(), recursive=True)
+        self.assertEquals((5, {'a': 'b'}), (result.anint, result.adict))
+
+        server = etcdobj.Server(
+            endpoints=[('a', 2379), ('b', 2379)],
+            pool_kwargs={'strategy': LEAST_LOADED})
+        self.assertEquals(
+            ['http://a:2379', 'http://b:2379'],
+            [m.client.base_uri for m in server.client.members])
+        self.assertEquals(LEAST_LOADED, server.client.strategy)
+
+    def test_invalid_arguments(self):
+        """
+        Verify ClientPool rejects an empty pool or unknown strategy.
+        """
+        self.assertRaises(ValueError, ClientPool, [])
+        self.assertRaises(ValueError, ClientPool, self.members, 'random')
+
+    def test_unmatched_leader_is_cached(self):
+        """
+        Verify a leader which matches no member is not looked up per write.
+        """
+        self.cluster.leader = 'http://10.0.0.2:2379'
+        for _ in range(100):
+            self.pool.write('/dicttesting/anint', '2')
+        self.assertEquals(1, sum(self.counts('leader')))
+        self.now = 31
+        self.pool.write('/dicttesting/anint', '3')
+        self.assertEquals(2, sum(self.counts('leader')))
+
+    def test_leader_lookup_ejects(self):
+        """
+        Verify a member which fails the leader lookup is ejected.
+        """
+        self.members[0].down = True
+        self.pool.write('/dicttesting/anint', '2')
+        self.assertEquals(1, self.pool.members[0].failures)
+        self.assertEquals([0, 1, 0], self.counts('write'))
@@ -0,0 +1,150 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     (1) Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#
+#     (2) Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#
+#     (3)The name of the author may not be used to
+#     endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Unittests for keyed instances and Server.query.
+"""
+
+import asyncio
+
+from . import DictTestingObj, FakeClient, TestCase, TestingObj
+from .test_aio import AsyncFakeClient
+
+import etcdobj
+
+from etcdobj.aio import AsyncServer
+
+
+class TestQuery(TestCase):
+    """
+    Tests for keyed instances and Server.query.
+    """
+
+    def setUp(self):
+        """
+        Executes before each test.
+        """
+        self.fake = FakeClient()
+        self.server = etcdobj._Server(self.fake)
+        for x in range(20):
+            self.server.save(DictTestingObj(
+                _id='node{0:02d}'.format(x), anint=x, adict={'count': x}))
+        del self.fake.calls[:]
+
+    def test_keyed_render(self):
+        """
+        Verify keyed instances render under their id.
+        """
+        obj = TestingObj(_id='one', anint=1)
+        self.assertEquals('/testing/one/anint', obj.render()[0]['key'])
+        self.assertEquals('/testing/anint', TestingObj().render()[0]['key'])
+        self.assertRaises(ValueError, TestingObj, _id='a/b')
+        self.assertRaises(ValueError, TestingObj, _id='')
+
+    def test_query(self):
+        """
+        Verify query lazily yields every keyed instance.
+        """
+        results = self.server.query(DictTestingObj)
+        self.assertEquals([], self.fake.calls)
+        first = next(results)
+        self.assertEquals('node00', first._id)
+        # One listing and one read for the first object only
+        self.assertEquals(2, len(self.fake.calls))
+        rest = list(results)
+        self.assertEquals(19, len(rest))
+        self.assertEquals(
+            list(range(1, 20)), [obj.anint for obj in rest])
+        self.assertEquals({'count': 5}, rest[4].adict)
+
+    def test_query_limit_and_prefix(self):
+        """
+        Verify limit and prefix restrict which objects are read.
+        """
+        objs = list(self.server.query(DictTestingObj, prefix='node1', limit=3))
+        self.assertEquals(
+            ['node10', 'node11', 'node12'], [obj._id for obj in objs])
+        self.assertEquals(4, len(self.fake.calls))
+
+    def test_query_projection(self):
+        """
+        Verify only the requested fields are fetched.
+        """
+        objs = list(self.server.query(DictTestingObj, fields=['anint']))
+        self.assertEquals(20, len(objs))
+        self.assertEquals(7, objs[7].anint)
+        self.assertEquals({}, objs[7].adict)
+        keys = [call[1] for call in self.fake.calls[1:]]
+        self.assertTrue(all(key.endswith('/anint') for key in keys))
+        self.assertRaises(
+            ValueError, list,
+            self.server.query(DictTestingObj, fields=['nope']))
+
+    def test_projection_keeps_unread_fields(self):
+        """
+        Verify saving or deleting a projected object leaves other fields.
+        """
+        obj = next(self.server.query(DictTestingObj, fields=['adict']))
+        obj.adict = {'count': 100}
+        self.server.save(obj, full=True)
+        self.assertEquals(
+            100, self.fake.data['/dicttesting/node00/adict/count'])
+        self.assertEquals(0, self.fake.data['/dicttesting/node00/anint'])
+
+        obj = next(self.server.query(DictTestingObj, fields=['anint']))
+        self.server.save(obj)
+        self.server.delete(obj, unchanged=True)
+        self.assertFalse(any(
+            key.startswith('/dicttesting/node00/') for key in self.fake.data))
+
+        # Changes to a read field are still detected
+        obj = next(self.server.query(DictTestingObj, fields=['anint']))
+        self.fake.write('/dicttesting/node01/anint', 5)
+        self.assertRaises(
+            etcdobj.ConflictError, self.server.delete, obj, unchanged=True)
+
+        # Batched and asynchronous saves leave them as well
+        obj = next(self.server.query(DictTestingObj, fields=['adict']))
+        self.server.save_batch(obj)
+        self.assertEquals(5, self.fake.data['/dicttesting/node01/anint'])
+        obj = next(self.server.query(DictTestingObj, fields=['adict']))
+        aio_client = AsyncFakeClient()
+        aio_client.fake = self.fake
+        asyncio.run(AsyncServer(aio_client).save(obj))
+        self.assertEquals(5, self.fake.data['/dicttesting/node01/anint'])
+
+        # A full read lifts the projection again
+        self.server.read(obj, recursive=True)
+        obj.adict = {'count': 9}
+        self.server.save(obj)
+        self.assertEquals(9, self.fake.data['/dicttesting/node01/adict/count'])
+
+    def test_query_empty(self):
+        """
+        Verify querying a model with nothing stored yields nothing.
+        """
+        self.assertEquals([], list(self.server.query(TestingObj)))
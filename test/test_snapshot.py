@@ -0,0 +1,121 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+#     (1) Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#
+#     (2) Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in
+#     the documentation and/or other materials provided with the
+#     distribution.
+#
+#     (3)The name of the author may not be used to
+#     endorse or promote products derived from this software without
+#     specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+"""
+Unittests for snapshot export and import.
+"""
+
+import os
+import shutil
+import tempfile
+
+from . import DictTestingObj, FakeClient, TestCase, TxnFakeClient
+
+import etcdobj
+
+from etcdobj import serialize, snapshot
+
+
+class TestSnapshot(TestCase):
+    """
+    Tests for Server.export and Server.import_.
+    """
+
+    def setUp(self):
+        """
+        Executes before each test.
+        """
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'snapshot.ndjson')
+        self.source = FakeClient()
+        self.source.load({
+            '/dicttesting/anint': '1',
+            '/dicttesting/adict/a': 'x\ny',
+            '/dicttesting/adict/b': '2',
+            '/dicttesting/adict/deep/c': '3',
+            '/other/key': 'not exported',
+        })
+
+    def tearDown(self):
+        """
+        Executes after each test.
+        """
+        shutil.rmtree(self.tmpdir)
+
+    def test_round_trip(self):
+        """
+        Verify an exported namespace imports back unchanged.
+        """
+        server = etcdobj._Server(self.source)
+        self.assertEquals(4, server.export(DictTestingObj, self.path))
+        # Directories are listed without recursive reads
+        reads = [c for c in self.source.calls if c[0] == 'read']
+        self.assertEquals(3, len(reads))
+        self.assertFalse(any(c[2]['recursive'] for c in reads))
+
+        expected = dict(
+            (k, v) for k, v in self.source.data.items()
+            if k.startswith('/dicttesting/'))
+        for use_mmap in (True, False):
+            target = TxnFakeClient()
+            count = etcdobj._Server(target).import_(
+                self.path, batch_size=3, use_mmap=use_mmap)
+            self.assertEquals(4, count)
+            self.assertEquals(expected, target.data)
+            self.assertEquals(
+                [3, 1], [len(c[1]) for c in target.calls if c[0] == 'txn'])
+
+    def test_empty_snapshot(self):
+        """
+        Verify an empty snapshot imports nothing.
+        """
+        open(self.path, 'w').close()
+        self.assertEquals([], list(snapshot.read_snapshot(self.path)))
+        server = etcdobj._Server(FakeClient())
+        self.assertEquals(0, server.import_(self.path))
+        self.assertRaises(ValueError, server.import_, self.path, batch_size=0)
+
+        # Models with nothing stored export an empty snapshot
+        self.assertEquals(0, server.export(DictTestingObj, self.path))
+        self.assertEquals([], list(snapshot.read_snapshot(self.path)))
+
+    def test_non_ascii(self):
+        """
+        Verify non-ASCII values round trip with every encoder.
+        """
+        self.source.write('/dicttesting/adict/a', u'caf\xe9 \u2603')
+        try:
+            for encoder in serialize.ENCODERS:
+                serialize.set_encoder(encoder)
+                server = etcdobj._Server(self.source)
+                server.export(DictTestingObj, self.path)
+                self.assertEquals(
+                    u'caf\xe9 \u2603',
+                    dict(snapshot.read_snapshot(self.path))[
+                        '/dicttesting/adict/a'])
+        finally:
+            serialize.set_encoder()